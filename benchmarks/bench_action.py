@@ -0,0 +1,118 @@
+"""Measures the cost of building and executing actions.
+
+Compares actions built by :py:func:`reversible.action` with the closure-based
+actions it used to build: a :py:class:`SimpleAction` wrapping a pair of
+lambdas and an eagerly created context. Reports the time (ns/op) and the
+memory allocated (bytes/op) per action.
+
+Memory is the peak traced by ``tracemalloc`` divided by the number of
+actions. Actions that are discarded right away barely register, so the
+``retained`` workload, which keeps every action alive like a saga keeps its
+executed steps, is the one to compare. Run with::
+
+    python -m benchmarks.bench_action --ops 200000
+"""
+from __future__ import absolute_import, print_function
+
+import gc
+import time
+import argparse
+import tracemalloc
+
+import reversible
+from reversible.core import SimpleAction
+
+
+def closure_builder(forwards, backwards, context_class=dict):
+    """Builds actions the way ``ActionBuilder`` did before ``BoundAction``."""
+
+    def build(*args, **kwargs):
+        return SimpleAction(
+            lambda ctx: forwards(ctx, *args, **kwargs),
+            lambda ctx: backwards(ctx, *args, **kwargs),
+            context_class(),
+        )
+
+    return build
+
+
+def forwards(ctx, x):
+    return x
+
+
+def backwards(ctx, x):
+    pass
+
+
+def bound_builder():
+    build = reversible.action(forwards)
+    build.backwards(backwards)
+    return build
+
+
+def build_only(build, ops):
+    for i in range(ops):
+        build(i)
+
+
+def build_and_forwards(build, ops):
+    for i in range(ops):
+        build(i).forwards()
+
+
+def build_and_keep(build, ops):
+    # Keeps the actions alive, like a saga holding on to executed steps.
+    return [build(i) for i in range(ops)]
+
+
+BUILDERS = [
+    ('closure', lambda: closure_builder(forwards, backwards)),
+    ('bound', bound_builder),
+]
+
+WORKLOADS = [
+    ('build', build_only),
+    ('build+forwards', build_and_forwards),
+    ('retained', build_and_keep),
+]
+
+
+def measure_time(workload, build, ops):
+    gc.collect()
+    start = time.perf_counter()
+    workload(build, ops)
+    return (time.perf_counter() - start) / ops * 1e9
+
+
+def measure_memory(workload, build, ops):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = workload(build, ops)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return peak / float(ops)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--ops', type=int, default=200000)
+    args = parser.parse_args()
+
+    print('%-16s %-8s %10s %10s' % (
+        'workload', 'builder', 'ns/op', 'bytes/op'
+    ))
+    for workload_name, workload in WORKLOADS:
+        for builder_name, make_builder in BUILDERS:
+            build = make_builder()
+            ns = measure_time(workload, build, args.ops)
+            size = measure_memory(workload, build, args.ops)
+            print('%-16s %-8s %10.1f %10.1f' % (
+                workload_name, builder_name, ns, size
+            ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""Compares the per-step cost of the asyncio and Tornado backends.
+
+Each saga is a :py:func:`gen` action that yields ``--steps`` asynchronous
+actions. Every action's ``forwards`` yields to the event loop once before
+returning. Run with::
+
+    python -m benchmarks.bench_async --sagas 200 --steps 50
+"""
+from __future__ import absolute_import, print_function
+
+import time
+import argparse
+
+
+def bench_asyncio(sagas, steps):
+    import asyncio
+    import reversible.asyncio as reversible
+
+    @reversible.action
+    async def step(ctx, i):
+        await asyncio.sleep(0)
+        return i
+
+    @step.backwards
+    async def undo_step(ctx, i):
+        pass
+
+    @reversible.gen
+    def saga():
+        total = 0
+        for i in range(steps):
+            total += yield step(i)
+        return total
+
+    async def main():
+        for _ in range(sagas):
+            await reversible.execute(saga())
+
+    loop = asyncio.new_event_loop()
+    start = time.time()
+    loop.run_until_complete(main())
+    elapsed = time.time() - start
+    loop.close()
+    return elapsed
+
+
+def bench_tornado(sagas, steps):
+    from tornado import gen
+    from tornado.ioloop import IOLoop
+    import reversible.tornado as reversible
+
+    @reversible.action
+    @gen.coroutine
+    def step(ctx, i):
+        yield gen.moment
+        raise gen.Return(i)
+
+    @step.backwards
+    @gen.coroutine
+    def undo_step(ctx, i):
+        pass
+
+    @reversible.gen
+    def saga():
+        total = 0
+        for i in range(steps):
+            total += yield step(i)
+        raise reversible.Return(total)
+
+    @gen.coroutine
+    def main():
+        for _ in range(sagas):
+            yield reversible.execute(saga())
+
+    io_loop = IOLoop()
+    start = time.time()
+    io_loop.run_sync(main)
+    elapsed = time.time() - start
+    io_loop.close()
+    return elapsed
+
+
+BACKENDS = [('asyncio', bench_asyncio), ('tornado', bench_tornado)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sagas', type=int, default=200)
+    parser.add_argument('--steps', type=int, default=50)
+    args = parser.parse_args()
+
+    total_steps = args.sagas * args.steps
+    for name, bench in BACKENDS:
+        try:
+            elapsed = bench(args.sagas, args.steps)
+        except ImportError as e:
+            print('%-8s skipped (%s)' % (name, e))
+            continue
+        print('%-8s %8.2f us/step  %10.0f steps/s' % (
+            name, elapsed / total_steps * 1e6, total_steps / elapsed,
+        ))
+
+
+if __name__ == '__main__':
+    main()
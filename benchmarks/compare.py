@@ -0,0 +1,68 @@
+"""Compares two sets of results written by :py:mod:`benchmarks.suite`.
+
+Prints the relative change of every metric and exits with a non-zero status
+if any benchmark got slower (or used more memory) than the threshold::
+
+    python -m benchmarks.compare before.json after.json --threshold 0.1
+"""
+from __future__ import absolute_import, print_function
+
+import sys
+import json
+import argparse
+
+
+# Metrics where lower is better.
+METRICS = ['mean_us', 'p99_us', 'bytes_per_op']
+
+
+def change(before, after):
+    if not before:
+        return 0.0
+    return (after - before) / float(before)
+
+
+def compare(before, after, threshold):
+    """Yields ``(name, metric, before, after, change, regressed)`` for every
+    metric of every benchmark present in both results."""
+    for name, old in before['results'].items():
+        new = after['results'].get(name)
+        if new is None:
+            continue
+        for metric in METRICS:
+            delta = change(old[metric], new[metric])
+            yield name, metric, old[metric], new[metric], delta, \
+                delta > threshold
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('before')
+    parser.add_argument('after')
+    parser.add_argument(
+        '--threshold', type=float, default=0.1,
+        help='Relative increase above which a metric counts as a regression.',
+    )
+    args = parser.parse_args()
+
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+
+    print('%s -> %s' % (before.get('commit'), after.get('commit')))
+    regressions = 0
+    for name, metric, old, new, delta, regressed in compare(
+        before, after, args.threshold
+    ):
+        regressions += regressed
+        print('%-30s %-14s %12.1f %12.1f %+8.1f%%%s' % (
+            name, metric, old, new, delta * 100,
+            '  REGRESSION' if regressed else '',
+        ))
+
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,410 @@
+"""Benchmarks the execution paths of reversible.
+
+Measures throughput, latency and memory per saga for the success and failure
+paths of :py:func:`reversible.execute`, :py:func:`reversible.gen`,
+:py:func:`reversible.tornado.execute` and
+:py:func:`reversible.tornado_native.execute`, and the startup time of a
+process that imports :py:mod:`reversible`. Run with::
+
+    python -m benchmarks.suite --output results.json
+
+The results are written as JSON, keyed by benchmark name, along with the
+commit they were measured at. Compare two runs with::
+
+    python -m benchmarks.compare before.json after.json
+"""
+from __future__ import absolute_import, print_function
+
+import gc
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+import subprocess
+import tracemalloc
+from collections import OrderedDict
+
+import reversible
+
+
+BENCHMARKS = OrderedDict()
+
+
+def benchmark(name, iterations, steps=1):
+    """Registers a benchmark.
+
+    The decorated function sets up the benchmark and returns a function that
+    runs it the given number of times and returns the latency of each run in
+    seconds. ``steps`` is the number of actions executed by each run.
+    """
+
+    def decorator(setup):
+        BENCHMARKS[name] = (setup, iterations, steps)
+        return setup
+
+    return decorator
+
+
+class BenchError(Exception):
+    pass
+
+
+def timed(function):
+    """Returns a runner that times calls to ``function``."""
+
+    def run(iterations):
+        clock = time.perf_counter
+        latencies = []
+        for _ in range(iterations):
+            start = clock()
+            function()
+            latencies.append(clock() - start)
+        return latencies
+
+    return run
+
+
+def raises(action):
+    try:
+        reversible.execute(action)
+    except BenchError:
+        pass
+    else:  # pragma: no cover
+        raise AssertionError('%s did not fail' % (action,))
+
+
+@reversible.action
+def step(ctx, i):
+    return i
+
+
+@step.backwards
+def undo_step(ctx, i):
+    pass
+
+
+@reversible.action
+def fail(ctx):
+    raise BenchError('great sadness')
+
+
+@fail.backwards
+def undo_fail(ctx):
+    pass
+
+
+@reversible.gen
+def wide(steps, failing=False):
+    for i in range(steps):
+        yield step(i)
+    if failing:
+        yield fail()
+
+
+@reversible.gen
+def deep(depth, failing=False):
+    if depth == 0:
+        if failing:
+            yield fail()
+        result = yield step(0)
+    else:
+        result = yield deep(depth - 1, failing)
+    raise reversible.Return(result)
+
+
+@benchmark('core.flat.success', iterations=100000)
+def core_flat_success():
+    return timed(lambda: reversible.execute(step(1)))
+
+
+@benchmark('core.flat.failure', iterations=20000)
+def core_flat_failure():
+    return timed(lambda: raises(fail()))
+
+
+@benchmark('gen.deep.success', iterations=2000, steps=100)
+def gen_deep_success():
+    return timed(lambda: reversible.execute(deep(99)))
+
+
+@benchmark('gen.deep.failure', iterations=2000, steps=100)
+def gen_deep_failure():
+    return timed(lambda: raises(deep(99, failing=True)))
+
+
+@benchmark('gen.wide.success', iterations=100, steps=5000)
+def gen_wide_success():
+    return timed(lambda: reversible.execute(wide(5000)))
+
+
+@benchmark('gen.wide.failure', iterations=100, steps=5000)
+def gen_wide_failure():
+    # Every step is rolled back.
+    return timed(lambda: raises(wide(5000, failing=True)))
+
+
+@benchmark('gen.parallel.success', iterations=200, steps=100)
+def gen_parallel_success():
+
+    @reversible.gen
+    def saga():
+        yield [step(i) for i in range(100)]
+
+    return timed(lambda: reversible.execute(saga()))
+
+
+def tornado_runner(make_action, failing=False, engine='tornado'):
+    """Returns a runner that executes actions on a Tornado IOLoop with the
+    given engine, ``tornado`` or ``tornado_native``."""
+    import importlib
+    from tornado import gen
+    from tornado.ioloop import IOLoop
+
+    execute = importlib.import_module('reversible.' + engine).execute
+
+    def run(iterations):
+        clock = time.perf_counter
+        latencies = []
+
+        @gen.coroutine
+        def main():
+            for _ in range(iterations):
+                start = clock()
+                try:
+                    yield execute(make_action())
+                except BenchError:
+                    if not failing:  # pragma: no cover
+                        raise
+                latencies.append(clock() - start)
+
+        io_loop = IOLoop()
+        try:
+            io_loop.run_sync(main)
+        finally:
+            io_loop.close()
+        return latencies
+
+    return run
+
+
+def async_step(action):
+    """Builds a step that waits one IOLoop iteration, with the ``action``
+    decorator of the engine under test."""
+    from tornado import gen
+
+    @action
+    @gen.coroutine
+    def async_step(ctx, i):
+        yield gen.moment
+        raise gen.Return(i)
+
+    @async_step.backwards
+    @gen.coroutine
+    def undo_async_step(ctx, i):
+        yield gen.moment
+
+    return async_step
+
+
+@benchmark('tornado.async.success', iterations=200, steps=100)
+def tornado_async_success():
+    import reversible.tornado
+    async_step_ = async_step(reversible.tornado.action)
+
+    @reversible.tornado.gen
+    def saga():
+        for i in range(100):
+            yield async_step_(i)
+
+    # Every step switches out of the saga's greenlet and back.
+    return tornado_runner(saga)
+
+
+@benchmark('tornado.async.failure', iterations=200, steps=100)
+def tornado_async_failure():
+    import reversible.tornado
+    async_step_ = async_step(reversible.tornado.action)
+
+    @reversible.tornado.gen
+    def saga():
+        for i in range(100):
+            yield async_step_(i)
+        yield fail()
+
+    return tornado_runner(saga, failing=True)
+
+
+@benchmark('tornado.sync.success', iterations=200, steps=100)
+def tornado_sync_success():
+    import reversible.tornado
+
+    @reversible.tornado.gen
+    def saga():
+        for i in range(100):
+            yield step(i)
+
+    # Baseline for tornado.async.success without any greenlet switches.
+    return tornado_runner(saga)
+
+
+def resolved_step():
+    from tornado.concurrent import Future
+
+    @reversible.action
+    def resolved_step(ctx, i):
+        # A cache hit: the Future has resolved by the time it is returned.
+        future = Future()
+        future.set_result(i)
+        return future
+
+    resolved_step.backwards(lambda ctx, i: None)
+    return resolved_step
+
+
+@benchmark('tornado.resolved.success', iterations=200, steps=100)
+def tornado_resolved_success():
+    import reversible.tornado
+    resolved_step_ = resolved_step()
+
+    @reversible.tornado.gen
+    def saga():
+        for i in range(100):
+            yield resolved_step_(i)
+
+    # Resolved Futures are unwrapped without switching greenlets, so this
+    # should be close to tornado.sync.success.
+    return tornado_runner(saga)
+
+
+@benchmark('tornado_native.async.success', iterations=200, steps=100)
+def tornado_native_async_success():
+    import reversible.tornado_native
+    async_step_ = async_step(reversible.tornado_native.action)
+
+    @reversible.tornado_native.gen
+    def saga():
+        for i in range(100):
+            yield async_step_(i)
+
+    # Same workload as tornado.async.success, driven by a coroutine.
+    return tornado_runner(saga, engine='tornado_native')
+
+
+@benchmark('tornado_native.async.failure', iterations=200, steps=100)
+def tornado_native_async_failure():
+    import reversible.tornado_native
+    async_step_ = async_step(reversible.tornado_native.action)
+
+    @reversible.tornado_native.gen
+    def saga():
+        for i in range(100):
+            yield async_step_(i)
+        yield fail()
+
+    return tornado_runner(saga, failing=True, engine='tornado_native')
+
+
+@benchmark('import.reversible', iterations=20)
+def import_reversible():
+    # Startup cost of a worker process that only uses the threads backend.
+    command = [sys.executable, '-c', 'import reversible']
+    return timed(lambda: subprocess.check_call(command))
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def measure(name, scale=1.0):
+    setup, iterations, steps = BENCHMARKS[name]
+    iterations = max(1, int(iterations * scale))
+    run = setup()
+
+    # Warm up, then time.
+    run(max(1, iterations // 10))
+    gc.collect()
+    latencies = run(iterations)
+    total = sum(latencies)
+
+    # Memory is measured on separate runs because tracing slows them down.
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run(1)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return OrderedDict([
+        ('iterations', iterations),
+        ('steps', steps),
+        ('ops_per_sec', iterations / total),
+        ('steps_per_sec', iterations * steps / total),
+        ('mean_us', total / iterations * 1e6),
+        ('p50_us', percentile(latencies, 0.5) * 1e6),
+        ('p99_us', percentile(latencies, 0.99) * 1e6),
+        ('bytes_per_op', peak),
+    ])
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], stderr=subprocess.STDOUT
+        ).decode('ascii').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        '--output', '-o', help='Write JSON results to this file.'
+    )
+    parser.add_argument(
+        '--filter', '-k', default='',
+        help='Only run benchmarks whose name contains this string.',
+    )
+    parser.add_argument(
+        '--scale', type=float, default=1.0,
+        help='Multiplier for the number of iterations of every benchmark.',
+    )
+    args = parser.parse_args()
+
+    # Failures are expected. Don't spend the benchmark formatting tracebacks.
+    logging.getLogger('reversible').setLevel(logging.CRITICAL)
+
+    results = OrderedDict()
+    print('%-30s %12s %12s %10s %10s %12s' % (
+        'benchmark', 'ops/s', 'steps/s', 'p50 us', 'p99 us', 'bytes/op'
+    ))
+    for name in BENCHMARKS:
+        if args.filter not in name:
+            continue
+        try:
+            result = measure(name, args.scale)
+        except ImportError as e:
+            print('%-30s skipped (%s)' % (name, e))
+            continue
+        results[name] = result
+        print('%-30s %12.1f %12.1f %10.1f %10.1f %12d' % (
+            name, result['ops_per_sec'], result['steps_per_sec'],
+            result['p50_us'], result['p99_us'], result['bytes_per_op'],
+        ))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(OrderedDict([
+                ('commit', git_commit()),
+                ('timestamp', time.time()),
+                ('python', sys.version.split()[0]),
+                ('implementation', platform.python_implementation()),
+                ('results', results),
+            ]), f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,25 @@
 from __future__ import absolute_import
 
-from .core import action, execute
-from .generator import gen, Return
+from .backend import BackendRegistry, backends
+from .core import action, default_executor, execute, execute_many
+from .core import Executor, Outcome
+from .deadline import Timeout
+from .generator import barrier, commit, gen, Return, savepoint
+from .graph import graph, Graph
+from .journal import FileJournal, recover
+from .limit import Limiter, LimiterRegistry, limiters
+from .metrics import Metrics
+from .process import in_process
+from .replay import replay, ReplayDivergence, SQLiteResultStore
+from .retry import Retry
+from .stream import stream, StreamInterrupted
+from .trace import Span, Tracer
 
-__all__ = ['action', 'execute', 'gen', 'Return']
+__all__ = [
+    'action', 'BackendRegistry', 'backends', 'barrier', 'commit',
+    'default_executor', 'execute', 'execute_many', 'Executor', 'gen',
+    'graph', 'Graph', 'in_process', 'Limiter', 'LimiterRegistry', 'limiters',
+    'Metrics', 'Outcome', 'Return', 'FileJournal', 'recover', 'replay',
+    'ReplayDivergence', 'Retry', 'savepoint', 'Span', 'SQLiteResultStore',
+    'stream', 'StreamInterrupted', 'Timeout', 'Tracer',
+]
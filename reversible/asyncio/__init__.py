@@ -0,0 +1,9 @@
+from __future__ import absolute_import
+
+from .core import action, execute, execute_many
+from .generator import barrier, commit, gen, lift, multi, Return, savepoint
+
+__all__ = [
+    'action', 'barrier', 'commit', 'execute', 'execute_many', 'gen', 'lift',
+    'multi', 'Return', 'savepoint',
+]
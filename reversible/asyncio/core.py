@@ -0,0 +1,377 @@
+from __future__ import absolute_import
+
+import asyncio
+import inspect
+from collections import deque
+
+from reversible.core import action
+from reversible.core import default_executor
+from reversible.core import Outcome
+from reversible.core import _deadline, _limited, _retrying, _timed, _traced
+from reversible.core import _observer
+from reversible.deadline import Timeout
+from reversible.retry import _left
+from reversible.trace import _TracedAction as _SyncTracedAction
+
+
+action = action
+
+
+async def _call(fn):
+    """Call ``fn`` and wait for its result if it is awaitable."""
+    result = fn()
+    if inspect.isawaitable(result):
+        result = await result
+    return result
+
+
+class _RetryingAction(object):
+    """Retries the ``forwards`` and ``backwards`` methods of an action,
+    waiting between attempts with ``asyncio.sleep``. Retries stop once
+    ``deadline`` runs out."""
+
+    __slots__ = ('action', 'retry', 'rollback_retry', 'deadline')
+
+    # See reversible.core._unwrap.
+    _transparent = True
+
+    def __init__(self, action, retry, rollback_retry, deadline=None):
+        self.action = action
+        self.retry = retry
+        self.rollback_retry = rollback_retry
+        self.deadline = deadline
+
+    async def forwards(self):
+        if self.retry is None:
+            return await _call(self.action.forwards)
+        return await _retry(
+            self.retry, self.action.forwards, _left(self.deadline)
+        )
+
+    async def backwards(self):
+        if self.rollback_retry is None:
+            return await _call(self.action.backwards)
+        return await _retry(
+            self.rollback_retry, self.action.backwards,
+            _left(self.deadline, True),
+        )
+
+    def __str__(self):
+        return str(self.action)
+
+    __repr__ = __str__
+
+
+async def _retry(policy, fn, left=None):
+    """Like :py:meth:`reversible.Retry.call` for functions that may return
+    awaitables."""
+    attempt = 1
+    while True:
+        try:
+            return await _call(fn)
+        except Exception as error:
+            delay = policy._backoff(fn, error, attempt, left and left())
+            if delay is None:
+                raise
+        await asyncio.sleep(delay)
+        attempt += 1
+
+
+async def _wait_for(fn, seconds):
+    """Calls ``fn`` and awaits its result, cancelling it after ``seconds``."""
+    if seconds is None:
+        return await _call(fn)
+    try:
+        return await asyncio.wait_for(_call(fn), seconds)
+    except asyncio.TimeoutError:
+        raise Timeout('%s did not finish within %.3f seconds.' % (fn, seconds))
+
+
+class _TimedAction(object):
+    """Bounds how long the methods of an action may take. Operations that
+    time out are cancelled."""
+
+    __slots__ = ('action', 'deadline', 'timeout')
+
+    # See reversible.core._unwrap.
+    _transparent = True
+
+    def __init__(self, action, deadline, timeout):
+        self.action = action
+        self.deadline = deadline
+        self.timeout = timeout
+
+    async def forwards(self):
+        seconds = self.timeout
+        if self.deadline is not None:
+            seconds = self.deadline.remaining(seconds)
+        return await _wait_for(self.action.forwards, seconds)
+
+    async def backwards(self):
+        seconds = None
+        if self.deadline is not None:
+            seconds = self.deadline.rollback_remaining()
+        return await _wait_for(self.action.backwards, seconds)
+
+    def __str__(self):
+        return str(self.action)
+
+    __repr__ = __str__
+
+
+async def _acquire(limiter, rollback=False):
+    """Waits for a :py:class:`reversible.Limiter` on the running event loop.
+    """
+    loop = asyncio.get_event_loop()
+    granted = []
+    waiting = []
+
+    def wake():
+        # May be called from another thread, with the limiter's lock held.
+        granted.append(True)
+        if waiting:
+            loop.call_soon_threadsafe(_resolve, waiting[0])
+
+    delay = limiter._enqueue(rollback, wake)
+    if granted:
+        return
+
+    waiting.append(loop.create_future())
+    try:
+        while not granted:
+            if delay is None:
+                await waiting[0]
+            else:
+                await asyncio.wait([waiting[0]], timeout=delay)
+                delay = limiter._poll()
+    except asyncio.CancelledError:
+        limiter._cancel(rollback, wake)
+        raise
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class _LimitedAction(object):
+    """Holds a limiter while the methods of an action run, waiting for it on
+    the event loop."""
+
+    __slots__ = ('action', 'limiter')
+
+    # See reversible.core._unwrap.
+    _transparent = True
+
+    def __init__(self, action, limiter):
+        self.action = action
+        self.limiter = limiter
+
+    async def forwards(self):
+        await _acquire(self.limiter)
+        try:
+            return await _call(self.action.forwards)
+        finally:
+            self.limiter.release()
+
+    async def backwards(self):
+        await _acquire(self.limiter, rollback=True)
+        try:
+            return await _call(self.action.backwards)
+        finally:
+            self.limiter.release()
+
+    def __str__(self):
+        return str(self.action)
+
+    __repr__ = __str__
+
+
+class _TracedAction(_SyncTracedAction):
+    """Records spans for the ``forwards`` and ``backwards`` calls of an
+    action, awaiting their results."""
+
+    __slots__ = ()
+
+    async def _call(self, kind, method):
+        span = self._start(kind)
+        try:
+            result = await _call(method)
+        except Exception as e:
+            self.tracer.finish(span, e)
+            raise
+        self.tracer.finish(span)
+        return result
+
+
+def _bind(action, deadline=None, retry=None, tracer=None, owner=None):
+    """Applies the given deadline and ``(retry, rollback_retry)`` policies to
+    an action, along with its own policies and limiter. If ``tracer`` is
+    given, spans are recorded under the current span of ``owner``."""
+    step = _limited(action, wrap=_LimitedAction)
+    step = _timed(step, deadline, action, wrap=_TimedAction)
+    retry, rollback_retry = retry or (None, None)
+    step = _retrying(
+        step, retry, rollback_retry, action, _RetryingAction, deadline
+    )
+    return _traced(step, tracer, owner, action, _TracedAction)
+
+
+async def execute(action, executor=None, retry=None, rollback_retry=None,
+                  timeout=None, rollback_timeout=None):
+    """Execute the given action.
+
+    The ``forwards`` and/or ``backwards`` methods for the action may be
+    ``async def`` methods or otherwise return awaitables. They are awaited
+    directly on the running event loop.
+
+    .. code-block:: python
+
+        class SaveComment(object):
+
+            def __init__(self, post_id, body):
+                self.post_id = post_id
+                self.body = body
+                self.comment_id = None
+
+            async def forwards(self):
+                self.comment_id = await comments.put(self.post_id, self.body)
+                return self.comment_id
+
+            async def backwards(self):
+                if self.comment_id is not None:
+                    await comments.delete(self.comment_id)
+
+        comment_id = await reversible.asyncio.execute(SaveComment(1, 'hi'))
+
+    See :py:func:`reversible.execute` for more details on the behavior of
+    ``execute``.
+
+    :param action:
+        The action to execute.
+    :param executor:
+        :py:class:`reversible.Executor` whose logging policy and hooks apply
+        to the action. Defaults to :py:data:`reversible.default_executor`.
+    :param retry:
+        :py:class:`reversible.Retry` policy for ``forwards``. Optional. Delays
+        between attempts are spent in ``asyncio.sleep``.
+    :param rollback_retry:
+        :py:class:`reversible.Retry` policy for ``backwards``. Optional.
+    :param timeout:
+        Number of seconds after which the action is cancelled and rolled
+        back. Optional.
+    :param rollback_timeout:
+        Number of seconds rollback may take. Optional.
+    :returns:
+        A coroutine that resolves to the result of executing the action.
+    """
+    if executor is None:
+        executor = default_executor
+
+    step = _bind(
+        action, _deadline(timeout, rollback_timeout), (retry, rollback_retry),
+        _observer(executor),
+    )
+
+    for hook in executor._before:
+        hook(action)
+
+    try:
+        result = await _call(step.forwards)
+    except Exception as error:
+        executor._failed(action, error)
+        try:
+            await _call(step.backwards)
+        except Exception as rollback_error:
+            executor._rollback_failed(action, error, rollback_error)
+            raise
+        else:
+            for hook in executor._rollback:
+                hook(action, error, None)
+            raise
+    else:
+        for hook in executor._after:
+            hook(action, result)
+        return result
+
+
+async def _outcome(action, task):
+    try:
+        return Outcome(action, await task, None)
+    except Exception as e:
+        return Outcome(action, None, e)
+
+
+async def execute_many(actions, max_pending=100, ordered=True, executor=None):
+    """Execute many independent actions concurrently.
+
+    Each action is executed with :py:func:`reversible.asyncio.execute` in its
+    own task, and so is rolled back on its own if it fails. Outcomes are
+    streamed back as :py:class:`reversible.Outcome` objects.
+
+    .. code-block:: python
+
+        async for outcome in reversible.asyncio.execute_many(actions):
+            if outcome.error is not None:
+                log.warning('%s failed: %s', outcome.action, outcome.error)
+
+    At most ``max_pending`` actions are in flight or waiting to be consumed
+    at any time. Actions are pulled from ``actions`` lazily. If the consumer
+    stops early, actions that were already started are allowed to finish.
+
+    See :py:func:`reversible.execute_many` for details.
+
+    :param actions:
+        Iterable of actions to execute.
+    :param max_pending:
+        Maximum number of actions that have been started but whose outcome has
+        not been consumed yet.
+    :param ordered:
+        If true (the default), outcomes are returned in the same order as the
+        actions. Otherwise, they are returned as soon as they are available.
+    :param executor:
+        :py:class:`reversible.Executor` used to execute the actions. Defaults
+        to :py:data:`reversible.default_executor`.
+    :returns:
+        An asynchronous iterator of :py:class:`reversible.Outcome` objects.
+    """
+    if max_pending < 1:
+        raise ValueError('max_pending must be at least 1.')
+
+    actions = iter(actions)
+
+    def start():
+        for action in actions:
+            return action, asyncio.ensure_future(execute(action, executor))
+        return None
+
+    pending = deque() if ordered else {}
+    try:
+        while True:
+            while len(pending) < max_pending:
+                item = start()
+                if item is None:
+                    break
+                if ordered:
+                    pending.append(item)
+                else:
+                    pending[item[1]] = item[0]
+            if not pending:
+                return
+
+            if ordered:
+                action, task = pending.popleft()
+                yield await _outcome(action, task)
+            else:
+                done, _ = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    yield await _outcome(pending.pop(task), task)
+    finally:
+        tasks = [t for _, t in pending] if ordered else list(pending)
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+__all__ = ['action', 'execute', 'execute_many']
@@ -0,0 +1,375 @@
+from __future__ import absolute_import
+
+import types
+import asyncio
+import inspect
+import functools
+from collections import deque
+
+from reversible.core import SimpleAction
+from reversible.core import _coalesce, _pop_rollback, _scatter
+from reversible.generator import Return
+from reversible.generator import _BARRIER, _COMMIT
+from reversible.generator import barrier, commit, savepoint
+from reversible.spill import _check_rollback_log, _rollback_log
+
+from .core import _bind, _call
+
+Return = Return
+
+barrier = barrier
+
+commit = commit
+
+savepoint = savepoint
+
+
+class _Lift(object):
+
+    __slots__ = ('awaitable',)
+
+    def __init__(self, awaitable):
+        self.awaitable = awaitable
+
+    def forwards(self):
+        return self.awaitable
+
+    def backwards(self):
+        pass
+
+
+class _AsyncioMulti(object):
+    """Executes a group of independent actions concurrently.
+
+    If any member fails, the members that succeeded are rolled back
+    concurrently and the first failure (in member order) is raised. The
+    failed members are rolled back when the group itself is rolled back,
+    again concurrently.
+    """
+
+    __slots__ = ('actions', 'count', 'positions', 'pending')
+
+    def __init__(self, actions, saga=None):
+        deadline = retry = tracer = None
+        if saga is not None:
+            deadline, retry = saga.step_deadline, saga.step_retry
+            if saga.step_trace is not None:
+                tracer = saga.step_trace[0]
+
+        actions = list(actions)
+        self.count = len(actions)
+        actions, self.positions = _coalesce(actions)
+        self.actions = [
+            _bind(a, deadline, retry, tracer, saga) for a in actions
+        ]
+
+        # Members that have not been rolled back yet.
+        self.pending = self.actions
+
+    async def forwards(self):
+        outcomes = await asyncio.gather(
+            *[_call(action.forwards) for action in self.actions],
+            return_exceptions=True
+        )
+
+        succeeded = []
+        error = None
+        for action, outcome in zip(self.actions, outcomes):
+            if isinstance(outcome, BaseException):
+                if error is None:
+                    error = outcome
+            else:
+                succeeded.append(action)
+
+        if error is None:
+            return _scatter(outcomes, self.positions, self.count)
+
+        self.pending = list(self.actions)
+        await self._backwards_all(succeeded)
+        raise error
+
+    async def _backwards_all(self, actions):
+        outcomes = await asyncio.gather(
+            *[_call(action.backwards) for action in actions],
+            return_exceptions=True
+        )
+
+        error = None
+        for action, outcome in zip(actions, outcomes):
+            if isinstance(outcome, BaseException):
+                if error is None:
+                    error = outcome
+            else:
+                self.pending.remove(action)
+
+        if error is not None:
+            raise error
+
+    async def backwards(self):
+        if self.pending:
+            await self._backwards_all(list(reversed(self.pending)))
+
+    def __str__(self):
+        return "<AsyncioMulti %s>" % (self.actions,)
+
+    __repr__ = __str__
+
+
+class _AsyncioGeneratorAction(object):
+
+    __slots__ = (
+        'generator', 'executed', 'concurrent_rollback', 'step_retry',
+        'step_deadline', 'step_trace', 'savepoint',
+    )
+
+    def __init__(self, generator, concurrent_rollback=False, savepoint=False,
+                 executed=None):
+        self.generator = generator
+        self.executed = deque() if executed is None else executed
+        self.concurrent_rollback = concurrent_rollback
+        self.savepoint = savepoint
+
+        # Default retry policies for steps, as a (retry, rollback_retry)
+        # tuple, and time budget of the saga. Set by
+        # reversible.asyncio.execute.
+        self.step_retry = None
+        self.step_deadline = None
+
+        # (tracer, span) of the current call while tracing.
+        self.step_trace = None
+
+    def _bind(self, action):
+        return _bind(
+            action, self.step_deadline, self.step_retry,
+            self.step_trace and self.step_trace[0], self,
+        )
+
+    async def forwards(self):
+        generator = self.generator
+        is_async = inspect.isasyncgen(generator)
+        try:
+            if is_async:
+                action = await generator.asend(None)
+            else:
+                action = next(generator)
+
+            while True:
+                if action is _COMMIT:
+                    # Everything executed so far is final.
+                    self.executed.clear()
+                    if is_async:
+                        action = await generator.asend(None)
+                    else:
+                        action = generator.send(None)
+                    continue
+
+                if isinstance(action, (list, tuple)):
+                    action = _AsyncioMulti(action, self)
+                elif (
+                    not hasattr(action, 'forwards') and
+                    inspect.isawaitable(action)
+                ):
+                    action = _Lift(action)
+                elif action is not _BARRIER:
+                    action = self._bind(action)
+
+                self.executed.append(action)
+                try:
+                    result = action.forwards()
+                    if inspect.isawaitable(result):
+                        result = await result
+                except Exception as e:
+                    if is_async:
+                        action = await generator.athrow(e)
+                    else:
+                        action = generator.throw(e)
+                else:
+                    if is_async:
+                        action = await generator.asend(result)
+                    else:
+                        action = generator.send(result)
+        except (StopIteration, StopAsyncIteration, Return) as result:
+            return getattr(result, 'value', None)
+        except Exception:
+            if self.savepoint:
+                await self.backwards()
+            raise
+
+    async def backwards(self):
+        if not self.concurrent_rollback:
+            while self.executed:
+                await _call(_pop_rollback(self.executed, self._bind).backwards)
+            return
+
+        while self.executed:
+            segment = []
+            while self.executed:
+                action = self.executed.pop()
+                if action is _BARRIER:
+                    break
+                segment.append(action)
+
+            if len(segment) == 1:
+                await _call(segment[0].backwards)
+            elif segment:
+                await _AsyncioMulti(segment).backwards()
+
+
+async def _coroutine_result(coroutine):
+    try:
+        return await coroutine
+    except Return as result:
+        return result.value
+
+
+def gen(function=None, concurrent_rollback=False, savepoint=False,
+        max_rollback_depth=None, spill_threshold=None):
+    """Allows using a generator to chain together reversible actions.
+
+    This function is very similar to :py:func:`reversible.gen` except that it
+    may be used with actions whose ``forwards`` and/or ``backwards`` methods
+    are coroutines. If either of those methods return awaitables, the
+    generated action awaits them before moving on.
+
+    The decorated function may be a regular generator or an ``async def``
+    generator. The latter may ``await`` arbitrary coroutines between the
+    actions it yields. Values are returned from ``async def`` generators by
+    raising :py:class:`reversible.asyncio.Return`.
+
+    .. code-block:: python
+
+        @reversible.asyncio.action
+        async def save_comment(ctx, comment):
+            ctx['comment_id'] = await comments.put(comment)
+            return ctx['comment_id']
+
+        @save_comment.backwards
+        async def delete_comment(ctx, comment):
+            if 'comment_id' in ctx:
+                await comments.delete(ctx['comment_id'])
+
+        @reversible.asyncio.gen
+        async def post_comment(post, comment):
+            comment_id = yield save_comment(comment)
+            count = await comments.count(post)
+            yield update_comment_count(post, count + 1)
+            raise reversible.asyncio.Return(comment_id)
+
+    Awaitables that are yielded instead of actions are awaited and their
+    results are sent back to the generator. As with
+    :py:func:`reversible.tornado.lift`, they are not reversible. Yielding a
+    list or tuple of actions executes them concurrently; see
+    :py:func:`reversible.asyncio.multi`. With ``concurrent_rollback``, all
+    actions executed by the generator are rolled back concurrently except
+    across barriers yielded with :py:func:`reversible.barrier`.
+
+    :param function:
+        The generator function. This generator must yield action objects. The
+        ``forwards`` and/or ``backwards`` methods on the action may be
+        coroutines.
+    :param concurrent_rollback:
+        If set, actions executed by the generator between barriers are
+        considered independent and are rolled back concurrently.
+    :param savepoint:
+        If set, actions built by the generator roll back their own steps
+        before raising a failure. See :py:func:`reversible.savepoint`.
+    :param max_rollback_depth:
+        If set, only this many of the most recently executed actions are
+        rolled back. See :py:func:`reversible.gen`.
+    :param spill_threshold:
+        If set, older executed actions are pickled to a temporary file. See
+        :py:func:`reversible.gen`.
+    :returns:
+        An action executable via :py:func:`reversible.asyncio.execute` and
+        yieldable in other instances of :py:func:`reversible.asyncio.gen`.
+        If ``function`` was omitted, a decorator that accepts the generator
+        function is returned.
+    """
+
+    _check_rollback_log(max_rollback_depth, spill_threshold)
+
+    def decorator(function):
+
+        @functools.wraps(function)
+        def new_function(*args, **kwargs):
+            try:
+                value = function(*args, **kwargs)
+            except Return as result:
+                return SimpleAction(
+                    lambda ctx: ctx.value,
+                    lambda _: None,
+                    result,
+                )
+            else:
+                if isinstance(
+                    value, (types.GeneratorType, types.AsyncGeneratorType)
+                ):
+                    return _AsyncioGeneratorAction(
+                        value, concurrent_rollback, savepoint,
+                        _rollback_log(max_rollback_depth, spill_threshold),
+                    )
+                elif inspect.iscoroutine(value):
+                    return SimpleAction(
+                        _coroutine_result,
+                        lambda _: None,
+                        value,
+                    )
+                else:
+                    return SimpleAction(
+                        lambda _: value,
+                        lambda _: None,
+                        None,
+                    )
+
+        return new_function
+
+    if function is not None:
+        return decorator(function)
+    else:
+        return decorator
+
+
+def lift(awaitable):
+    """Returns the result of an awaitable inside a generator-based action.
+
+    This is only needed inside regular generators; ``async def`` generators
+    may simply ``await`` the value. Yielding an awaitable directly has the
+    same effect.
+
+    Note that operations executed through lift are assumed to be
+    non-reversible.
+
+    :param awaitable:
+        Coroutine or Future whose result is required. If it fails, its
+        exception will be propagated back at the yield point.
+    :returns:
+        An action yieldable inside a :py:func:`reversible.asyncio.gen`
+        context.
+    """
+    return _Lift(awaitable)
+
+
+def multi(actions):
+    """Combines independent actions into one action that runs them together.
+
+    The ``forwards`` methods of all the given actions are awaited
+    concurrently and their results are returned as a list, in the same order
+    as the actions. Inside :py:func:`reversible.asyncio.gen`, yielding a list
+    or tuple of actions is equivalent to yielding ``multi`` of them.
+
+    If any of the actions fail, the actions that succeeded are rolled back
+    concurrently and the failure is raised. When the combined action is rolled
+    back, its members are rolled back in the reverse order.
+
+    :param actions:
+        Actions to execute concurrently.
+    :returns:
+        An action executable via :py:func:`reversible.asyncio.execute` and
+        yieldable in other instances of :py:func:`reversible.asyncio.gen`.
+    """
+    return _AsyncioMulti(actions)
+
+
+__all__ = [
+    'barrier', 'commit', 'gen', 'Return', 'lift', 'multi', 'savepoint',
+]
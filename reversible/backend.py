@@ -0,0 +1,150 @@
+from __future__ import absolute_import
+
+import importlib
+import threading
+
+# str and unicode on Python 2.
+_string_types = (str, type(u''))
+
+
+class BackendRegistry(object):
+    """
+    Maps the names of execution backends to the modules that implement them.
+
+    See :py:data:`reversible.backends`. Modules are registered by name and
+    imported the first time they are looked up, so importing
+    :py:mod:`reversible` never imports Tornado, greenlet or asyncio.
+
+    .. code-block:: python
+
+        engine = reversible.backends.get(os.environ.get('ENGINE', 'threads'))
+
+        @engine.gen
+        def submit_order(order):
+            yield charge_card(order.card, order.total)
+            yield reserve_stock(order.items)
+
+        engine.execute(submit_order(order))
+
+    A backend is a module, or any object, that provides the names listed in
+    :py:attr:`interface`: ``action``, ``gen``, ``execute``, ``execute_many``,
+    ``Return``, ``barrier``, ``commit`` and ``savepoint``, with the same
+    meaning as in :py:mod:`reversible`. Backends are checked for them when
+    they are registered or imported. The asynchronous backends also provide
+    ``multi`` and ``lift``, and their ``execute`` returns a Future or
+    coroutine instead of the result.
+
+    The following backends are registered by default:
+
+    ``threads``
+        :py:mod:`reversible.threads`. Actions run on the calling thread, and
+        groups of actions on a thread pool.
+    ``tornado``
+        :py:mod:`reversible.tornado`. Generators run in greenlets on the
+        IOLoop.
+    ``tornado_native``
+        :py:mod:`reversible.tornado_native`. Generators are driven by Tornado
+        coroutines.
+    ``asyncio``
+        :py:mod:`reversible.asyncio`. Actions are awaited on the running
+        event loop.
+
+    Other backends, such as one for gevent, may be provided by other packages
+    and registered under their own name.
+    """
+
+    #: Names that every backend must provide.
+    interface = (
+        'action', 'gen', 'execute', 'execute_many', 'Return', 'barrier',
+        'commit', 'savepoint',
+    )
+
+    def __init__(self):
+        # name -> dotted module name, or the backend once it was imported
+        self._backends = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, backend):
+        """Registers a backend under the given name.
+
+        :param backend:
+            The dotted name of the module that implements the backend, which
+            is imported when the backend is first looked up, or the backend
+            itself.
+        :raises TypeError:
+            If the backend doesn't provide the :py:attr:`interface`.
+        """
+        if not isinstance(backend, _string_types):
+            self._check(name, backend)
+        with self._lock:
+            self._backends[name] = backend
+
+    def get(self, name):
+        """Returns the backend registered under the given name, importing its
+        module if needed.
+
+        :raises ValueError:
+            If no backend is registered under that name.
+        :raises ImportError:
+            If the module of the backend or one of its dependencies can't be
+            imported.
+        :raises TypeError:
+            If the module of the backend doesn't provide the
+            :py:attr:`interface`.
+        """
+        try:
+            backend = self._backends[name]
+        except KeyError:
+            raise ValueError('Unknown backend %r. Available backends: %s' % (
+                name, ', '.join(self.names()),
+            ))
+
+        if isinstance(backend, _string_types):
+            # Imported outside of the lock: importlib has its own locks and
+            # the module may look up other backends while it's imported.
+            module = importlib.import_module(backend)
+            self._check(name, module)
+            with self._lock:
+                if self._backends.get(name) is backend:
+                    self._backends[name] = module
+            backend = module
+        return backend
+
+    def is_loaded(self, name):
+        """Returns True if the backend registered under the given name was
+        imported already."""
+        return not isinstance(self._backends.get(name, ''), _string_types)
+
+    def _check(self, name, backend):
+        missing = [
+            attr for attr in self.interface if not hasattr(backend, attr)
+        ]
+        if missing:
+            raise TypeError('Backend %r does not provide %s.' % (
+                name, ', '.join(missing),
+            ))
+
+    def names(self):
+        """Returns the names of the registered backends, sorted."""
+        return sorted(self._backends)
+
+    def remove(self, name):
+        """Unregisters a backend."""
+        with self._lock:
+            self._backends.pop(name, None)
+
+    def __str__(self):
+        return "<BackendRegistry %s>" % (self.names(),)
+
+    __repr__ = __str__
+
+
+#: The :py:class:`reversible.BackendRegistry` of available backends.
+backends = BackendRegistry()
+backends.register('threads', 'reversible.threads')
+backends.register('tornado', 'reversible.tornado')
+backends.register('tornado_native', 'reversible.tornado_native')
+backends.register('asyncio', 'reversible.asyncio')
+
+
+__all__ = ['BackendRegistry', 'backends']
@@ -1,12 +1,280 @@
 from __future__ import absolute_import
 
+import sys
+import pickle
 import logging
+from collections import deque, namedtuple
+
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from .retry import _RetryingAction
+from .deadline import _Deadline, _TimedAction
+from .limit import _LimitedAction, limiters
+from .trace import _TracedAction, _TracerGroup
 
 
 log = logging.getLogger('reversible')
 
 
-def execute(action):
+def _default_max_workers():
+    # Imported here because multiprocessing is slow to import and only
+    # needed once a thread pool is created.
+    import multiprocessing
+
+    try:
+        return multiprocessing.cpu_count() * 5
+    except NotImplementedError:  # pragma: no cover
+        return 5
+
+
+class Outcome(namedtuple('Outcome', 'action value error')):
+    """
+    The outcome of executing an action with
+    :py:func:`reversible.execute_many`.
+
+    ``value`` is the result of the action if it succeeded. ``error`` is the
+    exception raised by :py:func:`reversible.execute` if it failed, or None.
+    """
+
+    __slots__ = ()
+
+    def result(self):
+        """Returns the result of the action or raises its exception."""
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+class Executor(object):
+    """
+    Executes actions and decides how their failures are reported.
+
+    :py:func:`reversible.execute` uses a default instance of this class,
+    :py:data:`reversible.default_executor`. Separate instances may be created
+    to log to a different logger, to treat some failures as expected, or to
+    observe execution with hooks.
+
+    .. code-block:: python
+
+        executor = reversible.Executor(expected=(OutOfStock,))
+
+        @executor.after
+        def record_success(action, result):
+            stats.incr('saga.success')
+
+        @executor.on_rollback
+        def record_rollback(action, error, rollback_error):
+            stats.incr('saga.rollback')
+
+        executor.execute(submit_order(order))
+
+    Failures of ``forwards`` are logged at the ``ERROR`` level with their
+    traceback, unless they are expected, in which case they are logged at the
+    ``DEBUG`` level without one. Failures of ``backwards`` are always logged
+    with their traceback. Nothing is formatted unless the logger is enabled
+    for the corresponding level.
+
+    Hooks are called synchronously in the order in which they were
+    registered. Registering no hooks costs nothing.
+
+    :param logger:
+        Logger used to report failures. Defaults to the ``reversible`` logger.
+    :param expected:
+        A tuple of exception classes, or a function that accepts an exception
+        and returns True if it is expected. Expected failures are still rolled
+        back and raised.
+    :param tracer:
+        :py:class:`reversible.Tracer` that records a span for every
+        ``forwards`` and ``backwards`` call, including those of the steps of
+        generator-based actions. Optional.
+    :param metrics:
+        :py:class:`reversible.Metrics` that counts and times the same calls.
+        Optional.
+    """
+
+    def __init__(self, logger=None, expected=None, tracer=None,
+                 metrics=None):
+        self.logger = logger or log
+        self.expected = expected
+        self.tracer = tracer
+        self.metrics = metrics
+
+        self._before = []
+        self._after = []
+        self._rollback = []
+
+    def before(self, hook):
+        """Registers a hook called with the action before it is executed.
+
+        May be used as a decorator.
+        """
+        self._before.append(hook)
+        return hook
+
+    def after(self, hook):
+        """Registers a hook called with the action and its result after it
+        succeeds.
+
+        May be used as a decorator.
+        """
+        self._after.append(hook)
+        return hook
+
+    def on_rollback(self, hook):
+        """Registers a hook called after a failed action was rolled back.
+
+        The hook is called with the action, the exception raised by its
+        ``forwards`` method, and the exception raised by its ``backwards``
+        method or None if the rollback succeeded.
+
+        May be used as a decorator.
+        """
+        self._rollback.append(hook)
+        return hook
+
+    def is_expected(self, error):
+        """Returns True if the given exception is an expected failure."""
+        expected = self.expected
+        if expected is None:
+            return False
+        elif isinstance(expected, tuple):
+            return isinstance(error, expected)
+        else:
+            return expected(error)
+
+    def execute(self, action, journal=None, retry=None, rollback_retry=None,
+                timeout=None, rollback_timeout=None):
+        """Execute the given action.
+
+        See :py:func:`reversible.execute` for details.
+        """
+        step = action
+        saga = None
+        if journal is not None:
+            saga = journal.begin()
+            step = saga.bind(step)
+        deadline = _deadline(timeout, rollback_timeout)
+        step = _limited(step, action)
+        step = _timed(step, deadline, action)
+        step = _retrying(
+            step, retry, rollback_retry, action, deadline=deadline
+        )
+        step = _traced(step, _observer(self), None, action)
+        return self._run(action, step, saga)
+
+    def _run(self, action, step, saga=None):
+        # Hooks are called with the action as given, not with the wrappers
+        # used to journal, time, retry and trace it.
+        for hook in self._before:
+            hook(action)
+
+        try:
+            result = step.forwards()
+        except Exception as error:
+            self._failed(action, error)
+            try:
+                step.backwards()
+            except Exception as rollback_error:
+                self._rollback_failed(action, error, rollback_error)
+                raise
+            else:
+                for hook in self._rollback:
+                    hook(action, error, None)
+                if saga is not None:
+                    saga.end()
+                raise
+        else:
+            for hook in self._after:
+                hook(action, result)
+            if saga is not None:
+                saga.end()
+            return result
+
+    def execute_many(self, actions, max_workers=None, max_pending=None,
+                     ordered=True, thread_pool=None):
+        """Execute many independent actions on a thread pool.
+
+        See :py:func:`reversible.execute_many` for details.
+        """
+        if max_workers is None:
+            max_workers = _default_max_workers()
+        if max_pending is None:
+            max_pending = max_workers * 2
+        if max_pending < 1:
+            raise ValueError('max_pending must be at least 1.')
+
+        owns_pool = thread_pool is None
+        if owns_pool:
+            thread_pool = ThreadPoolExecutor(max_workers)
+
+        return self._execute_many(
+            iter(actions), max_pending, ordered, thread_pool, owns_pool
+        )
+
+    def _execute_many(self, actions, max_pending, ordered, thread_pool,
+                      owns_pool):
+
+        def submit():
+            for action in actions:
+                return action, thread_pool.submit(self.execute, action)
+            return None
+
+        try:
+            if ordered:
+                pending = deque()
+                while True:
+                    while len(pending) < max_pending:
+                        item = submit()
+                        if item is None:
+                            break
+                        pending.append(item)
+                    if not pending:
+                        return
+
+                    action, future = pending.popleft()
+                    yield _outcome(action, future)
+            else:
+                pending = {}
+                while True:
+                    while len(pending) < max_pending:
+                        item = submit()
+                        if item is None:
+                            break
+                        pending[item[1]] = item[0]
+                    if not pending:
+                        return
+
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield _outcome(pending.pop(future), future)
+        finally:
+            if owns_pool:
+                thread_pool.shutdown(wait=True)
+
+    def _failed(self, action, error):
+        logger = self.logger
+        if self.is_expected(error):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    '%s failed to execute: %r. Rolling back.', action, error
+                )
+        elif logger.isEnabledFor(logging.ERROR):
+            logger.error(
+                '%s failed to execute. Rolling back.', action, exc_info=True
+            )
+
+    def _rollback_failed(self, action, error, rollback_error):
+        self.logger.exception('%s failed to roll back.', action)
+        for hook in self._rollback:
+            hook(action, error, rollback_error)
+
+
+#: The :py:class:`Executor` used by :py:func:`reversible.execute`.
+default_executor = Executor()
+
+
+def execute(action, journal=None, retry=None, rollback_retry=None,
+            timeout=None, rollback_timeout=None):
     """
     Execute the given action.
 
@@ -37,8 +305,59 @@ def execute(action):
     :py:func:`reversible.action` decorator. Actions may be composed together
     using the :py:func:`reversible.gen` decorator.
 
+    If a ``journal`` such as :py:class:`reversible.FileJournal` is given, the
+    steps completed by the action are recorded in it so that they can be
+    rolled back with :py:func:`reversible.recover` if the process dies before
+    the action finishes.
+
+    ``retry`` and ``rollback_retry`` are :py:class:`reversible.Retry` policies
+    for the ``forwards`` and ``backwards`` methods of the action. If the action
+    is built with :py:func:`reversible.gen`, they apply to each of its steps,
+    including the steps of nested generators, instead. Actions that declare
+    their own policies with :py:func:`reversible.action` keep them.
+
+    .. code-block:: python
+
+        reversible.execute(
+            submit_order(order),
+            retry=reversible.Retry(attempts=3, retry_on=(Timeout,)),
+            rollback_retry=reversible.Retry(attempts=10, max_backoff=60),
+        )
+
+    ``timeout`` bounds the time in seconds the action may take. For
+    :py:func:`reversible.gen` actions, it is a deadline for the whole saga,
+    shared with nested generators: a step that is still running when the
+    deadline expires is abandoned and :py:class:`reversible.Timeout` is raised
+    at its yield point, and no step is started after the deadline. Rollback
+    then gets its own budget of ``rollback_timeout`` seconds, counted from the
+    first ``backwards`` call. Steps that exceed it abort the rollback with
+    :py:class:`reversible.Timeout`. Retries don't outlast either budget:
+    delays between attempts end at the deadline, and attempts that fail
+    after it are not retried.
+
+    Python can't interrupt a function call, so bounded steps run on a
+    separate thread pool while the saga waits for them. An abandoned step
+    keeps running in the background. If it is rolled back, its ``backwards``
+    method is called once it finishes, in the background too, so that it
+    sees the context left behind by ``forwards``. Failures of such late
+    rollbacks are logged.
+
+    The action is executed by :py:data:`reversible.default_executor`. See
+    :py:class:`reversible.Executor` to configure logging or add hooks.
+
     :param action:
         The action to execute.
+    :param journal:
+        Journal in which completed steps are recorded. Optional.
+    :param retry:
+        :py:class:`reversible.Retry` policy for ``forwards``. Optional.
+    :param rollback_retry:
+        :py:class:`reversible.Retry` policy for ``backwards``. Optional.
+    :param timeout:
+        Number of seconds after which the action is abandoned and rolled
+        back. Optional.
+    :param rollback_timeout:
+        Number of seconds rollback may take. Optional.
     :returns:
         The value returned by the ``forwards()`` method of the action.
     :raises:
@@ -46,19 +365,62 @@ def execute(action):
         succeeded. Otherwise, the exception raised by the ``backwards()``
         method is raised.
     """
-    # TODO this should probably be a class to configure logging, etc. The
-    # global execute can refer to the "default" instance of the executor.
+    return default_executor.execute(
+        action, journal, retry, rollback_retry, timeout, rollback_timeout
+    )
+
+
+def execute_many(actions, max_workers=None, max_pending=None, ordered=True,
+                 thread_pool=None):
+    """
+    Execute many independent actions concurrently.
+
+    Each action is executed with :py:func:`reversible.execute` on a thread
+    pool, and so is rolled back on its own if it fails. Outcomes are streamed
+    back as :py:class:`reversible.Outcome` objects as the actions finish.
+
+    .. code-block:: python
+
+        orders = (submit_order(o) for o in OrderQueue.consume())
+        for outcome in reversible.execute_many(orders, max_workers=16):
+            if outcome.error is not None:
+                log.warning('%s failed: %s', outcome.action, outcome.error)
+
+    Actions are pulled from ``actions`` lazily. At most ``max_pending``
+    actions are in flight or waiting to be consumed at any time, so a slow
+    consumer holds back new work instead of letting outcomes pile up.
+
+    The action is executed by :py:data:`reversible.default_executor`. See
+    :py:meth:`reversible.Executor.execute_many` to use a different executor.
+
+    :param actions:
+        Iterable of actions to execute.
+    :param max_workers:
+        Number of threads used to execute actions. Ignored if ``thread_pool``
+        is given.
+    :param max_pending:
+        Maximum number of actions that have been started but whose outcome has
+        not been consumed yet. Defaults to twice ``max_workers``.
+    :param ordered:
+        If true (the default), outcomes are returned in the same order as the
+        actions. Otherwise, they are returned as soon as they are available.
+    :param thread_pool:
+        ``concurrent.futures.Executor`` to execute actions on. If omitted, a
+        thread pool is created and shut down once all outcomes have been
+        consumed.
+    :returns:
+        An iterator of :py:class:`reversible.Outcome` objects.
+    """
+    return default_executor.execute_many(
+        actions, max_workers, max_pending, ordered, thread_pool
+    )
+
+
+def _outcome(action, future):
     try:
-        return action.forwards()
-    except Exception:
-        log.exception('%s failed to execute. Rolling back.', action)
-        try:
-            action.backwards()
-        except Exception:
-            log.exception('%s failed to roll back.', action)
-            raise
-        else:
-            raise
+        return Outcome(action, future.result(), None)
+    except Exception as e:
+        return Outcome(action, None, e)
 
 
 class SimpleAction(object):
@@ -87,25 +449,387 @@ class SimpleAction(object):
     __repr__ = __str__
 
 
+class BoundAction(object):
+    """
+    An action built by calling a function decorated with
+    :py:func:`reversible.action`.
+
+    Bound actions may be pickled if the decorated function is defined at the
+    top level of a module and the arguments and context are picklable.
+
+    The context is created the first time the action is executed or rolled
+    back. Until then, ``context`` is None.
+    """
+
+    __slots__ = ('builder', 'args', 'kwargs', 'context')
+
+    def __init__(self, builder, args, kwargs, context=None):
+        self.builder = builder
+        self.args = args
+        self.kwargs = kwargs
+        self.context = context
+
+    def _get_context(self):
+        context = self.context
+        if context is None:
+            context = self.context = self.builder._context_class()
+        return context
+
+    def forwards(self):
+        # _get_context, inlined because this runs for every step.
+        context = self.context
+        if context is None:
+            context = self.context = self.builder._context_class()
+        return self.builder._forwards(context, *self.args, **self.kwargs)
+
+    def backwards(self):
+        context = self.context
+        if context is None:
+            context = self.context = self.builder._context_class()
+        return self.builder._backwards(context, *self.args, **self.kwargs)
+
+    def __reduce__(self):
+        return (
+            BoundAction, (self.builder, self.args, self.kwargs, self.context)
+        )
+
+    def __str__(self):
+        return "<BoundAction %s, %s, %s, %s>" % (
+            self.builder, self.args, self.kwargs, self.context
+        )
+
+    __repr__ = __str__
+
+
+class _BatchAction(object):
+    """
+    Executes compatible bound actions with a single bulk call.
+
+    See :py:meth:`ActionBuilder.forwards_many`.
+    """
+
+    __slots__ = ('builder', 'actions')
+
+    def __init__(self, builder, actions):
+        self.builder = builder
+        self.actions = actions
+
+    def _arguments(self):
+        return (
+            [a._get_context() for a in self.actions],
+            [(a.args, a.kwargs) for a in self.actions],
+        )
+
+    def forwards(self):
+        return self.builder._forwards_many(*self._arguments())
+
+    def backwards(self):
+        return self.builder._backwards_many(*self._arguments())
+
+    def __str__(self):
+        return "<BatchAction %s, %s>" % (self.builder, self.actions)
+
+    __repr__ = __str__
+
+
+def _builder(action):
+    """Returns the builder of a bound action or a batch of them, or None."""
+    if type(action) is BoundAction or type(action) is _BatchAction:
+        return action.builder
+    return None
+
+
+def _unwrap(action):
+    """Returns the action wrapped by the engine to apply the policies of the
+    saga.
+
+    Wrappers that only retry, time, limit or trace an action are marked with
+    a true ``_transparent`` attribute. An action rolled back in bulk with
+    others may be rolled back without them, as long as the batch is wrapped
+    again.
+    """
+    # Looked up on the type so that mocks don't look like wrappers.
+    while getattr(type(action), '_transparent', False) and action._transparent:
+        action = action.action
+    return action
+
+
+def _rollback_key(action):
+    """Returns the key under which the given action may be rolled back in bulk
+    or None."""
+    action = _unwrap(action)
+    if type(action) is not BoundAction:
+        return None
+    builder = action.builder
+    if builder._backwards_many is None:
+        return None
+    if builder._batch_key is None:
+        return (builder,)
+    return (builder, builder._batch_key(*action.args, **action.kwargs))
+
+
+def _batch_key(action):
+    """Returns the key under which the given action may be batched or None."""
+    if type(action) is not BoundAction:
+        return None
+    if action.builder._forwards_many is None:
+        return None
+    return _rollback_key(action)
+
+
+def _pop_batch(executed, key=_rollback_key):
+    """Pops the last action from the given deque along with the actions before
+    it that can be rolled back with it in bulk.
+
+    The actions are returned in the order in which they must be rolled back.
+    """
+    action = executed.pop()
+    batch = [action]
+
+    action_key = key(action)
+    if action_key is not None:
+        while executed and key(executed[-1]) == action_key:
+            batch.append(executed.pop())
+    return batch
+
+
+def _pop_rollback(executed, bind=None):
+    """Pops the next action to roll back from the given deque of executed
+    actions.
+
+    Adjacent actions that can be rolled back with a single call to
+    ``backwards_many`` are popped together and returned as one action. The
+    wrappers of the actions in the batch are dropped, and ``bind``, if given,
+    wraps the batch again.
+    """
+    batch = _pop_batch(executed)
+    if len(batch) == 1:
+        return batch[0]
+    batch = [_unwrap(a) for a in batch]
+    action = _BatchAction(batch[0].builder, batch)
+    if bind is not None:
+        action = bind(action)
+    return action
+
+
+def _coalesce(actions):
+    """Groups compatible actions into batches.
+
+    Returns the list of actions to execute and, if any batches were formed, a
+    list holding, for each of them, the index of the original action or the
+    list of indexes of the original actions in the batch. Use
+    :py:func:`_scatter` to map the results back to the original actions.
+    """
+    keys = [_batch_key(a) for a in actions]
+    if keys.count(None) >= len(keys) - 1:
+        return actions, None
+
+    groups = {}
+    positions = []
+    for i, key in enumerate(keys):
+        if key is None:
+            positions.append(i)
+        elif key in groups:
+            groups[key].append(i)
+        else:
+            groups[key] = group = [i]
+            positions.append(group)
+
+    if len(positions) == len(actions):
+        return actions, None
+
+    units = []
+    for i, position in enumerate(positions):
+        if not isinstance(position, list):
+            units.append(actions[position])
+        elif len(position) == 1:
+            positions[i] = position[0]
+            units.append(actions[position[0]])
+        else:
+            members = [actions[j] for j in position]
+            units.append(_BatchAction(members[0].builder, members))
+    return units, positions
+
+
+def _scatter(results, positions, count):
+    """Maps results of actions returned by :py:func:`_coalesce` back to the
+    original actions."""
+    if positions is None:
+        return results
+
+    scattered = [None] * count
+    for result, position in zip(results, positions):
+        if not isinstance(position, list):
+            scattered[position] = result
+            continue
+
+        result = list(result)
+        if len(result) != len(position):
+            raise ValueError(
+                'forwards_many returned %d results for %d actions.'
+                % (len(result), len(position))
+            )
+        for i, value in zip(position, result):
+            scattered[i] = value
+    return scattered
+
+
+def _retrying(action, retry=None, rollback_retry=None, source=None,
+              wrap=_RetryingAction, deadline=None):
+    """Applies retry policies to an action.
+
+    ``source`` is the action as it was built, before being wrapped by the
+    engine or the journal. Its own policies take precedence over ``retry``
+    and ``rollback_retry``. ``wrap`` builds the retrying action and defaults
+    to one that sleeps with ``time.sleep``. Retries stop once ``deadline``,
+    the time budget of the saga, runs out.
+
+    Generator-based actions can't be retried as a whole. The policies are
+    recorded on them instead and applied to each of their steps.
+    """
+    if source is None:
+        source = action
+
+    builder = _builder(source)
+    if builder is not None:
+        retry = builder._retry or retry
+        rollback_retry = builder._rollback_retry or rollback_retry
+    elif hasattr(type(source), 'step_retry'):
+        # Looked up on the type so that mocks don't look like generators.
+        if source.step_retry is None and (retry or rollback_retry):
+            source.step_retry = (retry, rollback_retry)
+        return action
+
+    if retry is None and rollback_retry is None:
+        return action
+    return wrap(action, retry, rollback_retry, deadline=deadline)
+
+
+def _deadline(timeout=None, rollback_timeout=None):
+    """Returns the time budget for a saga, or None if it is unbounded."""
+    if timeout is None and rollback_timeout is None:
+        return None
+    return _Deadline(timeout, rollback_timeout)
+
+
+def _timed(action, deadline=None, source=None, wrap=_TimedAction):
+    """Bounds how long an action may take.
+
+    ``source`` is the action as it was built. Its own ``timeout`` applies in
+    addition to ``deadline``, the time budget of the saga.
+
+    Generator-based actions record the deadline and apply it to each of their
+    steps instead.
+    """
+    if source is None:
+        source = action
+
+    timeout = None
+    builder = _builder(source)
+    if builder is not None:
+        timeout = builder._timeout
+    elif hasattr(type(source), 'step_deadline'):
+        # Looked up on the type so that mocks don't look like generators.
+        if source.step_deadline is None:
+            source.step_deadline = deadline
+        return action
+
+    if timeout is None and deadline is None:
+        return action
+    return wrap(action, deadline, timeout)
+
+
+def _limited(action, source=None, wrap=_LimitedAction):
+    """Makes an action wait for the limiter of its resource class, if any.
+
+    ``source`` is the action as it was built. Only actions built with
+    :py:func:`reversible.action` declare a resource class.
+    """
+    if source is None:
+        source = action
+
+    builder = _builder(source)
+    if builder is None or builder._resource is None:
+        return action
+    limiter = limiters.get(builder._resource)
+    if limiter is None:
+        return action
+    return wrap(action, limiter)
+
+
+def _action_name(action):
+    """Returns the name under which spans of an action are recorded."""
+    builder = _builder(action)
+    if builder is not None:
+        function = builder._forwards
+    elif hasattr(type(action), 'generator'):
+        # Generator objects carry the name of their function.
+        function = action.generator
+    else:
+        return type(action).__name__
+    return getattr(function, '__qualname__', None) or function.__name__
+
+
+def _observer(executor):
+    """Returns the tracer to which the calls made by an executor are
+    reported, or None."""
+    tracer, metrics = executor.tracer, executor.metrics
+    if metrics is None:
+        return tracer
+    if tracer is None:
+        return metrics
+    return _TracerGroup((tracer, metrics))
+
+
+def _traced(action, tracer=None, owner=None, source=None,
+            wrap=_TracedAction):
+    """Records spans for an action if tracing is enabled.
+
+    ``owner`` is the generator-based action executing ``source``, the action
+    as it was built. Spans of ``source`` are nested under the owner's span.
+    """
+    if tracer is None:
+        return action
+    if source is None:
+        source = action
+    return wrap(action, tracer, _action_name(source), owner, source)
+
+
+def _find_builder(module, name):
+    __import__(module)
+    obj = sys.modules[module]
+    for attr in name.split('.'):
+        obj = getattr(obj, attr)
+    return obj
+
+
 class ActionBuilder(object):
     """Builds an action in two steps."""
 
-    __slots__ = ('_forwards', '_backwards', '_context_class')
+    __slots__ = (
+        '_forwards', '_backwards', '_context_class', '_batch_key',
+        '_forwards_many', '_backwards_many', '_retry', '_rollback_retry',
+        '_timeout', '_resource',
+    )
 
-    def __init__(self, forwards, context_class):
+    def __init__(self, forwards, context_class, batch_key=None, retry=None,
+                 rollback_retry=None, timeout=None, resource=None):
         self._forwards = forwards
         self._backwards = None
         self._context_class = context_class
+        self._batch_key = batch_key
+        self._retry = retry
+        self._rollback_retry = rollback_retry
+        self._timeout = timeout
+        self._resource = resource
+        self._forwards_many = None
+        self._backwards_many = None
 
     def __call__(self, *args, **kwargs):
         if self._backwards is None:
             raise ValueError('All actions must have a backwards action.')
 
-        return SimpleAction(
-            lambda ctx: self._forwards(ctx, *args, **kwargs),
-            lambda ctx: self._backwards(ctx, *args, **kwargs),
-            self._context_class(),
-        )
+        return BoundAction(self, args, kwargs)
 
     def backwards(self, backwards):
         """Decorator to specify the ``backwards`` action."""
@@ -116,13 +840,69 @@ class ActionBuilder(object):
         self._backwards = backwards
         return backwards
 
+    def forwards_many(self, forwards_many):
+        """Decorator to specify a bulk ``forwards`` implementation.
+
+        The bulk implementation is called with a list of contexts and a list
+        of ``(args, kwargs)`` tuples, one for each action, and must return a
+        list of results in the same order.
+
+        Actions built by this builder that are yielded together in a list or
+        tuple inside :py:func:`reversible.gen` are executed with a single call
+        to the bulk implementation instead of one call each, provided they
+        have the same ``batch_key``. A ``backwards_many`` implementation is
+        required for this. The batch is a single step: the retry policies,
+        timeout and resource class of the action, and tracing, apply to the
+        bulk call as a whole.
+        """
+
+        if self._forwards_many is not None:
+            raise ValueError('Bulk forwards action already specified.')
+
+        self._forwards_many = forwards_many
+        return forwards_many
+
+    def backwards_many(self, backwards_many):
+        """Decorator to specify a bulk ``backwards`` implementation.
+
+        The bulk implementation is called with the same arguments as the
+        ``forwards_many`` implementation and rolls back all the given actions
+        at once.
+
+        This may be specified without ``forwards_many``. When a
+        :py:func:`reversible.gen` action is rolled back, adjacent actions
+        built by this builder with the same ``batch_key`` are rolled back with
+        a single call to the bulk implementation, most recent action first.
+        Actions that were journaled or recorded for replay are rolled back
+        one by one.
+        """
+
+        if self._backwards_many is not None:
+            raise ValueError('Bulk backwards action already specified.')
+
+        self._backwards_many = backwards_many
+        return backwards_many
+
+    def __reduce__(self):
+        # Builders are pickled by reference to the decorated function.
+        module = self._forwards.__module__
+        name = getattr(
+            self._forwards, '__qualname__', self._forwards.__name__
+        )
+        if '<locals>' in name or '<lambda>' in name:
+            raise pickle.PicklingError(
+                '%s is not defined at the top level of a module.' % name
+            )
+        return (_find_builder, (module, name))
+
     def __str__(self):
         return "<ActionBuilder %s, %s>" % (self._forwards, self._backwards)
 
     __repr__ = __str__
 
 
-def action(forwards=None, context_class=None):
+def action(forwards=None, context_class=None, batch_key=None, retry=None,
+           rollback_retry=None, timeout=None, resource=None):
     """
     Decorator to build functions.
 
@@ -175,6 +955,47 @@ def action(forwards=None, context_class=None):
     Note that a backwards action is required. Attempts to use the action
     without specifying a way to roll back will fail.
 
+    Transient failures may be retried before the action is considered failed
+    by giving a :py:class:`reversible.Retry` policy for ``forwards`` and/or
+    ``backwards``.
+
+    .. code-block:: python
+
+        @reversible.action(retry=reversible.Retry(attempts=3))
+        def charge_card(context, card, amount):
+            context['charge_id'] = Payments.charge(card, amount)
+
+    Actions that are cheaper to execute in bulk may also specify
+    ``forwards_many`` and ``backwards_many`` implementations. Compatible
+    actions yielded together in a list or tuple are then executed with a
+    single call to the bulk implementation, and each yield point still
+    receives its own result. Adjacent compatible actions are also rolled back
+    with a single call to ``backwards_many``.
+
+    .. code-block:: python
+
+        @reversible.action
+        def add_item(context, item):
+            context['item_id'] = ItemStore.put(item)
+            return context['item_id']
+
+        @add_item.forwards_many
+        def add_items(contexts, arguments):
+            item_ids = ItemStore.put_many([args[0] for args, _ in arguments])
+            for context, item_id in zip(contexts, item_ids):
+                context['item_id'] = item_id
+            return item_ids
+
+        @add_item.backwards_many
+        def remove_items(contexts, arguments):
+            ItemStore.delete_many(
+                [c['item_id'] for c in contexts if 'item_id' in c]
+            )
+
+        @reversible.gen
+        def add_items_to_order(order, items):
+            item_ids = yield [add_item(item) for item in items]
+
     :param forwards:
         The function will be treated as the ``forwards`` implementation.
     :param context_class:
@@ -182,6 +1003,29 @@ def action(forwards=None, context_class=None):
         own context object and that object will be implictly passed as the
         first argument to both, the ``forwards`` and the ``backwards``
         implementations.
+    :param batch_key:
+        Function called with the arguments of an action to decide which
+        actions may be executed together by ``forwards_many`` or rolled back
+        together by ``backwards_many``. Only actions with equal keys are
+        batched. If omitted, all actions built by the decorated function may
+        be batched together.
+    :param retry:
+        :py:class:`reversible.Retry` policy for the ``forwards``
+        implementation. It takes precedence over the policy given to
+        :py:func:`reversible.execute`.
+    :param rollback_retry:
+        :py:class:`reversible.Retry` policy for the ``backwards``
+        implementation.
+    :param timeout:
+        Number of seconds after which an attempt of the ``forwards``
+        implementation is abandoned with :py:class:`reversible.Timeout`. The
+        deadline of the saga, if any, also applies. See
+        :py:func:`reversible.execute`.
+    :param resource:
+        Name of the resource class used by the action. If a
+        :py:class:`reversible.Limiter` is registered for it in
+        :py:data:`reversible.limiters`, the ``forwards`` and ``backwards``
+        implementations wait for it before running.
     :returns:
         If ``forwards`` was given, a partially constructed action is returned.
         The ``backwards`` method on that object can be used as a decorator to
@@ -191,7 +1035,10 @@ def action(forwards=None, context_class=None):
     context_class = context_class or dict
 
     def decorator(_forwards):
-        return ActionBuilder(_forwards, context_class)
+        return ActionBuilder(
+            _forwards, context_class, batch_key, retry, rollback_retry,
+            timeout, resource,
+        )
 
     if forwards is not None:
         return decorator(forwards)
@@ -199,4 +1046,7 @@ def action(forwards=None, context_class=None):
         return decorator
 
 
-__all__ = ['action', 'execute']
+__all__ = [
+    'action', 'default_executor', 'execute', 'execute_many', 'Executor',
+    'Outcome',
+]
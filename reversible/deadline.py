@@ -0,0 +1,198 @@
+from __future__ import absolute_import
+
+import time
+import logging
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as _FutureTimeout
+
+
+log = logging.getLogger('reversible')
+
+_now = getattr(time, 'monotonic', time.time)
+
+_timeout_pool = None
+_timeout_pool_lock = threading.Lock()
+
+
+class Timeout(Exception):
+    """Raised when an action or a saga runs out of time.
+
+    See the ``timeout`` arguments of :py:func:`reversible.action` and
+    :py:func:`reversible.execute`.
+    """
+
+
+class _Deadline(object):
+    """The time budget of a saga, shared by all of its steps.
+
+    The rollback budget starts when the first step is rolled back.
+    """
+
+    __slots__ = ('expires', 'rollback_timeout', 'rollback_expires')
+
+    def __init__(self, timeout=None, rollback_timeout=None):
+        self.expires = None if timeout is None else _now() + timeout
+        self.rollback_timeout = rollback_timeout
+        self.rollback_expires = None
+
+    def remaining(self, timeout=None):
+        """Returns the number of seconds the next step may run for, or None if
+        it is unbounded.
+
+        :param timeout:
+            The step's own timeout, if any.
+        :raises Timeout:
+            If the saga has run out of time.
+        """
+        if self.expires is not None:
+            left = self.expires - _now()
+            if left <= 0:
+                raise Timeout('Saga deadline exceeded.')
+            if timeout is None or left < timeout:
+                timeout = left
+        return timeout
+
+    def left(self, rollback=False):
+        """Returns the number of seconds left before the deadline of the saga
+        or of its rollback, or None if it is unbounded.
+
+        Unlike :py:meth:`remaining`, this doesn't raise once the deadline has
+        passed; the result is zero or negative instead.
+        """
+        expires = self.rollback_expires if rollback else self.expires
+        if expires is None:
+            return None
+        return expires - _now()
+
+    def rollback_remaining(self):
+        """Returns the number of seconds the next rollback step may run for,
+        or None if it is unbounded.
+
+        :raises Timeout:
+            If the rollback has run out of time.
+        """
+        if self.rollback_timeout is None:
+            return None
+
+        now = _now()
+        if self.rollback_expires is None:
+            self.rollback_expires = now + self.rollback_timeout
+        left = self.rollback_expires - now
+        if left <= 0:
+            raise Timeout('Rollback deadline exceeded.')
+        return left
+
+
+def _get_timeout_pool():
+    global _timeout_pool
+
+    if _timeout_pool is None:
+        with _timeout_pool_lock:
+            if _timeout_pool is None:
+                # Imported here because reversible.parallel imports
+                # reversible.core, which imports this module.
+                from .core import _default_max_workers
+                _timeout_pool = ThreadPoolExecutor(_default_max_workers())
+    return _timeout_pool
+
+
+def _call_with_timeout(function, seconds, abandoned=None):
+    """Calls ``function``, giving up after ``seconds`` if not None.
+
+    Bounded calls run on a separate thread pool so that the caller can stop
+    waiting. A call that times out is abandoned: it keeps running in the
+    background but its result is ignored. If it had started, its future is
+    appended to the ``abandoned`` list, if given.
+    """
+    if seconds is None:
+        return function()
+
+    future = _get_timeout_pool().submit(function)
+    try:
+        return future.result(seconds)
+    except _FutureTimeout:
+        if not future.cancel() and abandoned is not None:
+            abandoned.append(future)
+        raise Timeout(
+            '%s did not finish within %.3f seconds.' % (function, seconds)
+        )
+
+
+def _after(futures, function):
+    """Calls ``function`` once all the given futures are done, on the thread
+    that finishes the last of them."""
+    remaining = [len(futures)]
+    lock = threading.Lock()
+
+    def done(future):
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            function()
+
+    for future in futures:
+        future.add_done_callback(done)
+
+
+class _TimedAction(object):
+    """Bounds how long the methods of an action may take.
+
+    Rolling back an action whose abandoned ``forwards`` calls are still
+    running is deferred until they finish, so that ``backwards`` sees the
+    context they leave behind.
+    """
+
+    __slots__ = ('action', 'deadline', 'timeout', 'abandoned')
+
+    def __init__(self, action, deadline, timeout):
+        self.action = action
+        self.deadline = deadline
+        self.timeout = timeout
+
+        # Futures of abandoned forwards calls.
+        self.abandoned = None
+
+    def forwards(self):
+        seconds = self.timeout
+        if self.deadline is not None:
+            seconds = self.deadline.remaining(seconds)
+        if seconds is not None and self.abandoned is None:
+            self.abandoned = []
+        return _call_with_timeout(
+            self.action.forwards, seconds, self.abandoned
+        )
+
+    @property
+    def _transparent(self):
+        # See reversible.core._unwrap. Abandoned calls that are still running
+        # must finish before the action is rolled back.
+        return all(f.done() for f in self.abandoned or ())
+
+    def backwards(self):
+        running = [f for f in self.abandoned or () if not f.done()]
+        if running:
+            del self.abandoned[:]
+            _after(running, self._backwards_later)
+            return None
+
+        seconds = None
+        if self.deadline is not None:
+            seconds = self.deadline.rollback_remaining()
+        return _call_with_timeout(self.action.backwards, seconds)
+
+    def _backwards_later(self):
+        try:
+            self.action.backwards()
+        except Exception:
+            log.exception('%s failed to roll back.', self.action)
+
+    def __str__(self):
+        return str(self.action)
+
+    __repr__ = __str__
+
+
+__all__ = ['Timeout']
@@ -5,7 +5,10 @@ import types
 import functools
 from collections import deque
 
-from .core import SimpleAction
+from .core import _builder, _limited, _pop_rollback, _retrying, _timed
+from .core import _traced
+from .parallel import _ParallelAction
+from .spill import _check_rollback_log, _rollback_log
 
 
 class Return(Exception):
@@ -33,19 +36,242 @@ class Return(Exception):
         self.value = value
 
 
+class _Constant(object):
+    """An action that returns a value and has nothing to roll back."""
+
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def forwards(self):
+        return self.value
+
+    def backwards(self):
+        pass
+
+    def __str__(self):
+        return "<Constant %r>" % (self.value,)
+
+    __repr__ = __str__
+
+
+class _Barrier(object):
+
+    __slots__ = ()
+
+    def forwards(self):
+        pass
+
+    def backwards(self):
+        pass
+
+    def __reduce__(self):
+        # Barriers are found by identity, so unpickling one, as when it's
+        # loaded back from a spilled rollback log, must return the singleton.
+        return '_BARRIER'
+
+    def __str__(self):
+        return "<Barrier>"
+
+    __repr__ = __str__
+
+
+_BARRIER = _Barrier()
+
+
+class _Commit(object):
+
+    __slots__ = ()
+
+    def forwards(self):
+        pass
+
+    def backwards(self):
+        pass
+
+    def __reduce__(self):
+        return '_COMMIT'
+
+    def __str__(self):
+        return "<Commit>"
+
+    __repr__ = __str__
+
+
+_COMMIT = _Commit()
+
+
+def commit():
+    """Returns a commit point for generator-based actions.
+
+    Yielding a commit point declares that the actions the generator has
+    executed so far are final. They are forgotten and won't be rolled back if
+    the generator fails later, so that their contexts may be freed. This
+    bounds the memory used by long-running generators.
+
+    .. code-block:: python
+
+        @reversible.gen
+        def import_rows(rows):
+            for i, row in enumerate(rows):
+                yield insert_row(row)
+                if i % 1000 == 999:
+                    yield reversible.commit()
+
+    A commit point only affects the generator that yields it. If that
+    generator is itself a step of another generator, rolling back the outer
+    generator rolls back the actions executed after the commit point.
+
+    Steps that were journaled (see :py:func:`reversible.execute`) are still
+    rolled back by :py:func:`reversible.recover`.
+
+    :returns:
+        An action that does nothing and is yieldable inside
+        :py:func:`reversible.gen` and the other ``gen`` implementations.
+    """
+    return _COMMIT
+
+
+def barrier():
+    """Returns a rollback barrier for generators with concurrent rollback.
+
+    Generators decorated with ``concurrent_rollback=True`` treat all actions
+    they executed as independent of each other when rolling back, except
+    across barriers. Yielding a barrier declares that the actions executed
+    after it depend on the actions executed before it. Rollback of everything
+    after the barrier finishes before rollback of anything before it starts.
+
+    .. code-block:: python
+
+        @reversible.gen(concurrent_rollback=True)
+        def provision(spec):
+            network = yield create_network(spec)
+            yield reversible.barrier()
+
+            # These are rolled back concurrently, and before the network.
+            for disk in spec.disks:
+                yield create_disk(network, disk)
+            yield create_dns_record(network, spec.hostname)
+
+    Yielding a barrier elsewhere has no effect.
+
+    :returns:
+        An action that does nothing and is yieldable inside
+        :py:func:`reversible.gen` and the other ``gen`` implementations.
+    """
+    return _BARRIER
+
+
+def _bind(owner, action, replay=None):
+    """Applies recorded results, the journal, limiters, the deadline, the
+    retry policies and tracing of ``owner`` to one of its steps.
+
+    ``owner`` is a generator-based action or a :py:class:`reversible.Graph`.
+    """
+    if (
+        replay is None and
+        owner.journal is None and
+        owner.step_retry is None and
+        owner.step_deadline is None and
+        owner.step_trace is None
+    ):
+        # Only the step's own policies apply, if it has any.
+        builder = _builder(action)
+        if builder is None:
+            return action
+        if (
+            builder._retry is None and
+            builder._rollback_retry is None and
+            builder._timeout is None and
+            builder._resource is None
+        ):
+            return action
+
+    if isinstance(action, (_Constant, _Barrier)):
+        return action
+
+    step = action
+    if replay is not None:
+        step = replay.bind(step)
+    if owner.journal is not None:
+        step = owner.journal.bind(step)
+    step = _limited(step, action)
+    step = _timed(step, owner.step_deadline, action)
+    retry, rollback_retry = owner.step_retry or (None, None)
+    step = _retrying(
+        step, retry, rollback_retry, action, deadline=owner.step_deadline
+    )
+    if owner.step_trace is not None:
+        step = _traced(step, owner.step_trace[0], owner, action)
+    return step
+
+
 class _GeneratorAction(object):
 
-    __slots__ = ('generator', 'executed')
+    __slots__ = (
+        'generator', 'executed', 'parallel', 'pop_rollback',
+        'concurrent_rollback', 'journal', 'step_retry', 'step_deadline',
+        'step_trace', 'savepoint', 'replay',
+    )
 
-    def __init__(self, generator):
+    def __init__(self, generator, parallel=_ParallelAction,
+                 concurrent_rollback=False, pop_rollback=_pop_rollback,
+                 savepoint=False, executed=None):
         self.generator = generator
-        self.executed = deque()
+
+        # Actions to roll back, oldest first. See _rollback_log.
+        self.executed = deque() if executed is None else executed
+
+        # Builds an action that runs the given list of actions concurrently,
+        # binding its members with the given function once compatible actions
+        # have been merged.
+        self.parallel = parallel
+
+        # Pops the next action to roll back, merging compatible actions and
+        # binding them with the given function.
+        self.pop_rollback = pop_rollback
+        self.concurrent_rollback = concurrent_rollback
+
+        # Set by the journal when the saga is being journaled.
+        self.journal = None
+
+        # Default retry policies for steps, as a (retry, rollback_retry)
+        # tuple. Set by reversible.execute.
+        self.step_retry = None
+
+        # Time budget of the saga. Set by reversible.execute.
+        self.step_deadline = None
+
+        # (tracer, span) of the current call while tracing. Steps record
+        # their spans under that span.
+        self.step_trace = None
+
+        # Whether to roll back our own steps as soon as we fail. See
+        # reversible.savepoint.
+        self.savepoint = savepoint
+
+        # Recorded results of the saga's steps. Set by reversible.replay.
+        self.replay = None
+
+    def _bind(self, action):
+        return _bind(self, action, self.replay)
 
     def forwards(self):
         try:
             action = next(self.generator)
             while True:
+                if action is _COMMIT:
+                    # Everything executed so far is final.
+                    self.executed.clear()
+                    action = self.generator.send(None)
+                    continue
+
                 # TODO: make sure action is not none
+                if isinstance(action, (list, tuple)):
+                    action = self.parallel(action, bind=self._bind)
+                else:
+                    action = self._bind(action)
                 self.executed.append(action)
                 try:
                     result = action.forwards()
@@ -54,14 +280,80 @@ class _GeneratorAction(object):
                 else:
                     action = self.generator.send(result)
         except (StopIteration, Return) as result:
+            if self.replay is not None:
+                self.replay.finish(self)
             return getattr(result, 'value', None)
+        except Exception:
+            if self.savepoint:
+                self.backwards()
+            raise
 
     def backwards(self):
+        if not self.concurrent_rollback:
+            while self.executed:
+                self.pop_rollback(self.executed, self._bind).backwards()
+            return
+
         while self.executed:
-            self.executed.pop().backwards()
+            segment = []
+            while self.executed:
+                action = self.executed.pop()
+                if action is _BARRIER:
+                    break
+                segment.append(action)
+
+            if len(segment) == 1:
+                segment[0].backwards()
+            elif segment:
+                self.parallel(segment).backwards()
+
+
+def savepoint(action):
+    """Makes a generator-based action roll itself back as soon as it fails.
+
+    Normally, the steps of a nested generator that fails stay applied until
+    the enclosing generator is rolled back. If the enclosing generator
+    catches the failure at the yield point, that may not happen until much
+    later, or at all. A savepoint rolls back the steps of the failed
+    generator before the exception reaches the yield point, so that the
+    resources they hold are released right away.
+
+    .. code-block:: python
+
+        @reversible.gen
+        def submit_order(order):
+            order_id = yield create_order(order)
+            try:
+                yield reversible.savepoint(reserve_items(order_id, order.cart))
+            except OutOfStock:
+                # Items reserved by reserve_items have already been
+                # released.
+                yield backorder(order_id, order.cart)
+
+    If the generator is rolled back successfully, rolling it back again does
+    nothing. If its rollback fails, the rollback failure is raised instead
+    and the steps that were not rolled back stay applied.
+
+    The ``savepoint`` argument of :py:func:`reversible.gen` makes every
+    action built by a generator function behave this way.
+
+    :param action:
+        An action built by :py:func:`reversible.gen`,
+        :py:func:`reversible.tornado.gen` or :py:func:`reversible.asyncio.gen`.
+    :returns:
+        The same action.
+    """
+    if not hasattr(type(action), 'savepoint'):
+        if isinstance(action, _Constant):
+            # The generator function returned without yielding anything.
+            return action
+        raise TypeError('%r is not a generator-based action.' % (action,))
+    action.savepoint = True
+    return action
 
 
-def gen(function):
+def gen(function=None, executor=None, concurrent_rollback=False,
+        savepoint=False, max_rollback_depth=None, spill_threshold=None):
     """
     Allows using a generator to chain together reversible actions.
 
@@ -123,34 +415,93 @@ def gen(function):
 
     If any of the ``backwards`` methods fail, rollback will be aborted.
 
+    Independent actions may be executed concurrently by yielding a list or
+    tuple of them. Their ``forwards`` methods are called on a thread pool and
+    the results are sent back as a list, in the same order as the actions.
+
+    .. code-block:: python
+
+        @reversible.gen
+        def submit_order(order):
+            order_id = yield CreateOrder(order.cart)
+            reservations = yield [
+                reserve_item(order_id, item) for item in order.cart
+            ]
+
+    If any of the actions fail, the ones that succeeded are rolled back right
+    away and the exception is raised at the yield point. If the exception is
+    not handled, the whole group is rolled back with the rest of the
+    generator.
+
+    The thread pool may be specified with the ``executor`` argument.
+
+    .. code-block:: python
+
+        @reversible.gen(executor=ThreadPoolExecutor(8))
+        def submit_order(order):
+            # ...
+
+    Members of such a group are independent of each other, so they are also
+    rolled back concurrently. If ``concurrent_rollback`` is set, the same
+    applies to all actions executed by the generator: they are rolled back
+    concurrently on the thread pool except across barriers yielded with
+    :py:func:`reversible.barrier`.
+
     :param function:
         The generator function. This generator must yield action objects.
+    :param executor:
+        A ``concurrent.futures.Executor`` used to execute lists of actions
+        yielded by the generator. Defaults to a shared thread pool.
+    :param concurrent_rollback:
+        If set, actions executed by the generator between barriers are
+        considered independent and are rolled back concurrently.
+    :param savepoint:
+        If set, actions built by the generator roll back their own steps
+        before raising a failure. See :py:func:`reversible.savepoint`.
+    :param max_rollback_depth:
+        If set, only this many of the most recently executed actions are
+        rolled back if the generator fails. Older actions are forgotten, as
+        if a :py:func:`reversible.commit` point had been yielded after them.
+    :param spill_threshold:
+        If set, the generator keeps at most twice this many executed actions
+        in memory. Older actions are pickled to a temporary file and loaded
+        back if they need to be rolled back. Actions that can't be pickled
+        stay in memory. May not be combined with ``max_rollback_depth``.
     :returns:
         A function that, when called, produces an action object that executes
-        actions and functions as yielded by the generator.
+        actions and functions as yielded by the generator. If ``function`` was
+        omitted, a decorator that accepts the generator function is returned.
     """
 
-    @functools.wraps(function)  # TODO: use wrapt instead?
-    def new_function(*args, **kwargs):
-        try:
-            value = function(*args, **kwargs)
-        except Return as result:
-            return SimpleAction(
-                lambda ctx: ctx.value,
-                lambda _: None,
-                result,
-            )
-        else:
-            if isinstance(value, types.GeneratorType):
-                return _GeneratorAction(value)
+    parallel = functools.partial(_ParallelAction, executor=executor)
+    _check_rollback_log(max_rollback_depth, spill_threshold)
+
+    def decorator(function):
+
+        @functools.wraps(function)  # TODO: use wrapt instead?
+        def new_function(*args, **kwargs):
+            try:
+                value = function(*args, **kwargs)
+            except Return as result:
+                return _Constant(result.value)
             else:
-                return SimpleAction(
-                    lambda _: value,
-                    lambda _: None,
-                    None,
-                )
+                if isinstance(value, types.GeneratorType):
+                    return _GeneratorAction(
+                        value, parallel, concurrent_rollback,
+                        savepoint=savepoint,
+                        executed=_rollback_log(
+                            max_rollback_depth, spill_threshold
+                        ),
+                    )
+                else:
+                    return _Constant(value)
+
+        return new_function
 
-    return new_function
+    if function is not None:
+        return decorator(function)
+    else:
+        return decorator
 
 
-__all__ = ['gen', 'Return']
+__all__ = ['barrier', 'commit', 'gen', 'Return', 'savepoint']
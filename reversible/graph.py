@@ -0,0 +1,238 @@
+from __future__ import absolute_import
+
+from collections import OrderedDict
+
+from concurrent.futures import wait, FIRST_COMPLETED
+
+from .generator import _bind
+from .parallel import _call_all, default_thread_pool
+
+
+class _Graph(object):
+    """Nodes of a dependency graph and the state of its execution.
+
+    Subclasses schedule the nodes and bind them to the policies of the saga.
+    """
+
+    # Default retry policies for nodes, as a (retry, rollback_retry) tuple,
+    # time budget of the saga and (tracer, span) of the current call while
+    # tracing. Set by the engine that executes the graph, as for
+    # generator-based actions. Declared on the class so that the engines can
+    # look them up on the type.
+    step_retry = None
+    step_deadline = None
+    step_trace = None
+
+    def __init__(self):
+        # name -> (action or function, names of the nodes it requires)
+        self.nodes = OrderedDict()
+
+        # Actions of the nodes that were started and not rolled back yet, in
+        # the order in which they were started.
+        self.pending = OrderedDict()
+
+    def add(self, name, action, requires=()):
+        """Adds a node to the graph.
+
+        :param name:
+            Name of the node, unique in the graph.
+        :param action:
+            The action to execute, or a function that accepts the results of
+            the required nodes, in order, and returns the action. Functions
+            decorated with :py:func:`reversible.action` may be used directly.
+        :param requires:
+            Names of the nodes that must succeed before this one starts. They
+            must have been added already.
+        :returns:
+            The name of the node.
+        """
+        if name in self.nodes:
+            raise ValueError('Node %r already exists.' % (name,))
+        requires = tuple(requires)
+        for required in requires:
+            if required not in self.nodes:
+                raise ValueError(
+                    'Node %r requires unknown node %r.' % (name, required)
+                )
+        self.nodes[name] = (action, requires)
+        return name
+
+    def _build(self, name, results):
+        action, requires = self.nodes[name]
+        if not hasattr(action, 'forwards'):
+            action = action(*[results[r] for r in requires])
+        action = self._bind(action)
+        self.pending[name] = action
+        return action
+
+    def _bind(self, action):
+        """Applies the policies of the saga to the action of a node."""
+        raise NotImplementedError
+
+    def _ready(self, started, done):
+        """Returns the nodes that haven't been started and whose requirements
+        are done."""
+        return [
+            name for name, (_, requires) in self.nodes.items()
+            if name not in started and all(r in done for r in requires)
+        ]
+
+    def _rollback_ready(self, started):
+        """Returns the pending nodes whose rollback hasn't been started and
+        whose pending dependents have been rolled back."""
+        blocked = set()
+        for name in self.pending:
+            blocked.update(self.nodes[name][1])
+        return [
+            name for name in reversed(self.pending)
+            if name not in started and name not in blocked
+        ]
+
+    def __str__(self):
+        return "<%s %s>" % (type(self).__name__, list(self.nodes))
+
+    __repr__ = __str__
+
+
+class Graph(_Graph):
+    """
+    An action made of steps that depend on each other's results.
+
+    Nodes are added with :py:meth:`add`, each with the names of the nodes it
+    requires. Executing the graph runs every node as soon as the nodes it
+    requires have succeeded, concurrently on a thread pool, and passes their
+    results to it.
+
+    .. code-block:: python
+
+        plan = reversible.graph()
+        plan.add('network', create_network(region))
+        plan.add('disk', create_disk, requires=['network'])
+        plan.add('dns', create_dns_record, requires=['network'])
+        plan.add('vm', create_vm, requires=['disk', 'dns'])
+        plan.add('monitoring', enable_monitoring, requires=['vm'])
+        plan.add('billing', start_billing, requires=['vm'])
+
+        results = reversible.execute(plan)
+        vm = results['vm']
+
+    The result of the graph is a dictionary mapping the names of the nodes to
+    their results.
+
+    If a node fails, no more nodes are started. Once the nodes that are
+    running finish, all nodes that were started, including the failed ones,
+    are rolled back right away and the first failure is raised.
+
+    Nodes are steps of the saga like the steps of :py:func:`reversible.gen`:
+    the retry policies, timeouts, journal and tracer given to
+    :py:func:`reversible.execute` and the limiters of their resource classes
+    apply to each of them.
+
+    Nodes are rolled back in the reverse of the order of their dependencies:
+    a node is rolled back once all nodes that required it have been. Nodes
+    that don't depend on each other are rolled back concurrently. If a node
+    fails to roll back, no more nodes are rolled back and the failure is
+    raised.
+
+    Graphs may be yielded in :py:func:`reversible.gen`. A graph is one action
+    and should be executed only once.
+
+    :param executor:
+        A ``concurrent.futures.Executor`` used to execute the nodes. Defaults
+        to the thread pool used by :py:func:`reversible.gen`.
+    """
+
+    # Set by the journal when the saga is being journaled.
+    journal = None
+
+    def __init__(self, executor=None):
+        super(Graph, self).__init__()
+        self.executor = executor
+
+    def _bind(self, action):
+        return _bind(self, action)
+
+    def _start(self, executor, running, names, methods):
+        # Nodes that no worker has picked up are run on this thread, in case
+        # the graph itself runs on a worker of the same pool.
+        for name, future in zip(names, _call_all(executor, methods)):
+            running[future] = name
+
+    def forwards(self):
+        executor = self.executor or default_thread_pool()
+        results = {}
+        started = set()
+        running = {}
+        error = None
+        while True:
+            if error is None:
+                names, methods = [], []
+                for name in self._ready(started, results):
+                    started.add(name)
+                    try:
+                        action = self._build(name, results)
+                    except Exception as e:
+                        error = e
+                        break
+                    names.append(name)
+                    methods.append(action.forwards)
+                self._start(executor, running, names, methods)
+            if not running:
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    if error is None:
+                        error = e
+
+        if error is None:
+            return results
+
+        self.backwards()
+        raise error
+
+    def backwards(self):
+        executor = self.executor or default_thread_pool()
+        started = set()
+        running = {}
+        error = None
+        while True:
+            if error is None:
+                names = self._rollback_ready(started)
+                started.update(names)
+                self._start(executor, running, names, [
+                    self.pending[name].backwards for name in names
+                ])
+            if not running:
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    future.result()
+                except Exception as e:
+                    if error is None:
+                        error = e
+                else:
+                    del self.pending[name]
+
+        if error is not None:
+            raise error
+
+
+def graph(executor=None):
+    """Returns an empty :py:class:`reversible.Graph`.
+
+    :param executor:
+        A ``concurrent.futures.Executor`` used to execute the nodes. Defaults
+        to the thread pool used by :py:func:`reversible.gen`.
+    """
+    return Graph(executor)
+
+
+__all__ = ['graph', 'Graph']
@@ -0,0 +1,281 @@
+from __future__ import absolute_import
+
+import os
+import zlib
+import uuid
+import struct
+import pickle
+import itertools
+import threading
+from collections import OrderedDict
+
+from .core import log
+from .generator import _Constant, _Barrier
+
+
+_HEADER = struct.Struct('>II')
+
+# Record types
+_STEP = 'step'
+_UNDO = 'undo'
+_END = 'end'
+
+
+class FileJournal(object):
+    """
+    An append-only file recording the steps completed by sagas.
+
+    Pass a journal to :py:func:`reversible.execute` to make rollback survive
+    crashes. Every step completed by the saga is written to the journal before
+    the next step starts. If the process dies before the saga finishes,
+    :py:func:`reversible.recover` can roll back the completed steps after a
+    restart.
+
+    .. code-block:: python
+
+        journal = reversible.FileJournal('/var/lib/orders/sagas.journal')
+        reversible.recover(journal)
+
+        # ...
+
+        reversible.execute(submit_order(order), journal=journal)
+
+    Steps are pickled along with their context. Actions built with
+    :py:func:`reversible.action` are pickled by reference to the decorated
+    function, so those functions must be defined at the top level of a module.
+    Other actions must be picklable themselves.
+
+    Records are synced to disk with ``fsync`` before :py:meth:`append`
+    returns. Sagas that complete steps at the same time share a single
+    ``fsync`` (group commit): while one thread is syncing, the records written
+    by other threads queue up and are synced together by the next ``fsync``.
+
+    :param path:
+        Path to the journal file. It is created if it doesn't exist.
+    :param sync:
+        If false, records are only flushed to the operating system and not
+        synced to disk. They survive crashes of the process but not of the
+        machine.
+    """
+
+    def __init__(self, path, sync=True):
+        self.path = path
+        self.sync = sync
+
+        self._file = open(path, 'ab')
+        self._lock = threading.Lock()
+        self._synced_cond = threading.Condition(self._lock)
+        self._syncing = False
+
+        # Number of records written to and synced to the file.
+        self._written = 0
+        self._synced = 0
+
+    def append(self, record):
+        """Appends the given record and waits for it to reach the disk."""
+        payload = pickle.dumps(record, 2)
+        data = _HEADER.pack(
+            len(payload), zlib.crc32(payload) & 0xffffffff
+        ) + payload
+
+        with self._lock:
+            self._file.write(data)
+            self._written += 1
+            seq = self._written
+
+            if not self.sync:
+                self._file.flush()
+                return
+
+            while self._synced < seq:
+                if self._syncing:
+                    # Someone else is syncing. Our record will be included in
+                    # the next sync if it isn't in this one.
+                    self._synced_cond.wait()
+                    continue
+
+                self._syncing = True
+                target = self._written
+                try:
+                    self._file.flush()
+                    self._lock.release()
+                    try:
+                        os.fsync(self._file.fileno())
+                    finally:
+                        self._lock.acquire()
+                    self._synced = max(self._synced, target)
+                finally:
+                    self._syncing = False
+                    self._synced_cond.notify_all()
+
+    def records(self):
+        """Iterates over all records in the journal, oldest first.
+
+        A partially written record at the end of the file, as left behind by a
+        crash in the middle of a write, is ignored.
+        """
+        with self._lock:
+            self._file.flush()
+
+        with open(self.path, 'rb') as f:
+            while True:
+                header = f.read(_HEADER.size)
+                if len(header) < _HEADER.size:
+                    return
+                size, checksum = _HEADER.unpack(header)
+                payload = f.read(size)
+                if (
+                    len(payload) < size or
+                    zlib.crc32(payload) & 0xffffffff != checksum
+                ):
+                    log.warning('Ignoring corrupt record in %s.', self.path)
+                    return
+                yield pickle.loads(payload)
+
+    def begin(self):
+        """Starts journaling a new saga.
+
+        This is called by :py:func:`reversible.execute`.
+        """
+        return _SagaJournal(self, uuid.uuid4().hex)
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def __str__(self):
+        return "<FileJournal %s>" % (self.path,)
+
+    __repr__ = __str__
+
+
+class _SagaJournal(object):
+    """Records the steps of one saga in a journal."""
+
+    __slots__ = ('journal', 'saga', 'steps', 'ended')
+
+    def __init__(self, journal, saga):
+        self.journal = journal
+        self.saga = saga
+        self.steps = itertools.count()
+
+        # Set once the saga finished. Steps that were abandoned by a timeout
+        # may still complete after that, and must not be recorded.
+        self.ended = False
+
+    def bind(self, action):
+        """Returns an action that records itself in the journal."""
+        if hasattr(type(action), 'journal'):
+            # Generators and graphs journal the steps they execute instead.
+            # Looked up on the type so that mocks don't look like them.
+            action.journal = self
+            return action
+        elif isinstance(action, (_Constant, _Barrier)):
+            # Nothing to roll back.
+            return action
+        else:
+            return _JournaledAction(action, self)
+
+    def record(self, action):
+        """Records a completed step and returns its number, or None if the
+        saga has already ended."""
+        if self.ended:
+            log.warning(
+                'Not journaling %s: saga %s has already ended.',
+                action, self.saga,
+            )
+            return None
+        step = next(self.steps)
+        self.journal.append(
+            (_STEP, self.saga, step, pickle.dumps(action, 2))
+        )
+        return step
+
+    def undo(self, step):
+        self.journal.append((_UNDO, self.saga, step))
+
+    def end(self):
+        self.ended = True
+        self.journal.append((_END, self.saga))
+
+
+class _JournaledAction(object):
+
+    __slots__ = ('action', 'saga', 'step')
+
+    def __init__(self, action, saga):
+        self.action = action
+        self.saga = saga
+        self.step = None
+
+    def forwards(self):
+        result = self.action.forwards()
+        self.step = self.saga.record(self.action)
+        return result
+
+    def backwards(self):
+        self.action.backwards()
+        if self.step is not None:
+            self.saga.undo(self.step)
+            self.step = None
+
+    def __str__(self):
+        return str(self.action)
+
+    __repr__ = __str__
+
+
+def recover(journal):
+    """
+    Rolls back sagas that didn't finish.
+
+    Reads the given journal and calls the ``backwards`` methods of the steps
+    completed by sagas that neither finished nor were rolled back, in the
+    reverse of the order in which they completed. This is meant to be called
+    when the application starts, before new sagas are executed with the same
+    journal.
+
+    Steps that were still executing when the process died were never recorded
+    and are not rolled back.
+
+    If a step fails to roll back, the error is logged and the remaining steps
+    of that saga are left for the next call to ``recover``.
+
+    :param journal:
+        A journal like :py:class:`reversible.FileJournal`.
+    :returns:
+        A list of IDs of the sagas that were rolled back.
+    """
+    sagas = OrderedDict()
+    ended = set()
+    for record in journal.records():
+        kind, saga = record[0], record[1]
+        if saga in ended:
+            # Written by a step that finished after the saga did.
+            continue
+        if kind == _STEP:
+            sagas.setdefault(saga, OrderedDict())[record[2]] = record[3]
+        elif kind == _UNDO:
+            sagas.get(saga, {}).pop(record[2], None)
+        elif kind == _END:
+            sagas.pop(saga, None)
+            ended.add(saga)
+
+    recovered = []
+    for saga, steps in sagas.items():
+        try:
+            for step in sorted(steps, reverse=True):
+                action = pickle.loads(steps[step])
+                action.backwards()
+                journal.append((_UNDO, saga, step))
+        except Exception:
+            log.exception('Failed to roll back saga %s.', saga)
+            continue
+
+        journal.append((_END, saga))
+        recovered.append(saga)
+
+    return recovered
+
+
+__all__ = ['FileJournal', 'recover']
@@ -0,0 +1,251 @@
+from __future__ import absolute_import
+
+import threading
+from collections import deque
+
+from .deadline import _now
+
+
+class Limiter(object):
+    """
+    Limits how many actions of a resource class run at once, how often they
+    start, or both.
+
+    Limiters are registered in :py:data:`reversible.limiters` under the name
+    of a resource class. Actions declare the resource class they use with the
+    ``resource`` argument of :py:func:`reversible.action`, and every engine
+    acquires the limiter before calling their ``forwards`` and ``backwards``
+    methods and releases it once they finish. The Tornado and asyncio engines
+    wait for it without blocking the event loop.
+
+    .. code-block:: python
+
+        reversible.limiters.set(
+            'payments', reversible.Limiter(concurrency=20, rate=100)
+        )
+
+        @reversible.action(resource='payments')
+        def charge_card(context, card, amount):
+            context['charge_id'] = Payments.charge(card, amount)
+
+    By default, rollbacks waiting for a limiter are let through before any
+    ``forwards`` call waiting for it, so that compensations aren't stuck
+    behind new work while downstream services are struggling.
+
+    :param concurrency:
+        Maximum number of calls in progress at once. Unlimited if omitted.
+    :param rate:
+        Maximum number of calls started per second, on average. Unlimited if
+        omitted.
+    :param burst:
+        Number of calls that may start at once when the rate limit hasn't
+        been reached recently.
+    :param rollback_priority:
+        If set (the default), waiting ``backwards`` calls are let through
+        before waiting ``forwards`` calls. Otherwise, calls are let through in
+        the order in which they arrived.
+    """
+
+    def __init__(self, concurrency=None, rate=None, burst=1,
+                 rollback_priority=True):
+        if concurrency is not None and concurrency < 1:
+            raise ValueError('concurrency must be at least 1.')
+        if rate is not None and rate <= 0:
+            raise ValueError('rate must be positive.')
+        if burst < 1:
+            raise ValueError('burst must be at least 1.')
+
+        self.concurrency = concurrency
+        self.rate = rate
+        self.burst = burst
+        self.rollback_priority = rollback_priority
+
+        self._lock = threading.Lock()
+
+        # Functions that wake up waiting callers, oldest first, for forwards
+        # and backwards calls.
+        self._waiters = (deque(), deque())
+
+        self._active = 0
+        self._tokens = float(burst)
+        self._updated = _now()
+
+        # When the timer that lets through callers held back by the rate
+        # limit after a call finished is due, or None if it isn't running.
+        self._timer_due = None
+
+    def _queue(self, rollback):
+        return self._waiters[bool(rollback and self.rollback_priority)]
+
+    def _grant(self):
+        """Lets waiting callers through while there is room.
+
+        Must be called with the lock held. Returns the number of seconds
+        after which callers held back by the rate limit may be let through,
+        or None if they are waiting for a call to finish.
+        """
+        forwards, backwards = self._waiters
+        while forwards or backwards:
+            if (
+                self.concurrency is not None and
+                self._active >= self.concurrency
+            ):
+                return None
+
+            if self.rate is not None:
+                now = _now()
+                self._tokens = min(
+                    self.burst,
+                    self._tokens + (now - self._updated) * self.rate,
+                )
+                self._updated = now
+                if self._tokens < 1:
+                    return (1 - self._tokens) / self.rate
+                self._tokens -= 1
+
+            self._active += 1
+            (backwards or forwards).popleft()()
+        return None
+
+    def _enqueue(self, rollback, wake):
+        """Registers a caller waiting for the limiter.
+
+        ``wake`` is called, possibly from another thread and with the lock
+        held, once the caller may proceed. Returns the result of
+        :py:meth:`_grant`. The caller must call :py:meth:`_poll` after that
+        many seconds until it's woken up.
+        """
+        with self._lock:
+            self._queue(rollback).append(wake)
+            return self._grant()
+
+    def _poll(self):
+        with self._lock:
+            return self._grant()
+
+    def _grant_later(self, delay):
+        """Calls :py:meth:`_grant` again after ``delay`` seconds, unless that
+        is already planned.
+
+        Must be called with the lock held. Callers waiting for a call to
+        finish don't poll, so if the call that finished makes room while the
+        rate limit holds them back, nobody else would.
+        """
+        if delay is None:
+            return
+        due = _now() + delay
+        if self._timer_due is not None and self._timer_due <= due:
+            return
+        self._timer_due = due
+        timer = threading.Timer(delay, self._timer_fired)
+        timer.daemon = True
+        timer.start()
+
+    def _timer_fired(self):
+        with self._lock:
+            self._timer_due = None
+            self._grant_later(self._grant())
+
+    def _cancel(self, rollback, wake):
+        """Gives up on a call registered with :py:meth:`_enqueue`, releasing
+        the limiter if the caller was already let through."""
+        with self._lock:
+            try:
+                self._queue(rollback).remove(wake)
+            except ValueError:
+                self._active -= 1
+                self._grant_later(self._grant())
+
+    def acquire(self, rollback=False):
+        """Blocks the current thread until a call may start.
+
+        :param rollback:
+            Whether the call is a ``backwards`` call.
+        """
+        event = threading.Event()
+        delay = self._enqueue(rollback, event.set)
+        while not event.is_set():
+            if not event.wait(delay):
+                delay = self._poll()
+
+    def release(self):
+        """Records that a call finished."""
+        with self._lock:
+            self._active -= 1
+            self._grant_later(self._grant())
+
+    def __str__(self):
+        return "<Limiter concurrency=%s, rate=%s>" % (
+            self.concurrency, self.rate
+        )
+
+    __repr__ = __str__
+
+
+class LimiterRegistry(object):
+    """Maps resource classes to their :py:class:`reversible.Limiter`.
+
+    See :py:data:`reversible.limiters`.
+    """
+
+    def __init__(self):
+        self._limiters = {}
+
+    def set(self, resource, limiter):
+        """Limits actions of the given resource class with ``limiter``.
+
+        Actions bound after this call use the new limiter.
+        """
+        self._limiters[resource] = limiter
+
+    def get(self, resource):
+        """Returns the limiter for the given resource class, or None."""
+        return self._limiters.get(resource)
+
+    def remove(self, resource):
+        """Stops limiting actions of the given resource class."""
+        self._limiters.pop(resource, None)
+
+    def __str__(self):
+        return "<LimiterRegistry %s>" % (sorted(self._limiters),)
+
+    __repr__ = __str__
+
+
+#: The :py:class:`reversible.LimiterRegistry` consulted by all engines.
+limiters = LimiterRegistry()
+
+
+class _LimitedAction(object):
+    """Holds a limiter while the methods of an action run."""
+
+    __slots__ = ('action', 'limiter')
+
+    # See reversible.core._unwrap.
+    _transparent = True
+
+    def __init__(self, action, limiter):
+        self.action = action
+        self.limiter = limiter
+
+    def forwards(self):
+        self.limiter.acquire()
+        try:
+            return self.action.forwards()
+        finally:
+            self.limiter.release()
+
+    def backwards(self):
+        self.limiter.acquire(rollback=True)
+        try:
+            return self.action.backwards()
+        finally:
+            self.limiter.release()
+
+    def __str__(self):
+        return str(self.action)
+
+    __repr__ = __str__
+
+
+__all__ = ['Limiter', 'LimiterRegistry', 'limiters']
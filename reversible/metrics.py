@@ -0,0 +1,303 @@
+from __future__ import absolute_import
+
+import os
+import bisect
+import threading
+
+from .deadline import _now
+
+
+#: Upper bounds in seconds of the buckets of latency histograms.
+DURATION_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+)
+
+#: Upper bounds of the buckets of the saga depth histogram.
+DEPTH_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+class _Histogram(object):
+
+    __slots__ = ('bounds', 'counts', 'sum')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        # One count per bucket plus one for values above the last bound.
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    def lines(self, name, labels):
+        total = 0
+        for bound, count in zip(self.bounds, self.counts):
+            total += count
+            yield '%s_bucket%s %d' % (
+                name, _labels(labels + (('le', _number(bound)),)), total
+            )
+        total += self.counts[-1]
+        yield '%s_bucket%s %d' % (name, _labels(labels + (('le', '+Inf'),)),
+                                  total)
+        yield '%s_sum%s %s' % (name, _labels(labels), _number(self.sum))
+        yield '%s_count%s %d' % (name, _labels(labels), total)
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return (
+        value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    )
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{%s}' % ','.join(
+        '%s="%s"' % (key, _escape(value)) for key, value in labels
+    )
+
+
+class _Saga(object):
+    """Counts the steps of a saga."""
+
+    __slots__ = ('steps',)
+
+    def __init__(self):
+        self.steps = 0
+
+
+class _Timing(object):
+    """A call being measured. Takes the place of a span."""
+
+    __slots__ = ('name', 'kind', 'trace_id', 'root', 'start')
+
+    def __init__(self, name, kind, saga, root, start):
+        self.name = name
+        self.kind = kind
+        # Named like Span.trace_id, which identifies the saga.
+        self.trace_id = saga
+        self.root = root
+        self.start = start
+
+
+class Metrics(object):
+    """
+    Counts ``forwards`` and ``backwards`` calls and measures how long they
+    and whole sagas take.
+
+    Metrics are enabled by giving a registry to a
+    :py:class:`reversible.Executor`, and may be read in the Prometheus text
+    format.
+
+    .. code-block:: python
+
+        metrics = reversible.Metrics()
+        executor = reversible.Executor(metrics=metrics)
+        metrics.serve_prometheus(9464)
+
+        executor.execute(submit_order(order))
+
+    The following metrics are recorded:
+
+    ``reversible_calls_total``
+        Counter of calls by action name, kind (``forwards`` or
+        ``backwards``) and outcome (``ok`` or ``error``). This includes the
+        steps of generator-based actions and the actions given to the
+        executor.
+    ``reversible_call_duration_seconds``
+        Histogram of the duration of calls by action name and kind.
+    ``reversible_sagas_in_flight``
+        Gauge of the ``forwards`` and ``backwards`` calls to actions given
+        to the executor that are in progress.
+    ``reversible_saga_depth``
+        Histogram of the number of steps executed by each saga, including
+        nested generators, their steps, and the step that failed, if any.
+    ``reversible_rollback_duration_seconds``
+        Histogram of the time taken to roll back failed sagas, by action
+        name.
+
+    Each call costs a couple of clock reads and one short critical section.
+    Metrics may be combined with a :py:class:`reversible.Tracer`.
+
+    :param buckets:
+        Upper bounds in seconds of the buckets of the latency histograms.
+    """
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = tuple(buckets)
+
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._durations = {}
+        self._rollbacks = {}
+        self._depth = _Histogram(DEPTH_BUCKETS)
+        self._in_flight = 0
+
+    def start(self, name, kind, parent=None, trace_id=None):
+        """Starts measuring a call.
+
+        Called by the engines with the same arguments as
+        :py:meth:`reversible.Tracer.start`.
+        """
+        if parent is not None:
+            return _Timing(name, kind, parent.trace_id, False, _now())
+
+        with self._lock:
+            self._in_flight += 1
+        return _Timing(name, kind, trace_id or _Saga(), True, _now())
+
+    def finish(self, timing, error=None):
+        """Records a call started with :py:meth:`start`."""
+        elapsed = _now() - timing.start
+        name, kind = timing.name, timing.kind
+        key = (name, kind, 'ok' if error is None else 'error')
+
+        with self._lock:
+            self._calls[key] = self._calls.get(key, 0) + 1
+
+            histogram = self._durations.get((name, kind))
+            if histogram is None:
+                histogram = self._durations[name, kind] = _Histogram(
+                    self.buckets
+                )
+            histogram.observe(elapsed)
+
+            if not timing.root:
+                if kind == 'forwards':
+                    timing.trace_id.steps += 1
+                return
+
+            self._in_flight -= 1
+            if kind == 'forwards':
+                self._depth.observe(timing.trace_id.steps)
+            else:
+                histogram = self._rollbacks.get(name)
+                if histogram is None:
+                    histogram = self._rollbacks[name] = _Histogram(
+                        self.buckets
+                    )
+                histogram.observe(elapsed)
+
+    def count(self, name, kind='forwards', outcome='ok'):
+        """Returns the number of calls recorded for the given action name,
+        kind and outcome."""
+        return self._calls.get((name, kind, outcome), 0)
+
+    @property
+    def in_flight(self):
+        """Number of calls to actions given to the executor in progress."""
+        return self._in_flight
+
+    def prometheus(self):
+        """Returns the recorded metrics in the Prometheus text format."""
+        with self._lock:
+            lines = [
+                '# HELP reversible_calls_total Number of forwards and '
+                'backwards calls.',
+                '# TYPE reversible_calls_total counter',
+            ]
+            for (name, kind, outcome), count in sorted(self._calls.items()):
+                lines.append('reversible_calls_total%s %d' % (_labels((
+                    ('action', name), ('kind', kind), ('outcome', outcome),
+                )), count))
+
+            lines.extend([
+                '# HELP reversible_call_duration_seconds Duration of forwards '
+                'and backwards calls.',
+                '# TYPE reversible_call_duration_seconds histogram',
+            ])
+            for (name, kind), histogram in sorted(self._durations.items()):
+                lines.extend(histogram.lines(
+                    'reversible_call_duration_seconds',
+                    (('action', name), ('kind', kind)),
+                ))
+
+            lines.extend([
+                '# HELP reversible_sagas_in_flight Number of sagas being '
+                'executed or rolled back.',
+                '# TYPE reversible_sagas_in_flight gauge',
+                'reversible_sagas_in_flight %d' % self._in_flight,
+                '# HELP reversible_saga_depth Number of steps executed by '
+                'each saga.',
+                '# TYPE reversible_saga_depth histogram',
+            ])
+            lines.extend(self._depth.lines('reversible_saga_depth', ()))
+
+            lines.extend([
+                '# HELP reversible_rollback_duration_seconds Time taken to '
+                'roll back failed sagas.',
+                '# TYPE reversible_rollback_duration_seconds histogram',
+            ])
+            for name, histogram in sorted(self._rollbacks.items()):
+                lines.extend(histogram.lines(
+                    'reversible_rollback_duration_seconds',
+                    (('action', name),),
+                ))
+
+        return '\n'.join(lines) + '\n'
+
+    def export_prometheus(self, path):
+        """Writes the recorded metrics to ``path`` in the Prometheus text
+        format, for example for the textfile collector of the node exporter.
+
+        The file is replaced atomically.
+        """
+        temp = '%s.%d.tmp' % (path, os.getpid())
+        with open(temp, 'w') as f:
+            f.write(self.prometheus())
+        os.rename(temp, path)
+
+    def serve_prometheus(self, port, host='127.0.0.1'):
+        """Serves the recorded metrics in the Prometheus text format over HTTP
+        on a daemon thread.
+
+        :param port:
+            Port to listen on. If 0, a free port is picked.
+        :param host:
+            Address to listen on. Defaults to the loopback interface.
+        :returns:
+            The ``HTTPServer``. Its ``server_address`` attribute holds the
+            address it listens on, and its ``shutdown`` method stops it.
+        """
+        # Imported here so that processes which don't serve metrics don't pay
+        # for importing the HTTP stack.
+        try:
+            from http.server import BaseHTTPRequestHandler, HTTPServer
+        except ImportError:  # pragma: no cover
+            from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                body = metrics.prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header(
+                    'Content-Type', 'text/plain; version=0.0.4; charset=utf-8'
+                )
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = HTTPServer((host, port), Handler)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return server
+
+    def __str__(self):
+        return "<Metrics %d series>" % (len(self._calls),)
+
+    __repr__ = __str__
+
+
+__all__ = ['Metrics']
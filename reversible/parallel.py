@@ -0,0 +1,165 @@
+from __future__ import absolute_import
+
+import threading
+
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from .core import _coalesce, _default_max_workers, _scatter
+
+
+_default_thread_pool = None
+_default_thread_pool_lock = threading.Lock()
+
+
+def default_thread_pool():
+    """Returns the thread pool used for parallel actions by default.
+
+    The pool is created the first time it is needed and shared by all
+    :py:func:`reversible.gen` actions that weren't given an ``executor``.
+    """
+    global _default_thread_pool
+
+    if _default_thread_pool is None:
+        with _default_thread_pool_lock:
+            if _default_thread_pool is None:
+                _default_thread_pool = ThreadPoolExecutor(
+                    _default_max_workers()
+                )
+    return _default_thread_pool
+
+
+def _claim(future, function):
+    """Returns ``future``, or, if no worker has started it yet, a Future
+    resolved by calling ``function`` on the current thread instead.
+
+    Threads that wait on the futures of a thread pool may themselves be
+    workers of that pool, as when a group of actions contains generators that
+    yield groups of their own. Running the work nobody picked up yet, instead
+    of waiting for a free worker, means that such a thread never waits on a
+    task that is stuck behind it in the queue.
+    """
+    if not future.cancel():
+        return future
+
+    future = Future()
+    try:
+        future.set_result(function())
+    except BaseException as e:
+        future.set_exception(e)
+    return future
+
+
+def _call_all(executor, functions):
+    """Calls the given functions concurrently on the executor and returns
+    their futures.
+
+    Functions that no worker has started by the time the caller gets to them
+    are called on the calling thread. See :py:func:`_claim`.
+    """
+    futures = [executor.submit(f) for f in functions]
+    return [_claim(f, fn) for f, fn in zip(futures, functions)]
+
+
+def _wait_all(actions, futures):
+    """Waits for all futures and pairs them up with their actions.
+
+    Returns a list of the results, a list of actions whose futures succeeded,
+    and the first exception raised, if any.
+    """
+    results = []
+    succeeded = []
+    error = None
+    for action, future in zip(actions, futures):
+        try:
+            results.append(future.result())
+        except Exception as e:
+            if error is None:
+                error = e
+        else:
+            succeeded.append(action)
+    return results, succeeded, error
+
+
+class _ParallelAction(object):
+    """Executes a group of independent actions concurrently.
+
+    A list or tuple of actions yielded inside a :py:func:`reversible.gen`
+    generator is turned into one of these. The ``forwards`` methods of all
+    members are called concurrently on the executor and their results are
+    returned in the order in which the actions were given.
+
+    If any member fails, the members that succeeded are rolled back right away
+    and the first failure (in member order) is raised. The failed members are
+    still owed a ``backwards`` call, exactly like a failed action yielded on
+    its own, and get it when the group itself is rolled back.
+
+    Members are independent of each other, so their ``backwards`` methods are
+    also called concurrently.
+
+    Members that haven't been picked up by a worker when the group gets to
+    them run on the calling thread, so that groups nested inside the members
+    of other groups can't exhaust the pool and wait on each other forever.
+
+    Members that can be executed in bulk (see
+    :py:meth:`reversible.core.ActionBuilder.forwards_many`) are grouped into
+    batches first. A batch succeeds or fails as a whole.
+    """
+
+    __slots__ = ('actions', 'count', 'positions', 'executor', 'pending')
+
+    def __init__(self, actions, executor=None, bind=None):
+        actions = list(actions)
+        self.count = len(actions)
+        actions, self.positions = _coalesce(actions)
+        if bind is not None:
+            # Batches are bound as a whole, after they've been formed.
+            actions = [bind(a) for a in actions]
+        self.actions = actions
+        self.executor = executor
+
+        # Members that have not been rolled back yet.
+        self.pending = self.actions
+
+    def forwards(self):
+        if not self.actions:
+            return []
+
+        executor = self.executor or default_thread_pool()
+        futures = _call_all(executor, [a.forwards for a in self.actions])
+        results, succeeded, error = _wait_all(self.actions, futures)
+
+        if error is None:
+            return _scatter(results, self.positions, self.count)
+
+        self.pending = list(self.actions)
+        self._backwards_all(succeeded)
+        raise error
+
+    def _backwards_all(self, actions):
+        if len(actions) <= 1:
+            for action in actions:
+                action.backwards()
+                self.pending.remove(action)
+            return
+
+        executor = self.executor or default_thread_pool()
+        futures = _call_all(executor, [a.backwards for a in actions])
+        _, succeeded, error = _wait_all(actions, futures)
+
+        for action in succeeded:
+            self.pending.remove(action)
+
+        if error is not None:
+            raise error
+
+    def backwards(self):
+        if self.pending:
+            self._backwards_all(list(reversed(self.pending)))
+
+    def __str__(self):
+        return "<ParallelAction %s>" % (self.actions,)
+
+    __repr__ = __str__
+
+
+__all__ = ['default_thread_pool']
@@ -0,0 +1,120 @@
+from __future__ import absolute_import
+
+import pickle
+import threading
+
+
+_default_process_pool = None
+_default_process_pool_lock = threading.Lock()
+
+
+def default_process_pool():
+    """Returns the process pool used by :py:func:`reversible.in_process` by
+    default.
+
+    The pool is created the first time it is needed with one worker per CPU.
+    """
+    global _default_process_pool
+
+    if _default_process_pool is None:
+        with _default_process_pool_lock:
+            if _default_process_pool is None:
+                # Imports multiprocessing, which is slow to import.
+                from concurrent.futures import ProcessPoolExecutor
+
+                _default_process_pool = ProcessPoolExecutor()
+    return _default_process_pool
+
+
+def _call_forwards(payload):
+    """Runs in a worker process.
+
+    Returns the pickled result or exception of the action along with the
+    action itself, so that the parent gets back the state ``forwards`` left
+    in it, even if it failed.
+    """
+    action = pickle.loads(payload)
+    try:
+        outcome = (action.forwards(), None)
+    except Exception as e:
+        outcome = (None, e)
+    return pickle.dumps(outcome + (action,), pickle.HIGHEST_PROTOCOL)
+
+
+class _ProcessAction(object):
+    """Calls the ``forwards`` method of an action in a worker process.
+
+    ``backwards`` is called in the current process on the copy of the action
+    returned by the worker.
+    """
+
+    __slots__ = ('action', 'process_pool')
+
+    def __init__(self, action, process_pool=None):
+        self.action = action
+        self.process_pool = process_pool
+
+    def _submit(self):
+        # Pickled here rather than by the pool so that actions that can't be
+        # pickled fail right away, in the caller's thread.
+        payload = pickle.dumps(self.action, pickle.HIGHEST_PROTOCOL)
+        pool = self.process_pool or default_process_pool()
+        return pool.submit(_call_forwards, payload)
+
+    def _finish(self, data):
+        result, error, self.action = pickle.loads(data)
+        if error is not None:
+            raise error
+        return result
+
+    def forwards(self):
+        return self._finish(self._submit().result())
+
+    def backwards(self):
+        return self.action.backwards()
+
+    def __str__(self):
+        return "<ProcessAction %s>" % (self.action,)
+
+    __repr__ = __str__
+
+
+def in_process(action, process_pool=None):
+    """Executes the ``forwards`` method of an action in another process.
+
+    Use this for CPU-bound steps that would otherwise hold the GIL and stall
+    other sagas running on the same interpreter.
+
+    .. code-block:: python
+
+        @reversible.gen
+        def publish(document):
+            path = yield reversible.in_process(render_pdf(document))
+            yield upload(path)
+
+    The action is pickled, sent to a worker of ``process_pool``, and its
+    ``forwards`` method is called there. The worker sends the result back
+    along with the action itself, so state that ``forwards`` stored on the
+    action, like the context of :py:func:`reversible.action` actions, is
+    available to ``backwards``, which is called in the current process.
+
+    The action must be picklable. See :py:class:`reversible.core.BoundAction`.
+    Its own retry and timeout policies are not applied; set them on the
+    executor or with :py:func:`reversible.execute` instead.
+
+    Calling ``forwards`` blocks the calling thread until the worker is done.
+    Use :py:func:`reversible.tornado.in_process` with the Tornado engines.
+
+    :param action:
+        The action to execute.
+    :param process_pool:
+        ``concurrent.futures.ProcessPoolExecutor`` to execute the action on.
+        Defaults to a pool shared by all such actions.
+    :returns:
+        An action executable via :py:func:`reversible.execute` and yieldable
+        in :py:func:`reversible.gen`.
+    """
+    return _ProcessAction(action, process_pool)
+
+
+__all__ = ['default_process_pool', 'in_process']
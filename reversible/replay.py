@@ -0,0 +1,286 @@
+from __future__ import absolute_import
+
+import pickle
+import sqlite3
+import itertools
+import threading
+
+from .core import _action_name, log
+from .generator import _Constant
+
+
+class ReplayDivergence(Exception):
+    """Raised at the yield point of a step that doesn't match the step
+    recorded at the same position by an earlier execution of the saga.
+
+    See :py:func:`reversible.replay`.
+    """
+
+
+class SQLiteResultStore(object):
+    """
+    Records the results of the steps completed by sagas in a SQLite database.
+
+    See :py:func:`reversible.replay`.
+
+    .. code-block:: python
+
+        store = reversible.SQLiteResultStore('/var/lib/imports/results.db')
+
+    Steps are pickled along with their result and context, under the same
+    constraints as :py:class:`reversible.FileJournal`. The store may be
+    shared by sagas running on different threads.
+
+    :param path:
+        Path to the database file. It is created if it doesn't exist.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS steps ('
+                ' saga TEXT NOT NULL,'
+                ' step TEXT NOT NULL,'
+                ' payload BLOB NOT NULL,'
+                ' PRIMARY KEY (saga, step))'
+            )
+
+    def steps(self, saga):
+        """Returns a dictionary mapping the positions of the steps recorded
+        for the given saga to their payloads."""
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT step, payload FROM steps WHERE saga = ?', (saga,)
+            ).fetchall()
+        return dict((step, bytes(payload)) for step, payload in rows)
+
+    def put(self, saga, step, payload):
+        """Records a completed step."""
+        with self._lock, self._db:
+            self._db.execute(
+                'INSERT OR REPLACE INTO steps VALUES (?, ?, ?)',
+                (saga, step, sqlite3.Binary(payload)),
+            )
+
+    def delete(self, saga, step):
+        """Forgets a step that was rolled back."""
+        with self._lock, self._db:
+            self._db.execute(
+                'DELETE FROM steps WHERE saga = ? AND step = ?', (saga, step)
+            )
+
+    def clear(self, saga):
+        """Forgets all steps of a saga."""
+        with self._lock, self._db:
+            self._db.execute('DELETE FROM steps WHERE saga = ?', (saga,))
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def __str__(self):
+        return "<SQLiteResultStore %s>" % (self.path,)
+
+    __repr__ = __str__
+
+
+def _step_key(action):
+    return (_action_name(action), getattr(action, 'idempotency_key', None))
+
+
+class _SagaReplay(object):
+    """Replays and records the steps of one generator of a saga."""
+
+    __slots__ = ('store', 'saga', 'root', 'recorded', 'prefix', 'steps')
+
+    def __init__(self, store, saga, root, recorded=None, prefix=''):
+        self.store = store
+        self.saga = saga
+        self.root = root
+        self.recorded = store.steps(saga) if recorded is None else recorded
+
+        # Steps are numbered by their position in the call tree: the third
+        # step of a generator yielded as the second step of the saga is
+        # '1.2'. Each generator numbers its own steps in the order in which
+        # it yields them, so concurrent generators don't affect each other.
+        self.prefix = prefix
+        self.steps = itertools.count()
+
+    def bind(self, action):
+        """Returns an action that replays or records the next step."""
+        step = self.prefix + str(next(self.steps))
+        if hasattr(type(action), 'replay'):
+            # Nested generators number their steps under this one.
+            action.replay = _SagaReplay(
+                self.store, self.saga, self.root, self.recorded, step + '.'
+            )
+            return action
+
+        key = _step_key(action)
+        payload = self.recorded.pop(step, None)
+        if payload is None:
+            return _RecordingAction(action, self, step, key)
+
+        recorded_key, recorded_action, result = pickle.loads(payload)
+        if recorded_key != key:
+            return _DivergedAction(action, ReplayDivergence(
+                'Step %s of saga %s is %r but %r was recorded.'
+                % (step, self.saga, key, recorded_key)
+            ))
+        return _ReplayedAction(recorded_action, self, step, result)
+
+    def record(self, step, key, action, result):
+        try:
+            payload = pickle.dumps(
+                (key, action, result), pickle.HIGHEST_PROTOCOL
+            )
+        except Exception as e:
+            # The step will be executed again by the next replay.
+            log.warning('Not recording step %s of saga %s: %r',
+                        step, self.saga, e)
+            return
+        self.store.put(self.saga, step, payload)
+
+    def forget(self, step):
+        self.store.delete(self.saga, step)
+
+    def finish(self, action):
+        """Called when a generator that uses this replay succeeds."""
+        if action is self.root:
+            self.store.clear(self.saga)
+
+
+class _RecordingAction(object):
+
+    __slots__ = ('action', 'saga', 'step', 'key')
+
+    def __init__(self, action, saga, step, key):
+        self.action = action
+        self.saga = saga
+        self.step = step
+        self.key = key
+
+    def forwards(self):
+        result = self.action.forwards()
+        self.saga.record(self.step, self.key, self.action, result)
+        return result
+
+    def backwards(self):
+        self.action.backwards()
+        self.saga.forget(self.step)
+
+    def __str__(self):
+        return str(self.action)
+
+    __repr__ = __str__
+
+
+class _ReplayedAction(object):
+    """A step completed by an earlier execution of the saga."""
+
+    __slots__ = ('action', 'saga', 'step', 'result')
+
+    def __init__(self, action, saga, step, result):
+        self.action = action
+        self.saga = saga
+        self.step = step
+        self.result = result
+
+    def forwards(self):
+        return self.result
+
+    def backwards(self):
+        self.action.backwards()
+        self.saga.forget(self.step)
+
+    def __str__(self):
+        return str(self.action)
+
+    __repr__ = __str__
+
+
+class _DivergedAction(object):
+
+    __slots__ = ('action', 'error')
+
+    def __init__(self, action, error):
+        self.action = action
+        self.error = error
+
+    def forwards(self):
+        raise self.error
+
+    def backwards(self):
+        # forwards was never called.
+        pass
+
+    def __str__(self):
+        return str(self.action)
+
+    __repr__ = __str__
+
+
+def replay(action, store, saga):
+    """Resumes a generator-based action from the results recorded by earlier
+    executions.
+
+    Every step completed by the action is recorded in ``store`` under the ID
+    ``saga`` and its position in the saga. If the process dies or the saga
+    fails to roll back, executing the same saga again with the same ID
+    doesn't call the ``forwards`` methods of the steps that were recorded.
+    Their recorded results are sent back to the generator instead, and real
+    execution resumes at the first step that wasn't recorded.
+
+    .. code-block:: python
+
+        store = reversible.SQLiteResultStore('/var/lib/imports/results.db')
+
+        @reversible.gen
+        def import_export(export_id):
+            rows = yield download(export_id)
+            path = yield render(rows)
+            yield upload(path)
+
+        # Skips download and render if they completed before a crash.
+        reversible.execute(reversible.replay(
+            import_export(export_id), store, 'import-%s' % export_id
+        ))
+
+    The generator must yield the same steps in the same order every time.
+    Each step is identified by its position and the name of its action, along
+    with the action's ``idempotency_key`` attribute, if it has one. A step
+    that doesn't match the one recorded at the same position fails with
+    :py:class:`reversible.ReplayDivergence`, and the saga is rolled back as
+    usual. Steps of nested generators are numbered under the position of the
+    generator in the outer generator, so nested generators that run
+    concurrently may finish in any order.
+
+    Replayed steps are rolled back with the context they had when they were
+    recorded. Steps that are rolled back are removed from the store, and all
+    records of a saga are removed once it succeeds. Steps and results that
+    can't be pickled are not recorded and will be executed again.
+
+    Only actions built with :py:func:`reversible.gen` may be replayed.
+
+    :param action:
+        An action built by :py:func:`reversible.gen`.
+    :param store:
+        A store like :py:class:`reversible.SQLiteResultStore`.
+    :param saga:
+        String that identifies the saga across executions.
+    :returns:
+        The same action.
+    """
+    if not hasattr(type(action), 'replay'):
+        if isinstance(action, _Constant):
+            # The generator function returned without yielding anything.
+            return action
+        raise TypeError('%r is not a generator-based action.' % (action,))
+    action.replay = _SagaReplay(store, saga, action)
+    return action
+
+
+__all__ = ['replay', 'ReplayDivergence', 'SQLiteResultStore']
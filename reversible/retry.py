@@ -0,0 +1,196 @@
+from __future__ import absolute_import
+
+import time
+import random
+import logging
+
+
+log = logging.getLogger('reversible')
+
+
+class Retry(object):
+    """
+    A policy for retrying actions that fail with transient errors.
+
+    Policies may be attached to an action with :py:func:`reversible.action`,
+    or passed to :py:func:`reversible.execute` to apply to every step of the
+    action that doesn't declare its own.
+
+    .. code-block:: python
+
+        @reversible.action(
+            retry=reversible.Retry(attempts=5, retry_on=(ConnectionError,)),
+            rollback_retry=reversible.Retry(attempts=10),
+        )
+        def reserve_item(context, order_id, item):
+            context['reservation'] = Inventory.reserve(order_id, item)
+            return context['reservation']
+
+    A failed attempt is retried after a delay that starts at ``backoff``
+    seconds and is multiplied by ``multiplier`` after every attempt, up to
+    ``max_backoff``. With ``jitter``, the actual delay is chosen uniformly at
+    random between zero and that value so that sagas that failed together
+    don't retry together.
+
+    Retried actions must be safe to call again after a failed attempt.
+
+    :param attempts:
+        Maximum number of attempts, including the first one.
+    :param backoff:
+        Delay in seconds before the second attempt.
+    :param max_backoff:
+        Maximum delay in seconds between two attempts.
+    :param multiplier:
+        Factor by which the delay grows after every attempt.
+    :param jitter:
+        Whether to randomize delays.
+    :param retry_on:
+        An exception class, a tuple of exception classes, or a function that
+        accepts an exception and returns True if the attempt that raised it
+        should be retried. Defaults to all exceptions.
+    """
+
+    def __init__(self, attempts=3, backoff=0.1, max_backoff=10.0,
+                 multiplier=2.0, jitter=True, retry_on=Exception):
+        if attempts < 1:
+            raise ValueError('attempts must be at least 1.')
+
+        self.attempts = attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.retry_on = retry_on
+
+    def should_retry(self, error, attempt):
+        """Returns True if the given attempt, which failed with ``error``,
+        should be followed by another one.
+
+        Attempts are numbered from 1.
+        """
+        if attempt >= self.attempts:
+            return False
+
+        retry_on = self.retry_on
+        if isinstance(retry_on, (type, tuple)):
+            return isinstance(error, retry_on)
+        else:
+            return retry_on(error)
+
+    def delay(self, attempt):
+        """Returns the number of seconds to wait after the given failed
+        attempt."""
+        delay = min(
+            self.max_backoff, self.backoff * self.multiplier ** (attempt - 1)
+        )
+        if self.jitter:
+            delay = random.uniform(0, delay)
+        return delay
+
+    def _backoff(self, function, error, attempt, left=None):
+        """Returns the number of seconds to wait before retrying the given
+        failed attempt, or None if it may not be retried.
+
+        ``left`` is the number of seconds left before the deadline of the
+        saga, or None. Nothing is retried once the deadline has passed, and
+        delays end at the deadline.
+        """
+        if left is not None and left <= 0:
+            return None
+        if not self.should_retry(error, attempt):
+            return None
+
+        delay = self.delay(attempt)
+        if left is not None and delay > left:
+            delay = left
+        log.debug(
+            'Attempt %d of %s failed: %r. Retrying in %.3f seconds.',
+            attempt, function, error, delay,
+        )
+        return delay
+
+    def call(self, function, sleep=time.sleep, left=None):
+        """Calls ``function`` until it succeeds or may not be retried.
+
+        :param function:
+            Function to call with no arguments.
+        :param sleep:
+            Function used to wait between attempts.
+        :param left:
+            Function that returns the number of seconds left before a
+            deadline, or None if there is none. Attempts that fail after the
+            deadline aren't retried, and no delay extends past it. Optional.
+        :returns:
+            The result of the first successful call. If the last attempt
+            fails, its exception is raised.
+        """
+        attempt = 1
+        while True:
+            try:
+                return function()
+            except Exception as error:
+                delay = self._backoff(
+                    function, error, attempt, left and left()
+                )
+                if delay is None:
+                    raise
+            sleep(delay)
+            attempt += 1
+
+    def __str__(self):
+        return "<Retry attempts=%d, backoff=%s, retry_on=%s>" % (
+            self.attempts, self.backoff, self.retry_on
+        )
+
+    __repr__ = __str__
+
+
+def _left(deadline, rollback=False):
+    """Returns a function that returns the number of seconds left before the
+    given deadline, or None if there is no deadline."""
+    if deadline is None:
+        return None
+    return lambda: deadline.left(rollback)
+
+
+class _RetryingAction(object):
+    """Retries the ``forwards`` and ``backwards`` methods of an action.
+
+    ``deadline`` is the time budget of the saga, if any. Retries stop when it
+    runs out.
+    """
+
+    __slots__ = ('action', 'retry', 'rollback_retry', 'sleep', 'deadline')
+
+    # See reversible.core._unwrap.
+    _transparent = True
+
+    def __init__(self, action, retry, rollback_retry, sleep=time.sleep,
+                 deadline=None):
+        self.action = action
+        self.retry = retry
+        self.rollback_retry = rollback_retry
+        self.sleep = sleep
+        self.deadline = deadline
+
+    def forwards(self):
+        if self.retry is None:
+            return self.action.forwards()
+        return self.retry.call(
+            self.action.forwards, self.sleep, _left(self.deadline)
+        )
+
+    def backwards(self):
+        if self.rollback_retry is None:
+            return self.action.backwards()
+        return self.rollback_retry.call(
+            self.action.backwards, self.sleep, _left(self.deadline, True)
+        )
+
+    def __str__(self):
+        return str(self.action)
+
+    __repr__ = __str__
+
+
+__all__ = ['Retry']
@@ -0,0 +1,134 @@
+from __future__ import absolute_import
+
+import pickle
+import tempfile
+from collections import deque
+
+from .core import log
+
+
+class _SpillLog(object):
+    """A stack of executed actions that keeps a bounded number of them in
+    memory.
+
+    Once ``2 * threshold`` actions are held in memory, the oldest
+    ``threshold`` of them are pickled to a temporary file. They are loaded
+    back when everything after them has been popped. Chunks that can't be
+    pickled stay in memory.
+
+    Supports the subset of the ``deque`` interface used by generator-based
+    actions: ``append``, ``pop``, ``clear``, ``[-1]`` and ``len``.
+    """
+
+    __slots__ = ('threshold', 'recent', 'chunks', 'size', 'file')
+
+    def __init__(self, threshold):
+        if threshold < 1:
+            raise ValueError('threshold must be at least 1.')
+
+        self.threshold = threshold
+
+        # Most recent actions, in memory.
+        self.recent = deque()
+
+        # Older actions, oldest first. Each chunk is either a list of actions
+        # or an (offset, length, count) tuple locating them in the file.
+        self.chunks = []
+
+        # Number of actions in chunks.
+        self.size = 0
+        self.file = None
+
+    def append(self, action):
+        recent = self.recent
+        recent.append(action)
+        if len(recent) >= 2 * self.threshold:
+            self._spill()
+
+    def _spill(self):
+        chunk = [self.recent.popleft() for _ in range(self.threshold)]
+        self.size += len(chunk)
+        try:
+            data = pickle.dumps(chunk, pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            log.debug('Keeping %d actions in memory: %r', len(chunk), e)
+            self.chunks.append(chunk)
+            return
+
+        if self.file is None:
+            self.file = tempfile.TemporaryFile()
+        f = self.file
+        f.seek(0, 2)
+        offset = f.tell()
+        f.write(data)
+        self.chunks.append((offset, len(data), len(chunk)))
+
+    def _load(self):
+        chunk = self.chunks.pop()
+        if isinstance(chunk, tuple):
+            offset, length, _ = chunk
+            f = self.file
+            f.seek(offset)
+            chunk = pickle.loads(f.read(length))
+            if offset:
+                # The space is reused by the next spill.
+                f.truncate(offset)
+            else:
+                f.close()
+                self.file = None
+        self.size -= len(chunk)
+        self.recent.extend(chunk)
+
+    def pop(self):
+        if not self.recent:
+            self._load()
+        return self.recent.pop()
+
+    def __getitem__(self, index):
+        if index != -1:
+            raise IndexError('Only the last action may be looked up.')
+        if not self.recent:
+            self._load()
+        return self.recent[-1]
+
+    def __len__(self):
+        return len(self.recent) + self.size
+
+    def __bool__(self):
+        return bool(self.recent) or self.size > 0
+
+    __nonzero__ = __bool__
+
+    def clear(self):
+        self.recent.clear()
+        del self.chunks[:]
+        self.size = 0
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def __str__(self):
+        return "<SpillLog %d actions, %d in memory>" % (
+            len(self), len(self.recent)
+        )
+
+    __repr__ = __str__
+
+
+def _rollback_log(max_rollback_depth=None, spill_threshold=None):
+    """Returns a container for the actions executed by a generator."""
+    if spill_threshold is not None:
+        return _SpillLog(spill_threshold)
+    return deque(maxlen=max_rollback_depth)
+
+
+def _check_rollback_log(max_rollback_depth=None, spill_threshold=None):
+    """Validates the arguments of :py:func:`_rollback_log`."""
+    if max_rollback_depth is not None and spill_threshold is not None:
+        raise ValueError(
+            'max_rollback_depth and spill_threshold may not be combined.'
+        )
+    if max_rollback_depth is not None and max_rollback_depth < 0:
+        raise ValueError('max_rollback_depth must not be negative.')
+    if spill_threshold is not None and spill_threshold < 1:
+        raise ValueError('spill_threshold must be at least 1.')
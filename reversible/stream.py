@@ -0,0 +1,123 @@
+from __future__ import absolute_import
+
+import itertools
+
+from .core import default_executor
+from .generator import gen, Return
+
+
+class StreamInterrupted(Exception):
+    """Raised by :py:func:`reversible.stream` when a chunk fails.
+
+    The failed chunk has been rolled back. Chunks before it stay applied.
+
+    .. py:attribute:: offset
+
+        Number of items that were processed successfully. Pass it as the
+        ``offset`` argument of :py:func:`reversible.stream` to resume.
+
+    .. py:attribute:: error
+
+        The exception that failed the chunk, or the exception raised while
+        rolling it back if that failed too.
+    """
+
+    def __init__(self, offset, error):
+        super(StreamInterrupted, self).__init__(
+            'Stream interrupted at item %d: %s' % (offset, error)
+        )
+        self.offset = offset
+        self.error = error
+
+
+@gen
+def _chunk(step_action, items):
+    results = []
+    for item in items:
+        results.append((yield step_action(item)))
+    raise Return(results)
+
+
+def stream(items, step_action, chunk_size=100, offset=0, checkpoint=None,
+           executor=None):
+    """
+    Executes an action for every item of an iterable, in chunks.
+
+    Items are pulled from ``items`` lazily, ``chunk_size`` at a time. Each
+    chunk is executed as one saga, as if by a :py:func:`reversible.gen`
+    generator that yields ``step_action(item)`` for each of its items, and is
+    final once it succeeds. If a chunk fails, only its own steps are rolled
+    back and :py:class:`reversible.StreamInterrupted` is raised with the
+    number of items processed so far.
+
+    .. code-block:: python
+
+        offset = load_offset()
+        try:
+            for row_id in reversible.stream(
+                export.rows(), import_row, chunk_size=500, offset=offset,
+                checkpoint=save_offset,
+            ):
+                print('imported', row_id)
+        except reversible.StreamInterrupted as e:
+            log.error('Import stopped after %d rows: %s', e.offset, e.error)
+
+    The results of the steps are yielded in order once their chunk has
+    succeeded, so the consumer never sees a result that is later rolled back.
+    At most one chunk of items and results is held in memory.
+
+    :param items:
+        Iterable of items to process.
+    :param step_action:
+        Function that accepts an item and returns the action to execute for
+        it, usually a function decorated with :py:func:`reversible.action`.
+    :param chunk_size:
+        Number of items executed and rolled back together.
+    :param offset:
+        Number of items at the start of ``items`` to skip. Used to resume an
+        interrupted stream.
+    :param checkpoint:
+        Function called with the number of items processed so far, including
+        the skipped ones, after each chunk succeeds. Optional.
+    :param executor:
+        :py:class:`reversible.Executor` used to execute the chunks. Defaults
+        to :py:data:`reversible.default_executor`.
+    :returns:
+        An iterator of the values returned by the steps.
+    :raises StreamInterrupted:
+        If a chunk fails.
+    """
+    if chunk_size < 1:
+        raise ValueError('chunk_size must be at least 1.')
+    if offset < 0:
+        raise ValueError('offset must not be negative.')
+
+    items = iter(items)
+    if offset:
+        items = itertools.islice(items, offset, None)
+    return _stream(
+        items, step_action, chunk_size, offset, checkpoint,
+        executor or default_executor,
+    )
+
+
+def _stream(items, step_action, chunk_size, offset, checkpoint, executor):
+    while True:
+        chunk = list(itertools.islice(items, chunk_size))
+        if not chunk:
+            return
+
+        try:
+            results = executor.execute(_chunk(step_action, chunk))
+        except Exception as e:
+            raise StreamInterrupted(offset, e)
+
+        offset += len(chunk)
+        if checkpoint is not None:
+            checkpoint(offset)
+
+        for result in results:
+            yield result
+
+
+__all__ = ['stream', 'StreamInterrupted']
@@ -0,0 +1,11 @@
+from __future__ import absolute_import
+
+from .core import action, execute, execute_many
+from .generator import barrier, commit, gen, Return, savepoint
+from .graph import graph
+from .process import in_process
+
+__all__ = [
+    'action', 'barrier', 'commit', 'execute', 'execute_many', 'gen', 'graph',
+    'in_process', 'Return', 'savepoint',
+]
@@ -1,6 +1,11 @@
 from __future__ import absolute_import
 
-from .core import action, execute
-from .generator import gen, lift, Return
+from .core import action, execute, execute_many
+from .generator import barrier, commit, gen, lift, multi, Return, savepoint
+from reversible.tornado_native.graph import graph
+from reversible.tornado_native.process import in_process
 
-__all__ = ['action', 'execute', 'gen', 'lift', 'Return']
+__all__ = [
+    'action', 'barrier', 'commit', 'execute', 'execute_many', 'gen', 'graph',
+    'in_process', 'lift', 'multi', 'Return', 'savepoint',
+]
@@ -8,7 +8,12 @@ from tornado.ioloop import IOLoop
 from tornado.concurrent import Future, is_future
 
 from reversible.core import action
-from reversible.core import execute as _execute
+from reversible.core import default_executor
+from reversible.core import _deadline, _limited, _retrying, _timed, _traced
+from reversible.core import _observer
+from reversible.retry import _RetryingAction
+from reversible.tornado_native.core import _ExecuteMany, _LimitedAction
+from reversible.tornado_native.core import _TimedAction
 
 
 action = action
@@ -24,6 +29,10 @@ def _maybe_async(fn):
             # is available to the caller right away. No need to switch control
             # with greenlets.
             return result
+        if result.done():
+            # Same for futures that have already resolved, like cache hits or
+            # lifted results. result() raises the future's exception, if any.
+            return result.result()
 
         current = greenlet.getcurrent()
         assert current.parent is not None, (
@@ -51,6 +60,27 @@ def _maybe_async(fn):
     return new_fn
 
 
+def _spawn(fn, io_loop, parent=None):
+    """Call ``fn`` inside a new greenlet on the IOLoop.
+
+    Returns a Future that resolves to the result of ``fn``. ``fn`` may switch
+    control to ``parent`` (the current greenlet if omitted) while it waits on
+    asynchronous operations.
+    """
+    output = Future()
+
+    def call():
+        try:
+            result = fn()
+        except Exception:
+            output.set_exc_info(sys.exc_info())
+        else:
+            output.set_result(result)
+
+    io_loop.add_callback(greenlet.greenlet(call, parent).switch)
+    return output
+
+
 class _TornadoAction(object):
     """Provides synchronous APIs for asynchronous actions.
 
@@ -63,6 +93,9 @@ class _TornadoAction(object):
 
     __slots__ = ('action', 'io_loop')
 
+    # See reversible.core._unwrap.
+    _transparent = True
+
     def __init__(self, action, io_loop=None):
         self.action = action
         self.io_loop = io_loop or IOLoop.current()
@@ -75,8 +108,55 @@ class _TornadoAction(object):
     def backwards(self):
         return self.action.backwards()
 
+    def __reduce__(self):
+        # The IOLoop can't be pickled. Actions loaded back from a spilled
+        # rollback log use the current one, which is the one rolling them
+        # back.
+        return (_TornadoAction, (self.action,))
+
+    @_maybe_async
+    def sleep(self, seconds):
+        """Waits for the given number of seconds without blocking the
+        IOLoop."""
+        future = Future()
+        self.io_loop.call_later(seconds, future.set_result, None)
+        return future
+
+
+def _retrying_action(action, retry, rollback_retry, deadline=None):
+    # Wraps a _TornadoAction so that delays between attempts are spent on the
+    # IOLoop.
+    return _RetryingAction(
+        action, retry, rollback_retry, action.sleep, deadline
+    )
+
+
+def _bind(io_loop, action, deadline=None, retry=None, tracer=None,
+          owner=None):
+    """Wraps an action for execution on the IOLoop.
+
+    Applies the given deadline and ``(retry, rollback_retry)`` policies, along
+    with the action's own policies and limiter. If ``tracer`` is given, spans
+    are recorded under the current span of ``owner``, the generator executing
+    the action.
+    """
+    step = _limited(
+        action, wrap=functools.partial(_LimitedAction, io_loop=io_loop)
+    )
+    step = _timed(
+        step, deadline, action,
+        wrap=functools.partial(_TimedAction, io_loop=io_loop),
+    )
+    retry, rollback_retry = retry or (None, None)
+    step = _retrying(
+        _TornadoAction(step, io_loop), retry, rollback_retry, action,
+        _retrying_action, deadline,
+    )
+    return _traced(step, tracer, owner, action)
 
-def execute(action, io_loop=None):
+
+def execute(action, io_loop=None, executor=None, retry=None,
+            rollback_retry=None, timeout=None, rollback_timeout=None):
     """Execute the given action and return a Future with the result.
 
     The ``forwards`` and/or ``backwards`` methods for the action may be
@@ -91,25 +171,86 @@ def execute(action, io_loop=None):
     :param io_loop:
         IOLoop through which asynchronous operations will be executed. If
         omitted, the current IOLoop is used.
+    :param executor:
+        :py:class:`reversible.Executor` used to execute the action. Defaults
+        to :py:data:`reversible.default_executor`.
+    :param retry:
+        :py:class:`reversible.Retry` policy for ``forwards``. Optional. Delays
+        between attempts don't block the IOLoop.
+    :param rollback_retry:
+        :py:class:`reversible.Retry` policy for ``backwards``. Optional.
+    :param timeout:
+        Number of seconds after which the action is abandoned and rolled
+        back. Optional. Asynchronous operations are timed with
+        ``IOLoop.call_later``; synchronous ones can't be interrupted.
+    :param rollback_timeout:
+        Number of seconds rollback may take. Optional.
     :returns:
         A future containing the result of executing the action.
     """
 
     if not io_loop:
         io_loop = IOLoop.current()
+    if not executor:
+        executor = default_executor
 
-    output = Future()
+    deadline = _deadline(timeout, rollback_timeout)
 
-    def call():
-        try:
-            result = _execute(_TornadoAction(action, io_loop))
-        except Exception:
-            output.set_exc_info(sys.exc_info())
-        else:
-            output.set_result(result)
+    def run():
+        return executor._run(action, _bind(
+            io_loop, action, deadline, (retry, rollback_retry),
+            _observer(executor),
+        ))
 
-    io_loop.add_callback(greenlet.greenlet(call).switch)
-    return output
+    return _spawn(run, io_loop)
+
+
+def execute_many(actions, max_pending=100, ordered=True, io_loop=None,
+                 executor=None):
+    """Execute many independent actions concurrently on the IOLoop.
+
+    Each action is executed with :py:func:`reversible.tornado.execute`, and
+    so is rolled back on its own if it fails. The returned object is used like
+    ``tornado.gen.WaitIterator``:
+
+    .. code-block:: python
+
+        outcomes = reversible.tornado.execute_many(actions, max_pending=50)
+        while not outcomes.done():
+            outcome = yield outcomes.next()
+            if outcome.error is not None:
+                log.warning('%s failed: %s', outcome.action, outcome.error)
+
+    At most ``max_pending`` actions are in flight or waiting to be consumed
+    at any time. Actions are pulled from ``actions`` lazily.
+
+    See :py:func:`reversible.execute_many` for details.
+
+    :param actions:
+        Iterable of actions to execute.
+    :param max_pending:
+        Maximum number of actions that have been started but whose outcome has
+        not been consumed yet.
+    :param ordered:
+        If true (the default), outcomes are returned in the same order as the
+        actions. Otherwise, they are returned as soon as they are available.
+    :param io_loop:
+        IOLoop through which asynchronous operations will be executed. If
+        omitted, the current IOLoop is used.
+    :param executor:
+        :py:class:`reversible.Executor` used to execute the actions. Defaults
+        to :py:data:`reversible.default_executor`.
+    :returns:
+        An object whose ``next()`` method returns a Future resolving to the
+        next :py:class:`reversible.Outcome`, and whose ``done()`` method
+        returns True once all outcomes have been returned.
+    """
+    if max_pending < 1:
+        raise ValueError('max_pending must be at least 1.')
+    return _ExecuteMany(
+        actions, max_pending, ordered, io_loop or IOLoop.current(), executor,
+        execute,
+    )
 
 
-__all__ = ['action', 'execute']
+__all__ = ['action', 'execute', 'execute_many']
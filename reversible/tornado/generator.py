@@ -4,18 +4,29 @@ import sys
 import types
 import functools
 
-from tornado.gen import Return
-
-from reversible.core import SimpleAction
-from reversible.generator import _GeneratorAction
+import greenlet
+from tornado.gen import Return, coroutine
+from tornado.ioloop import IOLoop
+
+from reversible.core import _coalesce, _scatter
+from reversible.core import _pop_rollback as _merge_rollback
+from reversible.generator import _GeneratorAction, _Constant, _BARRIER
+from reversible.generator import _COMMIT, barrier, commit, savepoint
+from reversible.spill import _check_rollback_log, _rollback_log
 from reversible.generator import Return as _Return
 
-from .core import _TornadoAction
+from .core import _TornadoAction, _bind, _spawn
 
 _RETURNS = (Return, _Return)
 
 Return = Return
 
+barrier = barrier
+
+commit = commit
+
+savepoint = savepoint
+
 
 class _Lift(object):
 
@@ -31,6 +42,131 @@ class _Lift(object):
         pass
 
 
+class _TornadoMulti(object):
+    """Executes a group of independent actions concurrently on the IOLoop.
+
+    Every member runs inside its own greenlet so that asynchronous members
+    (including other :py:func:`reversible.tornado.gen` actions) wait on the
+    IOLoop side by side. The group itself returns a single Future, so the
+    greenlet executing the group is suspended only once.
+
+    If any member fails, the members that succeeded are rolled back
+    concurrently and the first failure (in member order) is raised. The
+    failed members are rolled back when the group itself is rolled back,
+    again concurrently.
+    """
+
+    __slots__ = ('actions', 'count', 'positions', 'io_loop', 'pending')
+
+    def __init__(self, actions, io_loop=None, saga=None):
+        self.io_loop = io_loop = io_loop or IOLoop.current()
+
+        deadline = retry = tracer = None
+        if saga is not None:
+            deadline, retry = saga.step_deadline, saga.step_retry
+            if saga.step_trace is not None:
+                tracer = saga.step_trace[0]
+
+        actions = list(actions)
+        self.count = len(actions)
+        actions, self.positions = _coalesce(actions)
+        self.actions = [
+            _bind(io_loop, a, deadline, retry, tracer, saga) for a in actions
+        ]
+
+        # Members that have not been rolled back yet.
+        self.pending = self.actions
+
+    def forwards(self):
+        if not self.actions:
+            return []
+        return self._forwards(greenlet.getcurrent().parent)
+
+    @coroutine
+    def _forwards(self, parent):
+        futures = [
+            _spawn(action.forwards, self.io_loop, parent)
+            for action in self.actions
+        ]
+
+        results = []
+        succeeded = []
+        error = None
+        for action, future in zip(self.actions, futures):
+            try:
+                results.append((yield future))
+            except Exception as e:
+                if error is None:
+                    error = e
+            else:
+                succeeded.append(action)
+
+        if error is None:
+            raise Return(_scatter(results, self.positions, self.count))
+
+        self.pending = list(self.actions)
+        yield self._backwards_all(succeeded, parent)
+        raise error
+
+    @coroutine
+    def _backwards_all(self, actions, parent):
+        futures = [
+            _spawn(action.backwards, self.io_loop, parent)
+            for action in actions
+        ]
+
+        error = None
+        for action, future in zip(actions, futures):
+            try:
+                yield future
+            except Exception as e:
+                if error is None:
+                    error = e
+            else:
+                self.pending.remove(action)
+
+        if error is not None:
+            raise error
+
+    def backwards(self):
+        if not self.pending:
+            return None
+        return self._backwards_all(
+            list(reversed(self.pending)), greenlet.getcurrent().parent
+        )
+
+    def __str__(self):
+        return "<TornadoMulti %s>" % ([a.action for a in self.actions],)
+
+    __repr__ = __str__
+
+
+def _wrap(io_loop, saga, item):
+    if item is _BARRIER or item is _COMMIT:
+        return item
+    if isinstance(item, (list, tuple)):
+        return _TornadoAction(_TornadoMulti(item, io_loop, saga), io_loop)
+    tracer = saga.step_trace[0] if saga.step_trace is not None else None
+    return _bind(
+        io_loop, item, saga.step_deadline, saga.step_retry, tracer, saga
+    )
+
+
+def _parallel(io_loop, actions):
+    # Used by _GeneratorAction to roll back independent actions. They have
+    # already been wrapped by _wrap.
+    return _TornadoAction(_TornadoMulti([
+        a.action if isinstance(a, _TornadoAction) else a for a in actions
+    ], io_loop), io_loop)
+
+
+def _pop_rollback(io_loop, saga, executed, bind):
+    # Used by _GeneratorAction to merge rollbacks. The actions have already
+    # been wrapped by _wrap, so merged actions are wrapped by it too, instead
+    # of with bind.
+    return _merge_rollback(executed, functools.partial(_wrap, io_loop, saga))
+
+
 def _map_generator(f, generator):
     """Apply ``f`` to the results of the given bi-directional generator.
 
@@ -40,27 +176,50 @@ def _map_generator(f, generator):
 
     This function implements a map function for generators that sends values
     and exceptions back and forth as expected.
+
+    When ``generator`` finishes, its return value is raised as a
+    :py:class:`reversible.Return`. Letting the ``StopIteration`` escape would
+    turn it into a ``RuntimeError`` on Python 3.7 and newer (PEP 479).
     """
-    item = next(generator)
-    while True:
-        try:
-            result = yield f(item)
-        except Exception:
-            item = generator.throw(*sys.exc_info())
-        else:
-            item = generator.send(result)
+    try:
+        item = next(generator)
+        while True:
+            try:
+                result = yield f(item)
+            except Exception:
+                item = generator.throw(*sys.exc_info())
+            else:
+                item = generator.send(result)
+    except StopIteration as stop:
+        raise _Return(getattr(stop, 'value', None))
 
 
 class _TornadoGeneratorAction(object):
 
-    __slots__ = ('action',)
+    __slots__ = (
+        'generator', 'action', 'step_retry', 'step_deadline', 'step_trace',
+        'savepoint',
+    )
+
+    def __init__(self, generator, io_loop=None, concurrent_rollback=False,
+                 savepoint=False, executed=None):
+        self.generator = generator
+        self.savepoint = savepoint
+
+        # Default retry policies and time budget for steps. Set by
+        # reversible.tornado.execute.
+        self.step_retry = None
+        self.step_deadline = None
+
+        # (tracer, span) of the current call while tracing.
+        self.step_trace = None
 
-    def __init__(self, generator, io_loop=None):
         self.action = _GeneratorAction(
-            _map_generator(
-                functools.partial(_TornadoAction, io_loop=io_loop),
-                generator,
-            )
+            _map_generator(functools.partial(_wrap, io_loop, self), generator),
+            functools.partial(_parallel, io_loop),
+            concurrent_rollback,
+            functools.partial(_pop_rollback, io_loop, self),
+            executed=executed,
         )
 
     def forwards(self):
@@ -68,12 +227,17 @@ class _TornadoGeneratorAction(object):
             return self.action.forwards()
         except _RETURNS as result:
             return getattr(result, 'value', None)
+        except Exception:
+            if self.savepoint:
+                self.action.backwards()
+            raise
 
     def backwards(self):
         return self.action.backwards()
 
 
-def gen(function, io_loop=None):
+def gen(function=None, io_loop=None, concurrent_rollback=False,
+        savepoint=False, max_rollback_depth=None, spill_threshold=None):
     """Allows using a generator to chain together reversible actions.
 
     This function is very similar to :py:func:`reversible.gen` except that it
@@ -109,6 +273,14 @@ def gen(function, io_loop=None):
                 yield update_comment_count(post)
                 update_cache()
 
+    As with :py:func:`reversible.gen`, yielding a list or tuple of actions
+    executes them concurrently. All of them are started together and the
+    generator resumes once all of them have finished. See
+    :py:func:`reversible.tornado.multi`. Such groups are also rolled back
+    concurrently. With ``concurrent_rollback``, all actions executed by the
+    generator are rolled back concurrently on the IOLoop except across
+    barriers yielded with :py:func:`reversible.barrier`.
+
     :param function:
         The generator function. This generator must yield action objects. The
         ``forwards`` and/or ``backwards`` methods on the action may be
@@ -116,32 +288,50 @@ def gen(function, io_loop=None):
     :param io_loop:
         IOLoop used to execute asynchronous operations. Defaults to the
         current IOLoop if omitted.
+    :param concurrent_rollback:
+        If set, actions executed by the generator between barriers are
+        considered independent and are rolled back concurrently.
+    :param savepoint:
+        If set, actions built by the generator roll back their own steps
+        before raising a failure. See :py:func:`reversible.savepoint`.
+    :param max_rollback_depth:
+        If set, only this many of the most recently executed actions are
+        rolled back. See :py:func:`reversible.gen`.
+    :param spill_threshold:
+        If set, older executed actions are pickled to a temporary file. See
+        :py:func:`reversible.gen`.
     :returns:
         An action executable via :py:func:`reversible.tornado.execute` and
         yieldable in other instances of :py:func:`reversible.tornado.gen`.
+        If ``function`` was omitted, a decorator that accepts the generator
+        function is returned.
     """
 
-    @functools.wraps(function)  # TODO: use wrapt instead?
-    def new_function(*args, **kwargs):
-        try:
-            value = function(*args, **kwargs)
-        except _RETURNS as result:
-            return SimpleAction(
-                lambda ctx: ctx.value,
-                lambda _: None,
-                result,
-            )
-        else:
-            if isinstance(value, types.GeneratorType):
-                return _TornadoGeneratorAction(value, io_loop)
+    _check_rollback_log(max_rollback_depth, spill_threshold)
+
+    def decorator(function):
+
+        @functools.wraps(function)  # TODO: use wrapt instead?
+        def new_function(*args, **kwargs):
+            try:
+                value = function(*args, **kwargs)
+            except _RETURNS as result:
+                return _Constant(getattr(result, 'value', None))
             else:
-                return SimpleAction(
-                    lambda _: value,
-                    lambda _: None,
-                    None,
-                )
+                if isinstance(value, types.GeneratorType):
+                    return _TornadoGeneratorAction(
+                        value, io_loop, concurrent_rollback, savepoint,
+                        _rollback_log(max_rollback_depth, spill_threshold),
+                    )
+                else:
+                    return _Constant(value)
 
-    return new_function
+        return new_function
+
+    if function is not None:
+        return decorator(function)
+    else:
+        return decorator
 
 
 def lift(future):
@@ -183,4 +373,44 @@ def lift(future):
     return _Lift(future)
 
 
-__all__ = ['gen', 'Return', 'lift']
+def multi(actions, io_loop=None):
+    """Combines independent actions into one action that runs them together.
+
+    The ``forwards`` methods of all the given actions are started at the same
+    time and their results are returned as a list, in the same order as the
+    actions. Inside :py:func:`reversible.tornado.gen`, yielding a list or
+    tuple of actions is equivalent to yielding ``multi`` of them.
+
+    .. code-block:: python
+
+        @reversible.tornado.gen
+        def notify_all(users, message):
+            receipts = yield reversible.tornado.multi(
+                [send_message(user, message) for user in users]
+            )
+
+        # Also usable with reversible.tornado.execute directly.
+        receipts = yield reversible.tornado.execute(
+            reversible.tornado.multi([send_message(u, m) for u in users])
+        )
+
+    If any of the actions fail, the actions that succeeded are rolled back
+    concurrently and the failure is raised. When the combined action is rolled
+    back, its members are rolled back in the reverse order.
+
+    :param actions:
+        Actions to execute concurrently. Their ``forwards`` and ``backwards``
+        methods may be asynchronous.
+    :param io_loop:
+        IOLoop used to execute asynchronous operations. Defaults to the
+        current IOLoop if omitted.
+    :returns:
+        An action executable via :py:func:`reversible.tornado.execute` and
+        yieldable in other instances of :py:func:`reversible.tornado.gen`.
+    """
+    return _TornadoMulti(actions, io_loop)
+
+
+__all__ = [
+    'barrier', 'commit', 'gen', 'Return', 'lift', 'multi', 'savepoint',
+]
@@ -0,0 +1,504 @@
+from __future__ import absolute_import
+
+import sys
+import functools
+from collections import deque
+
+from tornado.gen import Return, coroutine, sleep
+from tornado.ioloop import IOLoop
+from tornado.concurrent import Future, is_future
+from tornado.util import raise_exc_info
+
+from reversible.core import action
+from reversible.core import default_executor
+from reversible.core import Outcome
+from reversible.core import _deadline, _limited, _retrying, _timed, _traced
+from reversible.core import _observer
+from reversible.deadline import Timeout
+from reversible.retry import _left
+from reversible.trace import _TracedAction as _SyncTracedAction
+
+
+action = action
+
+
+def _future(fn):
+    """Calls ``fn`` and returns a Future for its result.
+
+    Results that are Futures are returned as-is.
+    """
+    try:
+        result = fn()
+    except Exception:
+        future = Future()
+        future.set_exc_info(sys.exc_info())
+        return future
+
+    if is_future(result):
+        return result
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+def _with_timeout(result, seconds, io_loop):
+    """Returns a Future that fails with :py:class:`reversible.Timeout` if
+    ``result`` doesn't resolve within ``seconds``.
+
+    Results that aren't Futures are returned as-is.
+    """
+    if seconds is None or not is_future(result):
+        return result
+
+    output = Future()
+
+    def expire():
+        if not output.done():
+            output.set_exception(Timeout(
+                'Did not finish within %.3f seconds.' % seconds
+            ))
+
+    def finished(future):
+        io_loop.remove_timeout(timeout)
+        if output.done():
+            return
+        if future.exception():
+            output.set_exc_info(future.exc_info())
+        else:
+            output.set_result(future.result())
+
+    timeout = io_loop.call_later(seconds, expire)
+    io_loop.add_future(result, finished)
+    return output
+
+
+class _TimedAction(object):
+    """Bounds how long the asynchronous methods of an action may take.
+
+    The timer runs on the IOLoop. An operation that times out is abandoned;
+    its result is ignored.
+    """
+
+    __slots__ = ('action', 'deadline', 'timeout', 'io_loop')
+
+    # See reversible.core._unwrap.
+    _transparent = True
+
+    def __init__(self, action, deadline, timeout, io_loop=None):
+        self.action = action
+        self.deadline = deadline
+        self.timeout = timeout
+        self.io_loop = io_loop or IOLoop.current()
+
+    def forwards(self):
+        seconds = self.timeout
+        if self.deadline is not None:
+            seconds = self.deadline.remaining(seconds)
+        return _with_timeout(self.action.forwards(), seconds, self.io_loop)
+
+    def backwards(self):
+        seconds = None
+        if self.deadline is not None:
+            seconds = self.deadline.rollback_remaining()
+        return _with_timeout(self.action.backwards(), seconds, self.io_loop)
+
+    def __str__(self):
+        return str(self.action)
+
+    __repr__ = __str__
+
+
+class _RetryingAction(object):
+    """Retries the ``forwards`` and ``backwards`` methods of an action,
+    waiting between attempts on the IOLoop. Retries stop once ``deadline``
+    runs out."""
+
+    __slots__ = ('action', 'retry', 'rollback_retry', 'deadline')
+
+    # See reversible.core._unwrap.
+    _transparent = True
+
+    def __init__(self, action, retry, rollback_retry, deadline=None):
+        self.action = action
+        self.retry = retry
+        self.rollback_retry = rollback_retry
+        self.deadline = deadline
+
+    def forwards(self):
+        if self.retry is None:
+            return self.action.forwards()
+        return _retry(
+            self.retry, self.action.forwards, _left(self.deadline)
+        )
+
+    def backwards(self):
+        if self.rollback_retry is None:
+            return self.action.backwards()
+        return _retry(
+            self.rollback_retry, self.action.backwards,
+            _left(self.deadline, True),
+        )
+
+    def __str__(self):
+        return str(self.action)
+
+    __repr__ = __str__
+
+
+@coroutine
+def _retry(policy, fn, left=None):
+    """Like :py:meth:`reversible.Retry.call` for functions that may return
+    Futures."""
+    attempt = 1
+    while True:
+        try:
+            result = fn()
+            if is_future(result):
+                result = yield result
+        except Exception as error:
+            delay = policy._backoff(fn, error, attempt, left and left())
+            if delay is None:
+                raise
+        else:
+            raise Return(result)
+        yield sleep(delay)
+        attempt += 1
+
+
+def _acquire(limiter, io_loop, rollback=False):
+    """Waits for a :py:class:`reversible.Limiter` on the IOLoop.
+
+    Returns None if the limiter let the call through right away, or a Future
+    that resolves once it does.
+    """
+    granted = []
+    waiting = []
+
+    def wake():
+        # May be called from another thread, with the limiter's lock held.
+        granted.append(True)
+        if waiting:
+            io_loop.add_callback(waiting[0].set_result, None)
+
+    def poll():
+        if not granted:
+            delay = limiter._poll()
+            if delay is not None:
+                io_loop.call_later(delay, poll)
+
+    delay = limiter._enqueue(rollback, wake)
+    if granted:
+        return None
+
+    waiting.append(Future())
+    if granted:
+        # Let through between the two checks.
+        return None
+    if delay is not None:
+        io_loop.call_later(delay, poll)
+    return waiting[0]
+
+
+class _LimitedAction(object):
+    """Holds a limiter while the asynchronous methods of an action run,
+    waiting for it on the IOLoop."""
+
+    __slots__ = ('action', 'limiter', 'io_loop')
+
+    # See reversible.core._unwrap.
+    _transparent = True
+
+    def __init__(self, action, limiter, io_loop=None):
+        self.action = action
+        self.limiter = limiter
+        self.io_loop = io_loop or IOLoop.current()
+
+    def forwards(self):
+        return self._call(self.action.forwards, False)
+
+    def backwards(self):
+        return self._call(self.action.backwards, True)
+
+    def _call(self, method, rollback):
+        waiting = _acquire(self.limiter, self.io_loop, rollback)
+        if waiting is not None:
+            return self._call_later(waiting, method)
+
+        try:
+            result = method()
+        except Exception:
+            self.limiter.release()
+            raise
+        if is_future(result):
+            limiter = self.limiter
+            result.add_done_callback(lambda future: limiter.release())
+        else:
+            self.limiter.release()
+        return result
+
+    @coroutine
+    def _call_later(self, waiting, method):
+        yield waiting
+        try:
+            result = method()
+            if is_future(result):
+                result = yield result
+        finally:
+            self.limiter.release()
+        raise Return(result)
+
+    def __str__(self):
+        return str(self.action)
+
+    __repr__ = __str__
+
+
+class _TracedAction(_SyncTracedAction):
+    """Records spans for the ``forwards`` and ``backwards`` calls of an
+    action. Spans of asynchronous calls end when their Future resolves."""
+
+    __slots__ = ()
+
+    def _call(self, kind, method):
+        span = self._start(kind)
+        try:
+            result = method()
+        except Exception as e:
+            self.tracer.finish(span, e)
+            raise
+
+        if not is_future(result):
+            self.tracer.finish(span)
+            return result
+
+        tracer = self.tracer
+        result.add_done_callback(
+            lambda future: tracer.finish(span, future.exception())
+        )
+        return result
+
+
+def _bind(io_loop, action, deadline=None, retry=None, tracer=None,
+          owner=None):
+    """Applies the given deadline and ``(retry, rollback_retry)`` policies to
+    an action, along with its own policies and limiter. If ``tracer`` is
+    given, spans are recorded under the current span of ``owner``."""
+    step = _limited(
+        action, wrap=functools.partial(_LimitedAction, io_loop=io_loop)
+    )
+    step = _timed(
+        step, deadline, action,
+        wrap=functools.partial(_TimedAction, io_loop=io_loop),
+    )
+    retry, rollback_retry = retry or (None, None)
+    step = _retrying(
+        step, retry, rollback_retry, action, _RetryingAction, deadline
+    )
+    return _traced(step, tracer, owner, action, _TracedAction)
+
+
+@coroutine
+def execute(action, io_loop=None, executor=None, retry=None,
+            rollback_retry=None, timeout=None, rollback_timeout=None):
+    """Execute the given action and return a Future with the result.
+
+    This is a drop-in replacement for :py:func:`reversible.tornado.execute`
+    that doesn't use greenlets. The action is driven by a Tornado coroutine
+    instead, which waits on the Futures returned by ``forwards`` and
+    ``backwards`` directly. Actions and generators must be built with
+    :py:mod:`reversible.tornado_native`.
+
+    .. code-block:: python
+
+        @reversible.tornado_native.gen
+        def post_comment(post, comment):
+            comment_id = yield save_comment(comment)
+            yield update_comment_count(post)
+            raise reversible.tornado_native.Return(comment_id)
+
+        comment_id = yield reversible.tornado_native.execute(
+            post_comment(post, comment)
+        )
+
+    See :py:func:`reversible.execute` for more details on the behavior of
+    ``execute``.
+
+    :param action:
+        The action to execute.
+    :param io_loop:
+        IOLoop used for timeouts. If omitted, the current IOLoop is used.
+    :param executor:
+        :py:class:`reversible.Executor` whose logging policy, hooks and
+        tracer apply to the action. Defaults to
+        :py:data:`reversible.default_executor`.
+    :param retry:
+        :py:class:`reversible.Retry` policy for ``forwards``. Optional. Delays
+        between attempts don't block the IOLoop.
+    :param rollback_retry:
+        :py:class:`reversible.Retry` policy for ``backwards``. Optional.
+    :param timeout:
+        Number of seconds after which the action is abandoned and rolled
+        back. Optional.
+    :param rollback_timeout:
+        Number of seconds rollback may take. Optional.
+    :returns:
+        A future containing the result of executing the action.
+    """
+    if not io_loop:
+        io_loop = IOLoop.current()
+    if not executor:
+        executor = default_executor
+
+    step = _bind(
+        io_loop, action, _deadline(timeout, rollback_timeout),
+        (retry, rollback_retry), _observer(executor),
+    )
+
+    for hook in executor._before:
+        hook(action)
+
+    try:
+        result = step.forwards()
+        if is_future(result):
+            result = yield result
+    except Exception as error:
+        exc_info = sys.exc_info()
+        executor._failed(action, error)
+        try:
+            result = step.backwards()
+            if is_future(result):
+                yield result
+        except Exception as rollback_error:
+            executor._rollback_failed(action, error, rollback_error)
+            raise
+        for hook in executor._rollback:
+            hook(action, error, None)
+        raise_exc_info(exc_info)
+    else:
+        for hook in executor._after:
+            hook(action, result)
+        raise Return(result)
+
+
+class _ExecuteMany(object):
+    """Iterator of Futures returned by :py:func:`execute_many`.
+
+    ``execute`` is the function used to execute each action; either
+    :py:func:`reversible.tornado.execute` or
+    :py:func:`reversible.tornado_native.execute`.
+    """
+
+    def __init__(self, actions, max_pending, ordered, io_loop, executor,
+                 execute):
+        self._actions = iter(actions)
+        self._max_pending = max_pending
+        self._ordered = ordered
+        self._io_loop = io_loop
+        self._executor = executor
+        self._execute = execute
+
+        # The next action to start, pulled ahead of time so that done() is
+        # accurate. _exhausted is set once there are no more actions.
+        self._next = None
+        self._exhausted = False
+        self._advance()
+
+        # ordered: Futures of outcomes in the order of the actions.
+        self._slots = deque()
+
+        # unordered: outcomes that haven't been claimed by next(), and
+        # Futures returned by next() that haven't been resolved.
+        self._ready = deque()
+        self._waiters = deque()
+        self._running = 0
+
+        self._fill()
+
+    def _advance(self):
+        try:
+            self._next = next(self._actions)
+        except StopIteration:
+            self._next = None
+            self._exhausted = True
+
+    def _outstanding(self):
+        if self._ordered:
+            return len(self._slots)
+        else:
+            return self._running + len(self._ready)
+
+    def _fill(self):
+        while not self._exhausted and self._outstanding() < self._max_pending:
+            action = self._next
+            self._advance()
+
+            output = Future()
+            if self._ordered:
+                self._slots.append(output)
+            else:
+                self._running += 1
+
+            self._io_loop.add_future(
+                self._execute(action, self._io_loop, self._executor),
+                functools.partial(self._finished, action, output),
+            )
+
+    def _finished(self, action, output, future):
+        try:
+            outcome = Outcome(action, future.result(), None)
+        except Exception as e:
+            outcome = Outcome(action, None, e)
+
+        if self._ordered:
+            output.set_result(outcome)
+            return
+
+        self._running -= 1
+        if self._waiters:
+            self._waiters.popleft().set_result(outcome)
+            self._fill()
+        else:
+            self._ready.append(outcome)
+
+    def done(self):
+        """Returns True if there are no more outcomes to wait for."""
+        if not self._exhausted:
+            return False
+        elif self._ordered:
+            return not self._slots
+        else:
+            return not self._running and not self._ready
+
+    def next(self):
+        """Returns a Future that resolves to the next
+        :py:class:`reversible.Outcome`."""
+        if self._ordered:
+            output = self._slots.popleft()
+        elif self._ready:
+            output = Future()
+            output.set_result(self._ready.popleft())
+        else:
+            output = Future()
+            self._waiters.append(output)
+            return output
+
+        self._fill()
+        return output
+
+
+def execute_many(actions, max_pending=100, ordered=True, io_loop=None,
+                 executor=None):
+    """Execute many independent actions concurrently on the IOLoop.
+
+    Like :py:func:`reversible.tornado.execute_many`, except that each action
+    is executed with :py:func:`reversible.tornado_native.execute`.
+    """
+    if max_pending < 1:
+        raise ValueError('max_pending must be at least 1.')
+    return _ExecuteMany(
+        actions, max_pending, ordered, io_loop or IOLoop.current(), executor,
+        execute,
+    )
+
+
+__all__ = ['action', 'execute', 'execute_many']
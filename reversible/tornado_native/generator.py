@@ -0,0 +1,344 @@
+from __future__ import absolute_import
+
+import sys
+import types
+import functools
+from collections import deque
+
+from tornado.gen import Return, coroutine
+from tornado.ioloop import IOLoop
+from tornado.concurrent import is_future
+from tornado.util import raise_exc_info
+
+from reversible.core import _coalesce, _pop_rollback, _scatter
+from reversible.generator import _Constant, _BARRIER, _COMMIT
+from reversible.generator import barrier, commit, savepoint
+from reversible.spill import _check_rollback_log, _rollback_log
+from reversible.generator import Return as _Return
+
+from .core import _bind, _future
+
+_RETURNS = (StopIteration, Return, _Return)
+
+Return = Return
+
+barrier = barrier
+
+commit = commit
+
+savepoint = savepoint
+
+
+class _Lift(object):
+
+    __slots__ = ('future',)
+
+    def __init__(self, future):
+        self.future = future
+
+    def forwards(self):
+        return self.future
+
+    def backwards(self):
+        pass
+
+
+class _NativeMulti(object):
+    """Executes a group of independent actions concurrently on the IOLoop.
+
+    The ``forwards`` methods of all members are called before waiting on any
+    of them. If any member fails, the members that succeeded are rolled back
+    concurrently and the first failure (in member order) is raised. The
+    failed members are rolled back when the group itself is rolled back,
+    again concurrently.
+    """
+
+    __slots__ = ('actions', 'count', 'positions', 'pending')
+
+    def __init__(self, actions, io_loop=None, saga=None):
+        io_loop = io_loop or IOLoop.current()
+
+        deadline = retry = tracer = None
+        if saga is not None:
+            deadline, retry = saga.step_deadline, saga.step_retry
+            if saga.step_trace is not None:
+                tracer = saga.step_trace[0]
+
+        actions = list(actions)
+        self.count = len(actions)
+        actions, self.positions = _coalesce(actions)
+        self.actions = [
+            _bind(io_loop, a, deadline, retry, tracer, saga) for a in actions
+        ]
+
+        # Members that have not been rolled back yet.
+        self.pending = self.actions
+
+    @coroutine
+    def forwards(self):
+        futures = [_future(action.forwards) for action in self.actions]
+
+        results = []
+        succeeded = []
+        error = None
+        for action, future in zip(self.actions, futures):
+            try:
+                results.append((yield future))
+            except Exception:
+                if error is None:
+                    error = sys.exc_info()
+            else:
+                succeeded.append(action)
+
+        if error is None:
+            raise Return(_scatter(results, self.positions, self.count))
+
+        self.pending = list(self.actions)
+        yield self._backwards_all(succeeded)
+        raise_exc_info(error)
+
+    @coroutine
+    def _backwards_all(self, actions):
+        futures = [_future(action.backwards) for action in actions]
+
+        error = None
+        for action, future in zip(actions, futures):
+            try:
+                yield future
+            except Exception:
+                if error is None:
+                    error = sys.exc_info()
+            else:
+                self.pending.remove(action)
+
+        if error is not None:
+            raise_exc_info(error)
+
+    def backwards(self):
+        if not self.pending:
+            return None
+        return self._backwards_all(list(reversed(self.pending)))
+
+    def __str__(self):
+        return "<NativeMulti %s>" % (self.actions,)
+
+    __repr__ = __str__
+
+
+class _NativeGeneratorAction(object):
+    """Drives a generator of actions from a Tornado coroutine.
+
+    Futures returned by the steps are yielded to the coroutine, so waiting on
+    a step costs no more than waiting on its Future.
+    """
+
+    __slots__ = (
+        'generator', 'executed', 'io_loop', 'concurrent_rollback',
+        'step_retry', 'step_deadline', 'step_trace', 'savepoint',
+    )
+
+    def __init__(self, generator, io_loop=None, concurrent_rollback=False,
+                 savepoint=False, executed=None):
+        self.generator = generator
+        self.executed = deque() if executed is None else executed
+        self.io_loop = io_loop or IOLoop.current()
+        self.concurrent_rollback = concurrent_rollback
+        self.savepoint = savepoint
+
+        # Default retry policies for steps, as a (retry, rollback_retry)
+        # tuple, and time budget of the saga. Set by
+        # reversible.tornado_native.execute.
+        self.step_retry = None
+        self.step_deadline = None
+
+        # (tracer, span) of the current call while tracing.
+        self.step_trace = None
+
+    def _bind(self, action):
+        return _bind(
+            self.io_loop, action, self.step_deadline, self.step_retry,
+            self.step_trace and self.step_trace[0], self,
+        )
+
+    @coroutine
+    def forwards(self):
+        generator = self.generator
+        try:
+            action = next(generator)
+            while True:
+                if action is _COMMIT:
+                    # Everything executed so far is final.
+                    self.executed.clear()
+                    action = generator.send(None)
+                    continue
+
+                if isinstance(action, (list, tuple)):
+                    action = _NativeMulti(action, self.io_loop, self)
+                elif action is not _BARRIER:
+                    action = self._bind(action)
+
+                self.executed.append(action)
+                try:
+                    result = action.forwards()
+                    if is_future(result):
+                        result = yield result
+                except Exception:
+                    action = generator.throw(*sys.exc_info())
+                else:
+                    action = generator.send(result)
+        except _RETURNS as result:
+            raise Return(getattr(result, 'value', None))
+        except Exception:
+            if not self.savepoint:
+                raise
+            exc_info = sys.exc_info()
+            yield self.backwards()
+            raise_exc_info(exc_info)
+
+    @coroutine
+    def backwards(self):
+        if not self.concurrent_rollback:
+            while self.executed:
+                action = _pop_rollback(self.executed, self._bind)
+                result = action.backwards()
+                if is_future(result):
+                    yield result
+            return
+
+        while self.executed:
+            segment = []
+            while self.executed:
+                action = self.executed.pop()
+                if action is _BARRIER:
+                    break
+                segment.append(action)
+
+            if len(segment) == 1:
+                result = segment[0].backwards()
+                if is_future(result):
+                    yield result
+            elif segment:
+                yield _NativeMulti(segment, self.io_loop).backwards()
+
+
+def gen(function=None, io_loop=None, concurrent_rollback=False,
+        savepoint=False, max_rollback_depth=None, spill_threshold=None):
+    """Allows using a generator to chain together reversible actions.
+
+    This function is a drop-in replacement for
+    :py:func:`reversible.tornado.gen` that doesn't use greenlets. The
+    generator is driven by a Tornado coroutine, which yields the Futures
+    returned by asynchronous ``forwards`` and ``backwards`` methods directly.
+    Actions that finish synchronously, or whose Futures have already
+    resolved, don't return control to the IOLoop at all.
+
+    .. code-block:: python
+
+        @reversible.tornado_native.gen
+        def post_comment(post, comment):
+            try:
+                comment_id = yield save_comment(comment)
+            except CommentStoreException:
+                yield queue_save_comment_request(comment)
+            else:
+                yield update_comment_count(post)
+
+    Exceptions raised by actions are thrown into the generator at the yield
+    point and unhandled failures roll back the executed actions in reverse
+    order, as with :py:func:`reversible.tornado.gen`. Yielding a list or
+    tuple of actions executes them concurrently; see
+    :py:func:`reversible.tornado_native.multi`.
+
+    Steps must be actions built for this engine, or plain actions whose
+    methods return Futures. Actions built with
+    :py:func:`reversible.tornado.gen` rely on greenlets and can't be used
+    here.
+
+    :param function:
+        The generator function. This generator must yield action objects.
+    :param io_loop:
+        IOLoop used for timeouts. Defaults to the current IOLoop if omitted.
+    :param concurrent_rollback:
+        If set, actions executed by the generator between barriers are
+        considered independent and are rolled back concurrently.
+    :param savepoint:
+        If set, actions built by the generator roll back their own steps
+        before raising a failure. See :py:func:`reversible.savepoint`.
+    :param max_rollback_depth:
+        If set, only this many of the most recently executed actions are
+        rolled back. See :py:func:`reversible.gen`.
+    :param spill_threshold:
+        If set, older executed actions are pickled to a temporary file. See
+        :py:func:`reversible.gen`.
+    :returns:
+        An action executable via :py:func:`reversible.tornado_native.execute`
+        and yieldable in other instances of
+        :py:func:`reversible.tornado_native.gen`. If ``function`` was
+        omitted, a decorator that accepts the generator function is returned.
+    """
+
+    _check_rollback_log(max_rollback_depth, spill_threshold)
+
+    def decorator(function):
+
+        @functools.wraps(function)
+        def new_function(*args, **kwargs):
+            try:
+                value = function(*args, **kwargs)
+            except _RETURNS as result:
+                return _Constant(getattr(result, 'value', None))
+            else:
+                if isinstance(value, types.GeneratorType):
+                    return _NativeGeneratorAction(
+                        value, io_loop, concurrent_rollback, savepoint,
+                        _rollback_log(max_rollback_depth, spill_threshold),
+                    )
+                else:
+                    return _Constant(value)
+
+        return new_function
+
+    if function is not None:
+        return decorator(function)
+    else:
+        return decorator
+
+
+def lift(future):
+    """Returns the result of a Tornado Future inside a generator-based action.
+
+    See :py:func:`reversible.tornado.lift`. Operations executed through lift
+    are assumed to be non-reversible.
+
+    :param future:
+        Tornado future whose result is required.
+    :returns:
+        An action yieldable inside a :py:func:`reversible.tornado_native.gen`
+        context.
+    """
+    return _Lift(future)
+
+
+def multi(actions, io_loop=None):
+    """Combines independent actions into one action that runs them together.
+
+    See :py:func:`reversible.tornado.multi`. Inside
+    :py:func:`reversible.tornado_native.gen`, yielding a list or tuple of
+    actions is equivalent to yielding ``multi`` of them.
+
+    :param actions:
+        Actions to execute concurrently. Their ``forwards`` and ``backwards``
+        methods may be asynchronous.
+    :param io_loop:
+        IOLoop used for timeouts. Defaults to the current IOLoop if omitted.
+    :returns:
+        An action executable via :py:func:`reversible.tornado_native.execute`
+        and yieldable in other instances of
+        :py:func:`reversible.tornado_native.gen`.
+    """
+    return _NativeMulti(actions, io_loop)
+
+
+__all__ = [
+    'barrier', 'commit', 'gen', 'Return', 'lift', 'multi', 'savepoint',
+]
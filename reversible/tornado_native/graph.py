@@ -0,0 +1,129 @@
+from __future__ import absolute_import
+
+from collections import deque
+
+from tornado.gen import Return, coroutine
+from tornado.ioloop import IOLoop
+from tornado.concurrent import Future
+
+from reversible.graph import _Graph
+
+from .core import _bind, _future
+
+
+class _Waiter(object):
+    """Collects the Futures of running nodes as they resolve."""
+
+    __slots__ = ('running', 'finished', 'wake')
+
+    def __init__(self):
+        self.running = 0
+        self.finished = deque()
+        self.wake = None
+
+    def add(self, name, future):
+        self.running += 1
+        future.add_done_callback(lambda f: self._done(name, f))
+
+    def _done(self, name, future):
+        self.finished.append((name, future))
+        if self.wake is not None and not self.wake.done():
+            self.wake.set_result(None)
+
+    @coroutine
+    def next(self):
+        """Returns the name and Future of the next node that resolves."""
+        if not self.finished:
+            self.wake = Future()
+            yield self.wake
+        self.running -= 1
+        raise Return(self.finished.popleft())
+
+
+class Graph(_Graph):
+    """A :py:class:`reversible.Graph` whose nodes run on the IOLoop.
+
+    The ``forwards`` and ``backwards`` methods of the nodes may return
+    Futures. Nodes that are ready are started together and waited on
+    concurrently.
+    """
+
+    def _bind(self, action):
+        return _bind(
+            IOLoop.current(), action, self.step_deadline, self.step_retry,
+            self.step_trace and self.step_trace[0], self,
+        )
+
+    @coroutine
+    def forwards(self):
+        results = {}
+        started = set()
+        waiter = _Waiter()
+        error = None
+        while True:
+            if error is None:
+                for name in self._ready(started, results):
+                    started.add(name)
+                    try:
+                        action = self._build(name, results)
+                    except Exception as e:
+                        error = e
+                        break
+                    waiter.add(name, _future(action.forwards))
+            if not waiter.running:
+                break
+
+            name, future = yield waiter.next()
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                if error is None:
+                    error = e
+
+        if error is None:
+            raise Return(results)
+
+        yield self.backwards()
+        raise error
+
+    @coroutine
+    def backwards(self):
+        started = set()
+        waiter = _Waiter()
+        error = None
+        while True:
+            if error is None:
+                for name in self._rollback_ready(started):
+                    started.add(name)
+                    waiter.add(name, _future(self.pending[name].backwards))
+            if not waiter.running:
+                break
+
+            name, future = yield waiter.next()
+            try:
+                future.result()
+            except Exception as e:
+                if error is None:
+                    error = e
+            else:
+                del self.pending[name]
+
+        if error is not None:
+            raise error
+
+
+def graph():
+    """Returns an empty dependency graph whose nodes run on the IOLoop.
+
+    See :py:class:`reversible.Graph`. Nodes that are ready are started
+    together and their Futures are waited on concurrently.
+
+    :returns:
+        An action executable via :py:func:`reversible.tornado.execute` and
+        yieldable in :py:func:`reversible.tornado.gen`. Nodes are added with
+        its ``add`` method.
+    """
+    return Graph()
+
+
+__all__ = ['graph']
@@ -0,0 +1,57 @@
+from __future__ import absolute_import
+
+from tornado.ioloop import IOLoop
+from tornado.concurrent import Future
+
+from reversible.process import _ProcessAction
+
+
+class _TornadoProcessAction(_ProcessAction):
+    """A :py:class:`reversible.process._ProcessAction` whose ``forwards``
+    method returns a Tornado Future instead of blocking."""
+
+    __slots__ = ('io_loop',)
+
+    def __init__(self, action, process_pool=None, io_loop=None):
+        super(_TornadoProcessAction, self).__init__(action, process_pool)
+        self.io_loop = io_loop or IOLoop.current()
+
+    def forwards(self):
+        future = Future()
+
+        def callback(done):
+            # Called on the IOLoop.
+            try:
+                future.set_result(self._finish(done.result()))
+            except Exception as e:
+                future.set_exception(e)
+
+        self.io_loop.add_future(self._submit(), callback)
+        return future
+
+
+def in_process(action, process_pool=None, io_loop=None):
+    """Executes the ``forwards`` method of an action in another process
+    without blocking the IOLoop.
+
+    See :py:func:`reversible.in_process`. The returned action's ``forwards``
+    method returns a Future that resolves once the worker is done, so it may
+    be used with :py:mod:`reversible.tornado` and
+    :py:mod:`reversible.tornado_native`.
+
+    :param action:
+        The action to execute. It must be picklable.
+    :param process_pool:
+        ``concurrent.futures.ProcessPoolExecutor`` to execute the action on.
+        Defaults to the pool used by :py:func:`reversible.in_process`.
+    :param io_loop:
+        IOLoop on which the result is delivered. Defaults to the current
+        IOLoop if omitted.
+    :returns:
+        An action executable via :py:func:`reversible.tornado.execute` and
+        yieldable in :py:func:`reversible.tornado.gen`.
+    """
+    return _TornadoProcessAction(action, process_pool, io_loop)
+
+
+__all__ = ['in_process']
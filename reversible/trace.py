@@ -0,0 +1,300 @@
+from __future__ import absolute_import
+
+import os
+import time
+import binascii
+import threading
+
+
+class Span(object):
+    """A call to the ``forwards`` or ``backwards`` method of an action.
+
+    Spans are recorded by :py:class:`reversible.Tracer`.
+    """
+
+    __slots__ = (
+        'name', 'kind', 'trace_id', 'span_id', 'parent_id', 'thread',
+        'start', 'end', 'error',
+    )
+
+    def __init__(self, name, kind, trace_id, span_id, parent_id, thread,
+                 start):
+        #: Name of the action.
+        self.name = name
+
+        #: ``'forwards'`` or ``'backwards'``.
+        self.kind = kind
+
+        #: Hex ID shared by all spans of a saga.
+        self.trace_id = trace_id
+
+        #: Hex ID of this span.
+        self.span_id = span_id
+
+        #: ID of the span of the enclosing generator, or None.
+        self.parent_id = parent_id
+
+        #: Identifier of the thread that started the span.
+        self.thread = thread
+
+        #: Start and end times in seconds since the epoch.
+        self.start = start
+        self.end = None
+
+        #: ``repr`` of the exception raised by the call, or None.
+        self.error = None
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __str__(self):
+        return "<Span %s %s %.6fs%s>" % (
+            self.kind, self.name, (self.end or self.start) - self.start,
+            '' if self.ok else ' ' + self.error,
+        )
+
+    __repr__ = __str__
+
+
+def _new_id(size):
+    return binascii.hexlify(os.urandom(size)).decode('ascii')
+
+
+class Tracer(object):
+    """
+    Records a span for every ``forwards`` and ``backwards`` call made while
+    executing actions.
+
+    Tracing is enabled by giving a tracer to a :py:class:`reversible.Executor`.
+
+    .. code-block:: python
+
+        tracer = reversible.Tracer()
+        executor = reversible.Executor(tracer=tracer)
+        executor.execute(submit_order(order))
+
+        tracer.export_chrome('submit_order.trace.json')
+
+    Every step of a :py:func:`reversible.gen` action gets its own span whose
+    parent is the span of the generator. Executors without a tracer don't
+    record anything.
+
+    Recorded spans may be written as Chrome trace events, which can be opened
+    in ``chrome://tracing`` or Perfetto, or as OTLP JSON, which can be sent to
+    an OpenTelemetry collector.
+
+    :param service_name:
+        Name of the service reported in OTLP exports.
+    """
+
+    def __init__(self, service_name='reversible'):
+        self.service_name = service_name
+
+        #: Finished spans in the order in which they finished.
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def start(self, name, kind, parent=None, trace_id=None):
+        """Starts a span.
+
+        :param parent:
+            Span of the enclosing action, if any.
+        :param trace_id:
+            Trace to add the span to if it has no parent. A new trace is
+            started if omitted.
+        """
+        if parent is not None:
+            trace_id = parent.trace_id
+        elif trace_id is None:
+            trace_id = _new_id(16)
+
+        return Span(
+            name, kind, trace_id, _new_id(8),
+            parent.span_id if parent is not None else None,
+            threading.current_thread().ident, time.time(),
+        )
+
+    def finish(self, span, error=None):
+        """Finishes a span and records it."""
+        span.end = time.time()
+        if error is not None:
+            span.error = repr(error)
+        with self._lock:
+            self.spans.append(span)
+
+    def clear(self):
+        """Forgets all recorded spans."""
+        with self._lock:
+            del self.spans[:]
+
+    def chrome_trace(self):
+        """Returns the recorded spans as a Chrome trace-event document."""
+        pid = os.getpid()
+        events = []
+        for span in list(self.spans):
+            args = {'outcome': 'ok' if span.ok else 'error'}
+            if span.error is not None:
+                args['error'] = span.error
+            if span.parent_id is not None:
+                args['parent'] = span.parent_id
+            events.append({
+                'name': span.name,
+                'cat': span.kind,
+                'ph': 'X',
+                'ts': span.start * 1e6,
+                'dur': (span.end - span.start) * 1e6,
+                'pid': pid,
+                'tid': span.thread,
+                'args': args,
+            })
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def otlp(self):
+        """Returns the recorded spans as an OTLP ``ExportTraceServiceRequest``
+        in its JSON encoding."""
+        spans = []
+        for span in list(self.spans):
+            otlp_span = {
+                'traceId': span.trace_id,
+                'spanId': span.span_id,
+                'name': span.name,
+                'kind': 1,  # SPAN_KIND_INTERNAL
+                'startTimeUnixNano': str(int(span.start * 1e9)),
+                'endTimeUnixNano': str(int(span.end * 1e9)),
+                'attributes': [{
+                    'key': 'reversible.kind',
+                    'value': {'stringValue': span.kind},
+                }],
+                'status': {'code': 1},  # STATUS_CODE_OK
+            }
+            if span.parent_id is not None:
+                otlp_span['parentSpanId'] = span.parent_id
+            if span.error is not None:
+                # STATUS_CODE_ERROR
+                otlp_span['status'] = {'code': 2, 'message': span.error}
+            spans.append(otlp_span)
+
+        return {'resourceSpans': [{
+            'resource': {'attributes': [{
+                'key': 'service.name',
+                'value': {'stringValue': self.service_name},
+            }]},
+            'scopeSpans': [{
+                'scope': {'name': 'reversible'},
+                'spans': spans,
+            }],
+        }]}
+
+    def export_chrome(self, path):
+        """Writes the recorded spans to ``path`` as Chrome trace events."""
+        import json
+
+        with open(path, 'w') as f:
+            json.dump(self.chrome_trace(), f)
+
+    def export_otlp(self, path):
+        """Writes the recorded spans to ``path`` as OTLP JSON."""
+        import json
+
+        with open(path, 'w') as f:
+            json.dump(self.otlp(), f)
+
+    def __str__(self):
+        return "<Tracer %d spans>" % (len(self.spans),)
+
+    __repr__ = __str__
+
+
+class _GroupSpan(object):
+    """Spans started by each member of a :py:class:`_TracerGroup`."""
+
+    __slots__ = ('spans', 'trace_id')
+
+    def __init__(self, spans):
+        self.spans = spans
+        self.trace_id = tuple(span.trace_id for span in spans)
+
+
+class _TracerGroup(object):
+    """Reports calls to several tracers."""
+
+    __slots__ = ('tracers',)
+
+    def __init__(self, tracers):
+        self.tracers = tracers
+
+    def start(self, name, kind, parent=None, trace_id=None):
+        return _GroupSpan(tuple(
+            tracer.start(
+                name, kind,
+                parent.spans[i] if parent is not None else None,
+                trace_id[i] if trace_id is not None else None,
+            )
+            for i, tracer in enumerate(self.tracers)
+        ))
+
+    def finish(self, span, error=None):
+        for tracer, member in zip(self.tracers, span.spans):
+            tracer.finish(member, error)
+
+
+class _TracedAction(object):
+    """Records spans for the ``forwards`` and ``backwards`` calls of an
+    action.
+
+    ``owner`` is the generator action that executes this one, if any. The
+    span of the owner's current call becomes the parent of our spans. If
+    ``source`` is itself a generator action, it becomes the owner of its
+    steps while it runs.
+    """
+
+    __slots__ = ('action', 'tracer', 'name', 'owner', 'source', 'trace_id')
+
+    # See reversible.core._unwrap.
+    _transparent = True
+
+    def __init__(self, action, tracer, name, owner=None, source=None):
+        self.action = action
+        self.tracer = tracer
+        self.name = name
+        self.owner = owner
+        self.source = source
+        self.trace_id = None
+
+    def _start(self, kind):
+        parent = None
+        if self.owner is not None and self.owner.step_trace is not None:
+            parent = self.owner.step_trace[1]
+
+        span = self.tracer.start(self.name, kind, parent, self.trace_id)
+        self.trace_id = span.trace_id
+
+        source = self.source
+        if source is not None and hasattr(type(source), 'step_trace'):
+            source.step_trace = (self.tracer, span)
+        return span
+
+    def _call(self, kind, method):
+        span = self._start(kind)
+        try:
+            result = method()
+        except Exception as e:
+            self.tracer.finish(span, e)
+            raise
+        self.tracer.finish(span)
+        return result
+
+    def forwards(self):
+        return self._call('forwards', self.action.forwards)
+
+    def backwards(self):
+        return self._call('backwards', self.action.backwards)
+
+    def __str__(self):
+        return str(self.action)
+
+    __repr__ = __str__
+
+
+__all__ = ['Span', 'Tracer']
@@ -16,11 +16,13 @@ setup(
     author='Abhinav Gupta',
     author_email='mail@abhinavg.net',
     url='https://github.com/abhinav/reversible',
-    packages=find_packages(exclude=('tests', 'test.*')),
+    packages=find_packages(exclude=('tests', 'test.*', 'benchmarks')),
     license='MIT',
     tests_require=['pytest', 'mock'],
     extras_require={
+        ':python_version=="2.7"': ['futures'],
         'tornado': ['tornado', 'greenlet'],
+        'tornado_native': ['tornado'],
     },
     classifiers=[
         'Development Status :: 4 - Beta',
@@ -0,0 +1,9 @@
+from __future__ import absolute_import
+
+import sys
+
+collect_ignore = []
+
+if sys.version_info < (3, 6):
+    # reversible.asyncio relies on async generators.
+    collect_ignore.append('test_asyncio.py')
@@ -0,0 +1,779 @@
+from __future__ import absolute_import
+
+import asyncio
+
+import mock
+import pytest
+
+import reversible.asyncio as reversible
+
+
+class MyException(Exception):
+    pass
+
+
+class RollbackFailException(Exception):
+    pass
+
+
+@pytest.fixture
+def run():
+    loop = asyncio.new_event_loop()
+    yield loop.run_until_complete
+    loop.close()
+
+
+@pytest.fixture(params=['sync', 'async'])
+def returns_42(request):
+    if 'sync' == request.param:
+        def forwards():
+            return 42
+    else:
+        async def forwards():
+            await asyncio.sleep(0)
+            return 42
+    return forwards
+
+
+@pytest.fixture(params=['sync', 'async'])
+def does_nothing(request):
+    if 'sync' == request.param:
+        def backwards():
+            pass
+    else:
+        async def backwards():
+            await asyncio.sleep(0)
+    return backwards
+
+
+@pytest.fixture(params=['sync', 'async'])
+def raises_exception(request):
+    if 'sync' == request.param:
+        def forwards():
+            raise MyException('great sadness')
+    else:
+        async def forwards():
+            await asyncio.sleep(0)
+            raise MyException('great sadness')
+    return forwards
+
+
+@pytest.fixture(params=['class', 'decorator'])
+def successful_action(returns_42, does_nothing, request):
+    if request.param == 'class':
+        class Action(object):
+            def forwards(self):
+                return returns_42()
+
+            def backwards(self):
+                return does_nothing()
+
+        return Action
+    else:
+        @reversible.action
+        def go(ctx):
+            return returns_42()
+
+        @go.backwards
+        def rollback(ctx):
+            return does_nothing()
+
+        return go
+
+
+@pytest.fixture(params=['class', 'decorator'])
+def failing_action(raises_exception, does_nothing, request):
+    if request.param == 'class':
+        class Action(object):
+            def forwards(self):
+                return raises_exception()
+
+            def backwards(self):
+                return does_nothing()
+
+        return Action
+    else:
+        @reversible.action
+        def go(ctx):
+            return raises_exception()
+
+        @go.backwards
+        def rollback(ctx):
+            return does_nothing()
+
+        return go
+
+
+@pytest.fixture(params=['class', 'decorator'])
+def successful_with_rollback_fail_action(does_nothing, request):
+    if request.param == 'class':
+        class Action(object):
+            def forwards(self):
+                return does_nothing()
+
+            def backwards(self):
+                raise RollbackFailException('rollback failed')
+
+        return Action
+    else:
+        @reversible.action
+        def go(ctx):
+            return does_nothing()
+
+        @go.backwards
+        async def rollback(ctx):
+            raise RollbackFailException('rollback failed')
+
+        return go
+
+
+def recording_action(value, calls, delay=0, exc=None):
+
+    @reversible.action
+    async def go(ctx):
+        await asyncio.sleep(delay)
+        if exc is not None:
+            raise exc
+        return value
+
+    @go.backwards
+    async def rollback(ctx):
+        calls.append(value)
+
+    return go()
+
+
+def test_execute_success(run, successful_action):
+    assert 42 == run(reversible.execute(successful_action()))
+
+
+def test_failing_action(run, failing_action):
+    with pytest.raises(MyException) as exc_info:
+        run(reversible.execute(failing_action()))
+    assert 'great sadness' in str(exc_info)
+
+
+def test_failing_action_rolls_back(run):
+    calls = []
+    with pytest.raises(MyException):
+        run(reversible.execute(
+            recording_action(1, calls, exc=MyException('great sadness'))
+        ))
+    assert [1] == calls
+
+
+def test_generator_execute_success(run, successful_action):
+
+    @reversible.gen
+    def action():
+        result = yield successful_action()
+        return result
+
+    assert 42 == run(reversible.execute(action()))
+
+
+def test_async_generator_execute_success(run, successful_action):
+
+    @reversible.gen
+    async def action():
+        result = yield successful_action()
+        await asyncio.sleep(0)
+        raise reversible.Return(result + 1)
+
+    assert 43 == run(reversible.execute(action()))
+
+
+@pytest.mark.parametrize('kind', ['sync', 'async'])
+def test_generator_failure_rolls_back(run, kind):
+    calls = []
+
+    if kind == 'sync':
+        @reversible.gen
+        def action():
+            yield recording_action(1, calls)
+            yield recording_action(2, calls)
+            yield recording_action(3, calls, exc=MyException('great sadness'))
+            pytest.fail('Should not reach here')
+    else:
+        @reversible.gen
+        async def action():
+            yield recording_action(1, calls)
+            await asyncio.sleep(0)
+            yield recording_action(2, calls)
+            yield recording_action(3, calls, exc=MyException('great sadness'))
+            pytest.fail('Should not reach here')
+
+    with pytest.raises(MyException) as exc_info:
+        run(reversible.execute(action()))
+
+    assert 'great sadness' in str(exc_info)
+    assert [3, 2, 1] == calls
+
+
+@pytest.mark.parametrize('kind', ['sync', 'async'])
+def test_generator_execute_failure_catch(run, kind, failing_action):
+
+    if kind == 'sync':
+        @reversible.gen
+        def action():
+            try:
+                yield failing_action()
+            except MyException:
+                return 100
+    else:
+        @reversible.gen
+        async def action():
+            try:
+                yield failing_action()
+            except MyException:
+                raise reversible.Return(100)
+
+    assert 100 == run(reversible.execute(action()))
+
+
+def test_generator_rollback_fail(
+    run, successful_with_rollback_fail_action, failing_action
+):
+
+    @reversible.gen
+    def action():
+        yield successful_with_rollback_fail_action()
+        yield failing_action()
+        pytest.fail('Should not reach here')
+
+    with pytest.raises(RollbackFailException) as exc_info:
+        run(reversible.execute(action()))
+
+    assert 'rollback failed' in str(exc_info)
+
+
+def test_nested_generators(run):
+    calls = []
+
+    @reversible.gen
+    async def inner(i):
+        a = yield recording_action(i, calls)
+        raise reversible.Return(a * 2)
+
+    @reversible.gen
+    def outer():
+        a = yield inner(1)
+        b = yield inner(2)
+        yield recording_action(3, calls, exc=MyException('great sadness'))
+        return a + b
+
+    with pytest.raises(MyException):
+        run(reversible.execute(outer()))
+
+    assert [3, 2, 1] == calls
+
+
+@pytest.mark.parametrize('wrap', [lambda x: x, reversible.lift])
+def test_generator_yield_awaitable(run, wrap):
+
+    @reversible.gen
+    def action():
+        value = yield wrap(asyncio.sleep(0, result=42))
+        return value
+
+    assert 42 == run(reversible.execute(action()))
+
+
+def test_not_a_generator(run):
+
+    @reversible.gen
+    def sync():
+        return 42
+
+    @reversible.gen
+    async def coroutine():
+        await asyncio.sleep(0)
+        return 43
+
+    @reversible.gen
+    def raises_return():
+        raise reversible.Return(44)
+
+    assert 42 == run(reversible.execute(sync()))
+    assert 43 == run(reversible.execute(coroutine()))
+    assert 44 == run(reversible.execute(raises_return()))
+
+
+@pytest.mark.parametrize('make_multi', [list, tuple, reversible.multi])
+def test_multi(make_multi):
+    calls = []
+
+    @reversible.gen
+    def action():
+        results = yield make_multi(
+            [recording_action(i, calls, delay=0.1) for i in range(5)]
+        )
+        return results
+
+    loop = asyncio.get_event_loop_policy().new_event_loop()
+    start = loop.time()
+    assert list(range(5)) == loop.run_until_complete(
+        reversible.execute(action())
+    )
+    assert loop.time() - start < 0.3
+    loop.close()
+
+
+@pytest.mark.parametrize('make_multi', [list, tuple, reversible.multi])
+def test_multi_failure(run, make_multi):
+    calls = []
+
+    @reversible.gen
+    def action():
+        yield recording_action(0, calls)
+        try:
+            yield make_multi([
+                recording_action(1, calls),
+                recording_action(2, calls, exc=MyException('great sadness')),
+                recording_action(3, calls),
+            ])
+        except MyException:
+            assert [1, 3] == sorted(calls)
+            raise
+        pytest.fail('Should not reach here')
+
+    with pytest.raises(MyException):
+        run(reversible.execute(action()))
+
+    assert [1, 3] == sorted(calls[:2])
+    assert [2, 0] == calls[2:]
+
+
+@pytest.mark.parametrize('make_multi', [list, tuple, reversible.multi])
+def test_multi_batches_compatible_actions(run, make_multi):
+    calls = []
+
+    @reversible.action
+    def put(ctx, value):
+        assert False
+
+    put.backwards(mock.Mock())
+
+    @put.forwards_many
+    async def put_many(contexts, arguments):
+        values = [args[0] for args, kwargs in arguments]
+        calls.append(('put_many', values))
+        return values
+
+    @put.backwards_many
+    async def delete_many(contexts, arguments):
+        calls.append(('delete_many', [args[0] for args, _ in arguments]))
+
+    @reversible.gen
+    def action():
+        results = yield make_multi([put(1), put(2), put(3)])
+        assert [1, 2, 3] == results
+        raise MyException('great sadness')
+
+    with pytest.raises(MyException):
+        run(reversible.execute(action()))
+
+    assert [('put_many', [1, 2, 3]), ('delete_many', [1, 2, 3])] == calls
+
+
+def test_adjacent_rollbacks_are_merged(run):
+    calls = []
+
+    @reversible.action
+    async def put(ctx, value):
+        return value
+
+    put.backwards(mock.Mock())
+
+    @put.backwards_many
+    async def delete_many(contexts, arguments):
+        calls.append([args[0] for args, _ in arguments])
+
+    @reversible.gen
+    async def action():
+        yield put(1)
+        yield put(2)
+        yield recording_action(3, calls)
+        yield put(4)
+        raise MyException('great sadness')
+
+    with pytest.raises(MyException):
+        run(reversible.execute(action()))
+
+    assert [3, [2, 1]] == calls
+
+
+def test_traced_rollbacks_are_merged(run):
+    import reversible as base
+
+    calls = []
+
+    @reversible.action
+    async def put(ctx, value):
+        return value
+
+    put.backwards(mock.Mock())
+
+    @put.backwards_many
+    async def delete_many(contexts, arguments):
+        calls.append([args[0] for args, _ in arguments])
+
+    @reversible.gen
+    async def action():
+        yield put(1)
+        yield put(2)
+        raise MyException('great sadness')
+
+    executor = base.Executor(metrics=base.Metrics())
+    with pytest.raises(MyException):
+        run(reversible.execute(action(), executor))
+
+    assert [[2, 1]] == calls
+
+
+def test_concurrent_rollback():
+    calls = []
+
+    def action(value):
+
+        @reversible.action
+        def go(ctx):
+            return value
+
+        @go.backwards
+        async def rollback(ctx):
+            await asyncio.sleep(0.1)
+            calls.append(value)
+
+        return go()
+
+    @reversible.gen(concurrent_rollback=True)
+    def saga():
+        yield action('a')
+        yield reversible.barrier()
+        for i in range(3):
+            yield action(i)
+        yield reversible.barrier()
+        yield action('b')
+        yield action('c')
+        raise MyException('great sadness')
+
+    loop = asyncio.new_event_loop()
+    start = loop.time()
+    with pytest.raises(MyException):
+        loop.run_until_complete(reversible.execute(saga()))
+    assert loop.time() - start < 0.35
+    loop.close()
+
+    assert set(['b', 'c']) == set(calls[:2])
+    assert set(range(3)) == set(calls[2:5])
+    assert ['a'] == calls[5:]
+
+
+def test_execute_with_executor(run, successful_action, failing_action):
+    import reversible as base
+
+    executor = base.Executor(expected=(MyException,))
+    after = executor.after(mock.Mock())
+    rollback = executor.on_rollback(mock.Mock())
+
+    assert 42 == run(reversible.execute(successful_action(), executor))
+    after.assert_called_once_with(mock.ANY, 42)
+
+    with pytest.raises(MyException):
+        run(reversible.execute(failing_action(), executor))
+    rollback.assert_called_once_with(mock.ANY, mock.ANY, None)
+
+
+@pytest.mark.parametrize('ordered', [True, False])
+def test_execute_many(run, ordered):
+    calls = []
+    actions = [
+        recording_action(
+            i, calls, delay=0.01 * (5 - i),
+            exc=MyException('great sadness') if i == 2 else None,
+        )
+        for i in range(5)
+    ]
+
+    async def consume():
+        return [
+            o async for o in reversible.execute_many(
+                actions, max_pending=2, ordered=ordered
+            )
+        ]
+
+    outcomes = run(consume())
+    assert 5 == len(outcomes)
+    if ordered:
+        assert actions == [o.action for o in outcomes]
+    for outcome in outcomes:
+        i = actions.index(outcome.action)
+        if i == 2:
+            assert isinstance(outcome.error, MyException)
+        else:
+            assert i == outcome.value
+    assert [2] == calls
+
+
+def test_retry(run):
+    import reversible as base
+
+    calls = []
+    rollback_calls = []
+
+    @reversible.action(retry=base.Retry(attempts=3, backoff=0.01))
+    async def go(ctx):
+        calls.append('attempt')
+        await asyncio.sleep(0)
+        if len(calls) < 3:
+            raise MyException('attempt %d' % len(calls))
+        return len(calls)
+
+    go.backwards(mock.Mock())
+
+    @reversible.action
+    async def fails(ctx):
+        raise MyException('great sadness')
+
+    @fails.backwards
+    async def rollback(ctx):
+        rollback_calls.append('attempt')
+        if len(rollback_calls) < 2:
+            raise MyException('rollback')
+
+    @reversible.gen
+    async def action():
+        result = yield go()
+        assert 3 == result
+        yield [fails()]
+
+    with pytest.raises(MyException) as exc_info:
+        run(reversible.execute(
+            action(), rollback_retry=base.Retry(attempts=2, backoff=0)
+        ))
+
+    assert 'great sadness' in str(exc_info)
+    assert 3 == len(calls)
+    assert 2 == len(rollback_calls)
+
+
+def test_saga_deadline_cancels_step(run):
+    import reversible as base
+
+    calls = []
+    cancelled = []
+
+    @reversible.action
+    async def slow(ctx):
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    @slow.backwards
+    async def undo_slow(ctx):
+        calls.append('slow')
+
+    @reversible.gen
+    def inner():
+        yield recording_action(1, calls)
+        yield slow()
+
+    @reversible.gen
+    def action():
+        yield inner()
+
+    loop = asyncio.new_event_loop()
+    start = loop.time()
+    with pytest.raises(base.Timeout):
+        loop.run_until_complete(reversible.execute(action(), timeout=0.1))
+    assert loop.time() - start < 0.5
+    loop.close()
+
+    assert [True] == cancelled
+    assert ['slow', 1] == calls
+
+
+def test_saga_deadline_is_not_retried(run):
+    import reversible as base
+
+    @reversible.action
+    async def slow(ctx):
+        await asyncio.sleep(0.3)
+
+    slow.backwards(mock.Mock())
+
+    @reversible.gen
+    def action():
+        yield slow()
+
+    loop = asyncio.new_event_loop()
+    start = loop.time()
+    with pytest.raises(base.Timeout):
+        loop.run_until_complete(reversible.execute(
+            action(), timeout=0.2,
+            retry=base.Retry(attempts=4, backoff=1, jitter=False),
+        ))
+    assert loop.time() - start < 0.6
+    loop.close()
+
+
+def test_rollback_timeout(run):
+    import reversible as base
+
+    @reversible.action(timeout=1)
+    async def slow_rollback(ctx):
+        pass
+
+    @slow_rollback.backwards
+    async def undo_slow_rollback(ctx):
+        await asyncio.sleep(5)
+
+    @reversible.gen
+    async def action():
+        yield slow_rollback()
+        raise MyException('great sadness')
+
+    with pytest.raises(base.Timeout):
+        run(reversible.execute(action(), rollback_timeout=0.05))
+
+
+def test_tracing(run):
+    import reversible as base
+
+    tracer = base.Tracer()
+    executor = base.Executor(tracer=tracer)
+
+    @reversible.action
+    async def slow(ctx):
+        await asyncio.sleep(0.05)
+
+    slow.backwards(mock.Mock())
+
+    @reversible.gen
+    async def inner():
+        yield slow()
+        yield [slow(), slow()]
+
+    @reversible.gen
+    async def action():
+        yield inner()
+        raise MyException('great sadness')
+
+    with pytest.raises(MyException):
+        run(reversible.execute(action(), executor=executor))
+
+    spans = dict(
+        ((s.kind, s.name.rsplit('.', 1)[-1]), s)
+        for s in tracer.spans if not s.name.endswith('slow')
+    )
+    outer = spans['forwards', 'action']
+    assert not outer.ok
+    assert spans['forwards', 'inner'].parent_id == outer.span_id
+    assert spans['backwards', 'inner'].parent_id == \
+        spans['backwards', 'action'].span_id
+
+    steps = [s for s in tracer.spans if s.name.endswith('slow')]
+    assert 6 == len(steps)
+    forwards = [s for s in steps if s.kind == 'forwards']
+    assert all(
+        s.parent_id == spans['forwards', 'inner'].span_id for s in forwards
+    )
+    assert all(s.end - s.start >= 0.04 for s in forwards)
+
+
+def test_savepoint(run):
+    calls = []
+
+    @reversible.gen(savepoint=True)
+    async def inner():
+        yield recording_action(1, calls)
+        yield [recording_action(2, calls)]
+        raise MyException('great sadness')
+
+    @reversible.gen
+    async def action():
+        try:
+            yield inner()
+        except MyException:
+            calls.append('caught')
+        yield reversible.savepoint(inner())
+
+    with pytest.raises(MyException):
+        run(reversible.execute(action()))
+
+    assert [2, 1, 'caught', 2, 1] == calls
+
+
+def test_limiter(run):
+    import reversible as base
+
+    limiter = base.Limiter(concurrency=2)
+    base.limiters.set('downstream', limiter)
+    active = []
+    peak = []
+
+    @reversible.action(resource='downstream')
+    async def call(ctx):
+        active.append(1)
+        peak.append(len(active))
+        await asyncio.sleep(0.02)
+        active.pop()
+
+    call.backwards(lambda ctx: None)
+
+    try:
+        run(reversible.execute(reversible.multi([call() for _ in range(6)])))
+    finally:
+        base.limiters.remove('downstream')
+    assert 2 == max(peak)
+    assert 0 == limiter._active
+
+
+def test_concurrency_and_rate_limiter(run):
+    import reversible as base
+
+    limiter = base.Limiter(concurrency=1, rate=10)
+    base.limiters.set('downstream', limiter)
+    active = []
+    peak = []
+
+    @reversible.action(resource='downstream')
+    async def call(ctx):
+        active.append(1)
+        peak.append(len(active))
+        await asyncio.sleep(0.02)
+        active.pop()
+
+    call.backwards(lambda ctx: None)
+
+    # Calls waiting for the first one to finish are then held back by the
+    # rate limit.
+    try:
+        run(asyncio.wait_for(
+            reversible.execute(reversible.multi([call() for _ in range(3)])),
+            timeout=5,
+        ))
+    finally:
+        base.limiters.remove('downstream')
+    assert 1 == max(peak)
+    assert 0 == limiter._active
+
+
+def test_commit(run):
+    calls = []
+
+    @reversible.gen(max_rollback_depth=5)
+    async def action():
+        yield recording_action(1, calls)
+        yield reversible.commit()
+        yield recording_action(2, calls)
+        yield recording_action(3, calls)
+        raise MyException('great sadness')
+
+    with pytest.raises(MyException):
+        run(reversible.execute(action()))
+
+    assert [3, 2] == calls
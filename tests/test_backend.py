@@ -0,0 +1,92 @@
+from __future__ import absolute_import
+
+import sys
+import subprocess
+
+import mock
+import pytest
+
+import reversible
+from reversible.backend import BackendRegistry
+
+
+def test_default_backends():
+    assert [
+        'asyncio', 'threads', 'tornado', 'tornado_native',
+    ] == reversible.backends.names()
+
+    from reversible import threads
+    assert threads is reversible.backends.get('threads')
+    assert reversible.execute is threads.execute
+
+    from reversible import tornado
+    assert tornado is reversible.backends.get('tornado')
+
+
+def test_interface():
+    for name in reversible.backends.names():
+        backend = reversible.backends.get(name)
+        for attr in BackendRegistry.interface:
+            assert hasattr(backend, attr), (name, attr)
+
+
+def test_incomplete_backend():
+    registry = BackendRegistry()
+    with pytest.raises(TypeError) as exc_info:
+        registry.register('partial', mock.Mock(spec=['action', 'gen']))
+    assert 'execute' in str(exc_info.value)
+    assert [] == registry.names()
+
+    # Modules are checked once they're imported.
+    registry.register('json', 'json')
+    with pytest.raises(TypeError) as exc_info:
+        registry.get('json')
+    assert 'json' in str(exc_info.value)
+    assert not registry.is_loaded('json')
+
+
+def test_lazy_import():
+    registry = BackendRegistry()
+    registry.register('json', 'json')
+    assert not registry.is_loaded('json')
+
+    with mock.patch('importlib.import_module') as import_module:
+        assert import_module.return_value is registry.get('json')
+        assert import_module.return_value is registry.get('json')
+    import_module.assert_called_once_with('json')
+    assert registry.is_loaded('json')
+
+
+def test_register_object():
+    registry = BackendRegistry()
+    backend = mock.Mock()
+    registry.register('gevent', backend)
+
+    assert registry.is_loaded('gevent')
+    assert backend is registry.get('gevent')
+
+    registry.remove('gevent')
+    with pytest.raises(ValueError) as exc_info:
+        registry.get('gevent')
+    assert 'gevent' in str(exc_info.value)
+
+
+def test_import_error():
+    registry = BackendRegistry()
+    registry.register('missing', 'reversible_missing_backend')
+
+    with pytest.raises(ImportError):
+        registry.get('missing')
+    assert not registry.is_loaded('missing')
+
+
+def test_import_reversible_is_light():
+    modules = subprocess.check_output([
+        sys.executable, '-c',
+        'import sys, reversible; print("\\n".join(sys.modules))',
+    ]).decode('utf-8').split()
+
+    for name in [
+        'tornado', 'greenlet', 'asyncio', 'multiprocessing', 'http.server',
+    ]:
+        assert name not in modules
@@ -2,6 +2,7 @@ from __future__ import absolute_import
 
 import mock
 import pytest
+from concurrent.futures import ThreadPoolExecutor
 
 import reversible
 
@@ -107,3 +108,241 @@ class TestActionBuilder(object):
 
         with pytest.raises(ValueError):
             some_action(42)
+
+    def test_with_two_forwards_many_fail(self):
+
+        @reversible.action
+        def some_action(context, x):
+            assert False
+
+        @some_action.forwards_many
+        def some_actions(contexts, arguments):
+            assert False
+
+        with pytest.raises(ValueError):
+
+            @some_action.forwards_many
+            def some_actions_again(contexts, arguments):
+                assert False
+
+    def test_with_two_backwards_many_fail(self):
+
+        @reversible.action
+        def some_action(context, x):
+            assert False
+
+        @some_action.backwards_many
+        def reverse_some_actions(contexts, arguments):
+            assert False
+
+        with pytest.raises(ValueError):
+
+            @some_action.backwards_many
+            def reverse_some_actions_again(contexts, arguments):
+                assert False
+
+
+class MyException(Exception):
+    pass
+
+
+class TestExecutor(object):
+
+    @pytest.fixture
+    def logger(self):
+        logger = mock.Mock()
+        logger.isEnabledFor.return_value = True
+        return logger
+
+    def test_execute_uses_default_executor(self):
+        action = mock.MagicMock()
+        action.forwards.return_value = 42
+
+        with mock.patch.object(
+            reversible.default_executor, 'execute', return_value=42
+        ) as execute:
+            assert 42 == reversible.execute(action)
+
+        execute.assert_called_once_with(action, None, None, None, None, None)
+
+    def test_hooks_success(self):
+        executor = reversible.Executor()
+        before = executor.before(mock.Mock())
+        after = executor.after(mock.Mock())
+        rollback = executor.on_rollback(mock.Mock())
+
+        action = mock.MagicMock()
+        action.forwards.return_value = 42
+
+        assert 42 == executor.execute(action)
+        before.assert_called_once_with(action)
+        after.assert_called_once_with(action, 42)
+        assert rollback.call_count == 0
+
+    def test_hooks_failure(self):
+        executor = reversible.Executor()
+        after = executor.after(mock.Mock())
+        rollback = executor.on_rollback(mock.Mock())
+
+        error = MyException('great sadness')
+        action = mock.MagicMock()
+        action.forwards.side_effect = error
+
+        with pytest.raises(MyException):
+            executor.execute(action)
+
+        assert after.call_count == 0
+        rollback.assert_called_once_with(action, error, None)
+
+    def test_hooks_rollback_failure(self):
+        executor = reversible.Executor()
+        rollback = executor.on_rollback(mock.Mock())
+
+        error = MyException('great sadness')
+        rollback_error = Exception('rollback failed')
+        action = mock.MagicMock()
+        action.forwards.side_effect = error
+        action.backwards.side_effect = rollback_error
+
+        with pytest.raises(Exception) as exc_info:
+            executor.execute(action)
+
+        assert exc_info.value is rollback_error
+        rollback.assert_called_once_with(action, error, rollback_error)
+
+    def test_unexpected_failure_logged_with_traceback(self, logger):
+        executor = reversible.Executor(logger=logger)
+        action = mock.MagicMock()
+        action.forwards.side_effect = MyException('great sadness')
+
+        with pytest.raises(MyException):
+            executor.execute(action)
+
+        logger.error.assert_called_once_with(
+            mock.ANY, action, exc_info=True
+        )
+        assert logger.debug.call_count == 0
+
+    @pytest.mark.parametrize('expected', [
+        (MyException,),
+        lambda e: isinstance(e, MyException),
+    ])
+    def test_expected_failure_logged_without_traceback(
+        self, logger, expected
+    ):
+        executor = reversible.Executor(logger=logger, expected=expected)
+        action = mock.MagicMock()
+        action.forwards.side_effect = MyException('great sadness')
+
+        with pytest.raises(MyException):
+            executor.execute(action)
+
+        assert logger.error.call_count == 0
+        logger.debug.assert_called_once_with(
+            mock.ANY, action, action.forwards.side_effect
+        )
+        action.backwards.assert_called_once_with()
+
+    def test_disabled_logger_is_not_called(self, logger):
+        logger.isEnabledFor.return_value = False
+        executor = reversible.Executor(logger=logger)
+        action = mock.MagicMock()
+        action.forwards.side_effect = MyException('great sadness')
+
+        with pytest.raises(MyException):
+            executor.execute(action)
+
+        assert logger.error.call_count == 0
+        assert logger.debug.call_count == 0
+
+    def test_rollback_failure_always_logged(self, logger):
+        executor = reversible.Executor(logger=logger, expected=(MyException,))
+        action = mock.MagicMock()
+        action.forwards.side_effect = MyException('great sadness')
+        action.backwards.side_effect = Exception('rollback failed')
+
+        with pytest.raises(Exception):
+            executor.execute(action)
+
+        logger.exception.assert_called_once_with(mock.ANY, action)
+
+
+class TestExecuteMany(object):
+
+    def make_action(self, value, started=None, fail=False):
+        action = mock.MagicMock()
+
+        def forwards():
+            if started is not None:
+                started.append(value)
+            if fail:
+                raise MyException(value)
+            return value
+
+        action.forwards.side_effect = forwards
+        return action
+
+    @pytest.mark.parametrize('ordered', [True, False])
+    def test_outcomes(self, ordered):
+        actions = [self.make_action(i) for i in range(20)]
+        outcomes = list(reversible.execute_many(
+            actions, max_workers=4, ordered=ordered
+        ))
+
+        values = [o.result() for o in outcomes]
+        if ordered:
+            assert list(range(20)) == values
+        else:
+            assert list(range(20)) == sorted(values)
+        for outcome in outcomes:
+            assert outcome.error is None
+            assert actions[outcome.value] is outcome.action
+
+    @pytest.mark.parametrize('ordered', [True, False])
+    def test_failures_are_rolled_back(self, ordered):
+        actions = [self.make_action(i, fail=(i % 2)) for i in range(10)]
+        outcomes = list(reversible.execute_many(actions, ordered=ordered))
+
+        assert 10 == len(outcomes)
+        for outcome in outcomes:
+            i = actions.index(outcome.action)
+            if i % 2:
+                assert isinstance(outcome.error, MyException)
+                outcome.action.backwards.assert_called_once_with()
+                with pytest.raises(MyException):
+                    outcome.result()
+            else:
+                assert i == outcome.result()
+                assert outcome.action.backwards.call_count == 0
+
+    @pytest.mark.parametrize('ordered', [True, False])
+    def test_max_pending(self, ordered):
+        started = []
+        consumed = []
+
+        def actions():
+            for i in range(50):
+                yield self.make_action(i, started)
+
+        for outcome in reversible.execute_many(
+            actions(), max_workers=2, max_pending=3, ordered=ordered
+        ):
+            consumed.append(outcome.value)
+            assert len(started) - len(consumed) <= 3
+
+        assert 50 == len(consumed)
+
+    def test_shared_thread_pool(self):
+        pool = mock.Mock()
+        pool.submit.side_effect = ThreadPoolExecutor(2).submit
+
+        outcomes = reversible.execute_many(
+            [self.make_action(i) for i in range(5)], thread_pool=pool
+        )
+        assert list(range(5)) == [o.value for o in outcomes]
+        assert 5 == pool.submit.call_count
+        assert pool.shutdown.call_count == 0
+
+    def test_invalid_max_pending(self):
+        with pytest.raises(ValueError):
+            reversible.execute_many([], max_pending=0)
@@ -0,0 +1,206 @@
+from __future__ import absolute_import
+
+import time
+
+import mock
+import pytest
+
+import reversible
+
+
+def sleeping_action(seconds, calls=None, value=None, **kwargs):
+
+    @reversible.action(**kwargs)
+    def sleep(ctx):
+        time.sleep(seconds)
+        if calls is not None:
+            calls.append(('forwards', value))
+        return value
+
+    @sleep.backwards
+    def undo_sleep(ctx):
+        if calls is not None:
+            calls.append(('backwards', value))
+
+    return sleep()
+
+
+def test_action_timeout():
+    start = time.time()
+    with pytest.raises(reversible.Timeout):
+        reversible.execute(sleeping_action(1, timeout=0.05))
+    assert time.time() - start < 0.5
+
+
+def test_action_within_timeout():
+    assert 42 == reversible.execute(
+        sleeping_action(0, value=42, timeout=1)
+    )
+
+
+def test_step_timeout_raised_at_yield_point():
+    calls = []
+
+    @reversible.gen
+    def action():
+        try:
+            yield sleeping_action(1, calls, 'slow', timeout=0.05)
+        except reversible.Timeout:
+            calls.append('caught')
+        result = yield sleeping_action(0, calls, 'fast')
+        raise reversible.Return(result)
+
+    assert 'fast' == reversible.execute(action())
+    assert ['caught', ('forwards', 'fast')] == calls
+
+
+def test_saga_deadline_rolls_back():
+    calls = []
+
+    @reversible.gen
+    def inner():
+        yield sleeping_action(0.05, calls, 'inner')
+        yield sleeping_action(1, calls, 'slow')
+
+    @reversible.gen
+    def action():
+        yield sleeping_action(0, calls, 'first')
+        yield inner()
+        pytest.fail('Should not reach here')
+
+    start = time.time()
+    with pytest.raises(reversible.Timeout):
+        reversible.execute(action(), timeout=0.2)
+    assert time.time() - start < 0.6
+
+    assert [
+        ('forwards', 'first'),
+        ('forwards', 'inner'),
+        ('backwards', 'inner'),
+        ('backwards', 'first'),
+    ] == calls
+
+    # The slow step was abandoned. It's rolled back once it finishes.
+    time.sleep(1)
+    assert [('forwards', 'slow'), ('backwards', 'slow')] == calls[4:]
+
+
+def test_no_step_started_after_deadline():
+    after = mock.MagicMock()
+
+    @reversible.gen
+    def action():
+        time.sleep(0.1)
+        yield after
+
+    with pytest.raises(reversible.Timeout):
+        reversible.execute(action(), timeout=0.05)
+
+    assert 0 == after.forwards.call_count
+
+    # Like any failed step, it is still rolled back.
+    after.backwards.assert_called_once_with()
+
+
+def test_parallel_members_share_deadline():
+
+    @reversible.gen
+    def action():
+        yield [sleeping_action(0), sleeping_action(1)]
+
+    start = time.time()
+    with pytest.raises(reversible.Timeout):
+        reversible.execute(action(), timeout=0.1)
+    assert time.time() - start < 0.6
+
+
+def test_rollback_timeout():
+    calls = []
+
+    @reversible.action
+    def slow_rollback(ctx):
+        pass
+
+    @slow_rollback.backwards
+    def undo_slow_rollback(ctx):
+        time.sleep(1)
+
+    @reversible.gen
+    def action():
+        yield sleeping_action(0, calls, 'first')
+        yield slow_rollback()
+        raise ValueError('great sadness')
+
+    start = time.time()
+    with pytest.raises(reversible.Timeout):
+        reversible.execute(action(), rollback_timeout=0.1)
+    assert time.time() - start < 0.6
+
+    # Rollback was aborted.
+    assert [('forwards', 'first')] == calls
+
+
+def test_rollback_has_its_own_budget():
+    calls = []
+
+    @reversible.gen
+    def action():
+        yield sleeping_action(0, calls, 'first')
+        yield sleeping_action(1, calls, 'slow')
+
+    with pytest.raises(reversible.Timeout):
+        reversible.execute(action(), timeout=0.1, rollback_timeout=1)
+
+    assert ('backwards', 'first') == calls[-1]
+
+
+def test_timeout_is_retried():
+    attempts = []
+
+    @reversible.action(
+        timeout=0.05, retry=reversible.Retry(attempts=2, backoff=0)
+    )
+    def flaky(ctx):
+        attempts.append(1)
+        if len(attempts) == 1:
+            time.sleep(0.5)
+        return len(attempts)
+
+    flaky.backwards(mock.Mock())
+
+    assert 2 == reversible.execute(flaky())
+
+
+def test_saga_deadline_is_not_retried():
+
+    @reversible.gen
+    def action():
+        yield sleeping_action(0.3)
+
+    start = time.time()
+    with pytest.raises(reversible.Timeout):
+        reversible.execute(
+            action(), timeout=0.2,
+            retry=reversible.Retry(attempts=4, backoff=1, jitter=False),
+        )
+    assert time.time() - start < 0.6
+
+
+def test_retry_backoff_ends_at_deadline():
+    attempts = []
+
+    @reversible.action
+    def flaky(ctx):
+        attempts.append(1)
+        raise ValueError('great sadness')
+
+    flaky.backwards(mock.Mock())
+
+    start = time.time()
+    with pytest.raises(reversible.Timeout):
+        reversible.execute(
+            flaky(), timeout=0.2,
+            retry=reversible.Retry(attempts=4, backoff=1, jitter=False),
+        )
+    assert time.time() - start < 0.6
+    assert 1 == len(attempts)
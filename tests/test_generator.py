@@ -173,3 +173,219 @@ def test_raise_return():
 
     assert "world" == reversible.execute(gen_based_action())
     action.forwards.assert_called_once_with()
+
+
+def merged_rollback_action(calls, batch_key=None):
+
+    @reversible.action(batch_key=batch_key)
+    def put(ctx, value, store=None):
+        ctx['id'] = value
+        return value
+
+    @put.backwards
+    def delete(ctx, value, store=None):
+        calls.append(('delete', value))
+
+    @put.backwards_many
+    def delete_many(contexts, arguments):
+        calls.append(('delete_many', [ctx['id'] for ctx in contexts]))
+
+    return put
+
+
+def test_adjacent_rollbacks_are_merged():
+    calls = []
+    put = merged_rollback_action(calls)
+
+    other = mock.MagicMock()
+    other.backwards.side_effect = lambda: calls.append('other')
+
+    @reversible.gen
+    def action():
+        yield put(1)
+        yield put(2)
+        yield other
+        yield put(3)
+        yield put(4)
+        yield put(5)
+        raise Exception('great sadness')
+
+    with pytest.raises(Exception) as exc_info:
+        reversible.execute(action())
+
+    assert 'great sadness' in str(exc_info)
+    assert [
+        ('delete_many', [5, 4, 3]),
+        'other',
+        ('delete_many', [2, 1]),
+    ] == calls
+
+
+def test_rollbacks_merged_by_batch_key():
+    calls = []
+    put = merged_rollback_action(calls, batch_key=lambda value, store: store)
+
+    @reversible.gen
+    def action():
+        yield put(1, store='a')
+        yield put(2, store='a')
+        yield put(3, store='b')
+        yield put(4, store='a')
+        raise Exception('great sadness')
+
+    with pytest.raises(Exception):
+        reversible.execute(action())
+
+    assert [
+        ('delete', 4),
+        ('delete', 3),
+        ('delete_many', [2, 1]),
+    ] == calls
+
+
+@pytest.mark.parametrize('executor', [
+    reversible.Executor(tracer=reversible.Tracer()),
+    reversible.Executor(metrics=reversible.Metrics()),
+], ids=['tracer', 'metrics'])
+def test_traced_rollbacks_are_merged(executor):
+    calls = []
+    put = merged_rollback_action(calls)
+
+    @reversible.gen
+    def action():
+        yield put(1)
+        yield put(2)
+        raise Exception('great sadness')
+
+    with pytest.raises(Exception):
+        executor.execute(action(), retry=reversible.Retry(attempts=1))
+    assert [('delete_many', [2, 1])] == calls
+
+
+def recording_action(calls, value):
+
+    @reversible.action
+    def record(ctx):
+        calls.append(('forwards', value))
+        return value
+
+    @record.backwards
+    def undo_record(ctx):
+        calls.append(('backwards', value))
+
+    return record()
+
+
+@pytest.mark.parametrize('make_savepoint', [
+    lambda inner: reversible.savepoint(reversible.gen(inner)()),
+    lambda inner: reversible.gen(savepoint=True)(inner)(),
+])
+def test_savepoint_rolls_back_before_yield_point(make_savepoint):
+    calls = []
+
+    def inner():
+        yield recording_action(calls, 1)
+        yield recording_action(calls, 2)
+        raise Exception('great sadness')
+
+    @reversible.gen
+    def action():
+        yield recording_action(calls, 0)
+        try:
+            yield make_savepoint(inner)
+        except Exception:
+            calls.append('caught')
+        yield recording_action(calls, 3)
+        raise Exception('more sadness')
+
+    with pytest.raises(Exception) as exc_info:
+        reversible.execute(action())
+
+    assert 'more sadness' in str(exc_info)
+    assert [
+        ('forwards', 0),
+        ('forwards', 1),
+        ('forwards', 2),
+        ('backwards', 2),
+        ('backwards', 1),
+        'caught',
+        ('forwards', 3),
+        ('backwards', 3),
+        ('backwards', 0),
+    ] == calls
+
+
+def test_without_savepoint_rolls_back_with_parent():
+    calls = []
+
+    @reversible.gen
+    def inner():
+        yield recording_action(calls, 1)
+        raise Exception('great sadness')
+
+    @reversible.gen
+    def action():
+        try:
+            yield inner()
+        except Exception:
+            calls.append('caught')
+        raise Exception('more sadness')
+
+    with pytest.raises(Exception):
+        reversible.execute(action())
+
+    assert [('forwards', 1), 'caught', ('backwards', 1)] == calls
+
+
+def test_savepoint_rollback_failure():
+    calls = []
+    fails = mock.Mock()
+    fails.backwards.side_effect = Exception('rollback failed')
+
+    @reversible.gen
+    def inner():
+        yield recording_action(calls, 1)
+        yield fails
+        yield recording_action(calls, 2)
+        raise Exception('great sadness')
+
+    @reversible.gen
+    def action():
+        try:
+            yield reversible.savepoint(inner())
+        except Exception as e:
+            calls.append(str(e))
+
+    reversible.execute(action())
+
+    # The steps that were not rolled back stay applied.
+    assert [
+        ('forwards', 1),
+        ('forwards', 2),
+        ('backwards', 2),
+        'rollback failed',
+    ] == calls
+
+
+def test_savepoint_success_is_rolled_back_with_parent():
+    calls = []
+
+    @reversible.gen
+    def inner():
+        yield recording_action(calls, 1)
+
+    @reversible.gen
+    def action():
+        yield reversible.savepoint(inner())
+        raise Exception('great sadness')
+
+    with pytest.raises(Exception):
+        reversible.execute(action())
+
+    assert [('forwards', 1), ('backwards', 1)] == calls
+
+
+def test_savepoint_requires_generator_action():
+    assert reversible.savepoint(empty_action()) is not None
+    with pytest.raises(TypeError):
+        reversible.savepoint(mock.Mock())
@@ -0,0 +1,250 @@
+from __future__ import absolute_import
+
+import time
+import threading
+
+import mock
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+
+import reversible
+
+
+class MyException(Exception):
+    pass
+
+
+def recording_action(calls, name, exc=None, barrier=None):
+
+    @reversible.action
+    def go(ctx, *upstream):
+        if barrier is not None:
+            barrier.wait(5)
+        calls.append(('forwards', name))
+        if exc is not None:
+            raise exc
+        return name + ''.join(upstream)
+
+    @go.backwards
+    def rollback(ctx, *upstream):
+        calls.append(('backwards', name))
+
+    return go
+
+
+def provisioning_plan(calls, failing=None, barrier=None):
+    plan = reversible.graph()
+
+    def node(name, requires=()):
+        plan.add(name, recording_action(
+            calls, name,
+            exc=MyException('great sadness') if name == failing else None,
+            barrier=barrier if name in ('disk', 'dns') else None,
+        ), requires)
+
+    node('network')
+    node('disk', ['network'])
+    node('dns', ['network'])
+    node('vm', ['disk', 'dns'])
+    node('monitoring', ['vm'])
+    node('billing', ['vm'])
+    return plan
+
+
+def test_results_are_passed_downstream():
+    calls = []
+    results = reversible.execute(provisioning_plan(calls))
+
+    assert 'network' == results['network']
+    assert 'disknetwork' == results['disk']
+    assert 'vmdisknetworkdnsnetwork' == results['vm']
+    assert 6 == len(results)
+    assert ('forwards', 'network') == calls[0]
+    assert ('forwards', 'vm') == calls[3]
+
+
+def test_independent_nodes_run_concurrently():
+    # disk and dns block until both of them are running.
+    barrier = threading.Barrier(2)
+    calls = []
+    reversible.execute(provisioning_plan(calls, barrier=barrier))
+    assert not barrier.broken
+
+
+def test_failure_rolls_back_in_reverse_dependency_order():
+    calls = []
+    with pytest.raises(MyException):
+        reversible.execute(provisioning_plan(calls, failing='vm'))
+
+    rollbacks = [name for kind, name in calls if kind == 'backwards']
+    assert 'vm' == rollbacks[0]
+    assert set(['disk', 'dns']) == set(rollbacks[1:3])
+    assert ['network'] == rollbacks[3:]
+
+    # Nodes that depend on the failed one never start.
+    assert ('forwards', 'monitoring') not in calls
+
+
+def test_actions_and_builders():
+    calls = []
+    plan = reversible.graph()
+    plan.add('a', recording_action(calls, 'a')())
+    plan.add('b', lambda a: recording_action(calls, 'b')(a), ['a'])
+    assert {'a': 'a', 'b': 'ba'} == reversible.execute(plan)
+
+
+def test_rollback_failure():
+    calls = []
+    plan = reversible.graph()
+    plan.add('a', recording_action(calls, 'a'))
+
+    fails = mock.Mock()
+    fails.backwards.side_effect = MyException('rollback failed')
+    plan.add('b', fails, ['a'])
+    plan.add('c', recording_action(calls, 'c', MyException('great sadness')),
+             ['b'])
+
+    with pytest.raises(MyException) as exc_info:
+        reversible.execute(plan)
+
+    assert 'rollback failed' in str(exc_info.value)
+    assert ('backwards', 'c') in calls
+    assert ('backwards', 'a') not in calls
+    assert ['a', 'b'] == list(plan.pending)
+
+
+def test_yielded_in_generator():
+    calls = []
+
+    @reversible.gen
+    def action():
+        results = yield provisioning_plan(calls)
+        yield recording_action(calls, 'done')()
+        raise MyException(results['billing'])
+
+    with pytest.raises(MyException):
+        reversible.execute(action())
+
+    assert ('backwards', 'done') == calls[7]
+    assert ('backwards', 'network') == calls[-1]
+    assert 14 == len(calls)
+
+
+def test_invalid_nodes():
+    plan = reversible.graph()
+    plan.add('a', mock.Mock())
+    with pytest.raises(ValueError):
+        plan.add('a', mock.Mock())
+    with pytest.raises(ValueError):
+        plan.add('b', mock.Mock(), ['c'])
+
+
+def test_nodes_are_retried():
+    calls = []
+    attempts = []
+
+    @reversible.action
+    def flaky(ctx, a):
+        attempts.append(a)
+        if len(attempts) < 3:
+            raise MyException('great sadness')
+        return a + 'b'
+
+    flaky.backwards(lambda ctx, a: None)
+
+    plan = reversible.graph()
+    plan.add('a', recording_action(calls, 'a'))
+    plan.add('b', flaky, ['a'])
+
+    results = reversible.execute(plan, retry=reversible.Retry(backoff=0))
+    assert {'a': 'a', 'b': 'ab'} == results
+    assert 3 == len(attempts)
+
+    # Only the failed node was retried, not the whole graph.
+    assert [('forwards', 'a')] == calls
+
+
+def test_node_timeout():
+    calls = []
+
+    @reversible.action(timeout=0.05)
+    def slow(ctx, *upstream):
+        time.sleep(0.5)
+
+    slow.backwards(lambda ctx, *upstream: calls.append(('backwards', 'slow')))
+
+    plan = reversible.graph()
+    plan.add('a', recording_action(calls, 'a'))
+    plan.add('slow', slow, ['a'])
+
+    start = time.time()
+    with pytest.raises(reversible.Timeout):
+        reversible.execute(plan)
+    assert time.time() - start < 0.4
+    assert ('backwards', 'a') in calls
+
+
+def test_nodes_are_limited():
+    limiter = reversible.Limiter(concurrency=1)
+    reversible.limiters.set('graph', limiter)
+    counter = {'lock': threading.Lock(), 'active': 0, 'peak': 0}
+
+    @reversible.action(resource='graph')
+    def call(ctx):
+        with counter['lock']:
+            counter['active'] += 1
+            counter['peak'] = max(counter['peak'], counter['active'])
+        time.sleep(0.02)
+        with counter['lock']:
+            counter['active'] -= 1
+
+    call.backwards(lambda ctx: None)
+
+    plan = reversible.graph()
+    for name in 'abcd':
+        plan.add(name, call())
+    try:
+        reversible.execute(plan)
+    finally:
+        reversible.limiters.remove('graph')
+    assert 1 == counter['peak']
+
+
+def test_nodes_are_traced():
+    tracer = reversible.Tracer()
+    calls = []
+    plan = reversible.graph()
+    plan.add('a', recording_action(calls, 'a'))
+    plan.add('b', recording_action(calls, 'b'), ['a'])
+
+    reversible.Executor(tracer=tracer).execute(plan)
+
+    [graph_span] = [s for s in tracer.spans if s.name == 'Graph']
+    node_spans = [s for s in tracer.spans if s.name.endswith('go')]
+    assert 2 == len(node_spans)
+    assert all(s.parent_id == graph_span.span_id for s in node_spans)
+
+
+def test_nested_in_pool_worker():
+    executor = ThreadPoolExecutor(2)
+
+    @reversible.gen(executor=executor)
+    def outer():
+        plans = []
+        for _ in range(4):
+            plan = reversible.graph(executor)
+            plan.add('a', recording_action([], 'a'))
+            plan.add('b', recording_action([], 'b'))
+            plans.append(plan)
+        yield plans
+
+    # Every worker runs a graph that waits on nodes of its own. Run in a
+    # thread so that a deadlock fails the test instead of hanging.
+    outcome = []
+    thread = threading.Thread(
+        target=lambda: outcome.append(reversible.execute(outer()))
+    )
+    thread.daemon = True
+    thread.start()
+    thread.join(10)
+    assert not thread.is_alive(), 'nested graphs deadlocked'
@@ -0,0 +1,280 @@
+from __future__ import absolute_import
+
+import os
+import time
+import threading
+
+import mock
+import pytest
+
+import reversible
+
+
+class Crash(BaseException):
+    """Simulates the process dying in the middle of a saga."""
+
+
+calls = []
+
+
+@reversible.action
+def create(context, name):
+    context['created'] = name
+    calls.append(('create', name))
+    return name
+
+
+@create.backwards
+def delete(context, name):
+    calls.append(('delete', context.get('created')))
+
+
+@reversible.action
+def crash(context):
+    raise Crash()
+
+
+@crash.backwards
+def undo_crash(context):
+    pass
+
+
+@reversible.action
+def fail(context):
+    raise Exception('great sadness')
+
+
+@fail.backwards
+def undo_fail(context):
+    pass
+
+
+@reversible.action(timeout=0.05)
+def slow_create(context, name):
+    time.sleep(0.2)
+    context['created'] = name
+    calls.append(('create', name))
+
+
+@slow_create.backwards
+def slow_delete(context, name):
+    calls.append(('delete', context.get('created')))
+
+
+@pytest.fixture(autouse=True)
+def reset_calls():
+    del calls[:]
+
+
+@pytest.fixture
+def path(tmpdir):
+    return str(tmpdir.join('sagas.journal'))
+
+
+@pytest.fixture(params=[True, False])
+def journal(request, path):
+    journal = reversible.FileJournal(path, sync=request.param)
+    yield journal
+    journal.close()
+
+
+@reversible.gen
+def saga(*names):
+    for name in names:
+        yield create(name)
+
+
+@reversible.gen
+def crashing_saga():
+    yield create('a')
+    yield saga('b', 'c')
+    yield [create('d'), create('e')]
+    yield crash()
+
+
+def test_successful_saga_is_not_recovered(journal):
+    reversible.execute(saga('a', 'b', 'c'), journal=journal)
+    assert [] == reversible.recover(journal)
+    assert ('delete', 'a') not in calls
+
+
+def test_rolled_back_saga_is_not_recovered(journal):
+
+    @reversible.gen
+    def failing():
+        yield create('a')
+        yield create('b')
+        yield fail()
+
+    with pytest.raises(Exception):
+        reversible.execute(failing(), journal=journal)
+
+    assert [('delete', 'b'), ('delete', 'a')] == calls[-2:]
+    del calls[:]
+
+    assert [] == reversible.recover(journal)
+    assert [] == calls
+
+
+def test_crashed_saga_is_recovered(journal, path):
+    with pytest.raises(Crash):
+        reversible.execute(crashing_saga(), journal=journal)
+    journal.close()
+
+    del calls[:]
+    journal = reversible.FileJournal(path)
+    recovered = reversible.recover(journal)
+
+    assert 1 == len(recovered)
+    assert set([('delete', 'd'), ('delete', 'e')]) == set(calls[:2])
+    assert [('delete', 'c'), ('delete', 'b'), ('delete', 'a')] == calls[2:]
+
+    # Recovering again does nothing.
+    del calls[:]
+    assert [] == reversible.recover(reversible.FileJournal(path))
+    assert [] == calls
+
+
+def test_graph_nodes_are_journaled(journal, path):
+    plan = reversible.graph()
+    plan.add('a', create('a'))
+    plan.add('b', create('b'), ['a'])
+    plan.add('crash', crash(), ['b'])
+
+    with pytest.raises(Crash):
+        reversible.execute(plan, journal=journal)
+    del calls[:]
+
+    assert 1 == len(reversible.recover(reversible.FileJournal(path)))
+    assert [('delete', 'b'), ('delete', 'a')] == calls
+
+
+def test_caught_failure_then_crash(journal, path):
+
+    @reversible.gen
+    def action():
+        yield create('a')
+        try:
+            yield [create('b'), fail()]
+        except Exception:
+            pass
+        yield crash()
+
+    with pytest.raises(Crash):
+        reversible.execute(action(), journal=journal)
+
+    # b was rolled back when the group failed.
+    assert ('delete', 'b') in calls
+    del calls[:]
+
+    assert 1 == len(reversible.recover(reversible.FileJournal(path)))
+    assert [('delete', 'a')] == calls
+
+
+def test_top_level_action_is_journaled(journal, path):
+    with pytest.raises(Crash):
+        reversible.execute(crash(), journal=journal)
+
+    # Nothing completed so there's nothing to undo.
+    assert [] == reversible.recover(reversible.FileJournal(path))
+
+    assert 'a' == reversible.execute(create('a'), journal=journal)
+    assert [] == reversible.recover(reversible.FileJournal(path))
+
+
+def test_step_finished_after_saga_is_not_recovered(journal, path):
+
+    @reversible.gen
+    def action():
+        try:
+            yield slow_create('a')
+        except reversible.Timeout:
+            pass
+
+    reversible.execute(action(), journal=journal)
+
+    # The abandoned step finishes after the saga.
+    time.sleep(0.3)
+    assert [('create', 'a')] == calls
+
+    assert [] == reversible.recover(reversible.FileJournal(path))
+    assert [('create', 'a')] == calls
+
+
+def test_abandoned_step_rolled_back_once_finished(journal, path):
+
+    @reversible.gen
+    def action():
+        yield create('a')
+        yield slow_create('b')
+
+    with pytest.raises(reversible.Timeout):
+        reversible.execute(action(), journal=journal)
+    assert [('create', 'a'), ('delete', 'a')] == calls
+
+    # b is rolled back with the context it filled in once it finishes.
+    time.sleep(0.3)
+    assert [('create', 'b'), ('delete', 'b')] == calls[2:]
+    del calls[:]
+
+    assert [] == reversible.recover(reversible.FileJournal(path))
+    assert [] == calls
+
+
+def test_failed_recovery_is_retried(journal, path):
+    with pytest.raises(Crash):
+        reversible.execute(crashing_saga(), journal=journal)
+
+    with mock.patch.object(create, '_backwards') as backwards:
+        backwards.side_effect = Exception('still broken')
+        assert [] == reversible.recover(reversible.FileJournal(path))
+
+    assert 1 == len(reversible.recover(reversible.FileJournal(path)))
+
+
+def test_torn_record_is_ignored(journal, path):
+    with pytest.raises(Crash):
+        reversible.execute(crashing_saga(), journal=journal)
+    journal.close()
+
+    with open(path, 'ab') as f:
+        f.write(b'\x00\x00\x01\x00garbage')
+
+    assert 1 == len(reversible.recover(reversible.FileJournal(path)))
+
+
+def test_unpicklable_action_fails_the_step(journal):
+
+    @reversible.action
+    def local(context):
+        return 42
+
+    @local.backwards
+    def undo_local(context):
+        calls.append('undo_local')
+
+    with pytest.raises(Exception):
+        reversible.execute(local(), journal=journal)
+    assert ['undo_local'] == calls
+
+
+def test_group_commit(path):
+    journal = reversible.FileJournal(path)
+    real_fsync = os.fsync
+
+    def slow_fsync(fd):
+        time.sleep(0.01)
+        real_fsync(fd)
+
+    with mock.patch('os.fsync', side_effect=slow_fsync) as fsync:
+        threads = [
+            threading.Thread(target=journal.append, args=(('test', i),))
+            for i in range(50)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    assert 50 == len(list(journal.records()))
+    assert fsync.call_count < 50
@@ -0,0 +1,188 @@
+from __future__ import absolute_import
+
+import time
+import threading
+
+import pytest
+
+import reversible
+from reversible.limit import _LimitedAction
+
+
+@pytest.fixture
+def limiter():
+    limiter = reversible.Limiter(concurrency=2)
+    reversible.limiters.set('downstream', limiter)
+    yield limiter
+    reversible.limiters.remove('downstream')
+
+
+def counting_action(counter, exc=None):
+
+    @reversible.action(resource='downstream')
+    def call(ctx):
+        with counter['lock']:
+            counter['active'] += 1
+            counter['peak'] = max(counter['peak'], counter['active'])
+        time.sleep(0.02)
+        with counter['lock']:
+            counter['active'] -= 1
+        if exc is not None:
+            raise exc
+
+    call.backwards(lambda ctx: None)
+    return call
+
+
+def counter():
+    return {'lock': threading.Lock(), 'active': 0, 'peak': 0}
+
+
+def test_concurrency_limit(limiter):
+    calls = counter()
+    call = counting_action(calls)
+
+    outcomes = list(reversible.execute_many(
+        [call() for _ in range(8)], max_workers=8
+    ))
+    assert all(o.error is None for o in outcomes)
+    assert 2 == calls['peak']
+
+
+def test_concurrency_limit_in_generator(limiter):
+    calls = counter()
+    call = counting_action(calls)
+
+    @reversible.gen
+    def action():
+        yield [call() for _ in range(6)]
+
+    reversible.execute(action())
+    assert 2 == calls['peak']
+
+
+def test_released_after_failure(limiter):
+    calls = counter()
+    call = counting_action(calls, exc=Exception('great sadness'))
+
+    for _ in range(3):
+        with pytest.raises(Exception):
+            reversible.execute(call())
+    assert 0 == limiter._active
+
+
+def test_unregistered_resource_is_not_limited():
+    calls = counter()
+    call = counting_action(calls)
+
+    outcomes = list(reversible.execute_many(
+        [call() for _ in range(4)], max_workers=4
+    ))
+    assert all(o.error is None for o in outcomes)
+    assert 4 == calls['peak']
+
+
+def test_rate_limit():
+    limiter = reversible.Limiter(rate=50, burst=2)
+    start = time.time()
+    for _ in range(7):
+        limiter.acquire()
+        limiter.release()
+
+    # Two calls start right away, the others one every 20 milliseconds.
+    assert 0.09 < time.time() - start < 0.5
+
+
+def test_concurrency_and_rate_limit():
+    limiter = reversible.Limiter(concurrency=1, rate=10)
+    reversible.limiters.set('downstream', limiter)
+    calls = counter()
+    call = counting_action(calls)
+
+    # Callers waiting for the first call to finish are then held back by the
+    # rate limit. Run on daemon threads so that a deadlock fails the test
+    # instead of hanging.
+    threads = [
+        threading.Thread(target=reversible.execute, args=(call(),))
+        for _ in range(4)
+    ]
+    try:
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+    finally:
+        reversible.limiters.remove('downstream')
+
+    assert not any(thread.is_alive() for thread in threads)
+    assert 1 == calls['peak']
+    assert 0 == limiter._active
+
+
+def test_rollbacks_get_priority():
+    limiter = reversible.Limiter(concurrency=1)
+    order = []
+
+    def call(name, rollback):
+        limiter.acquire(rollback)
+        order.append(name)
+        limiter.release()
+
+    def waiting():
+        return sum(len(queue) for queue in limiter._waiters)
+
+    limiter.acquire()
+    threads = []
+    for name, rollback in [('forwards', False), ('backwards', True)]:
+        thread = threading.Thread(target=call, args=(name, rollback))
+        thread.start()
+        threads.append(thread)
+        while waiting() < len(threads):
+            time.sleep(0.001)
+
+    limiter.release()
+    for thread in threads:
+        thread.join()
+    assert ['backwards', 'forwards'] == order
+
+
+def test_first_come_first_served_without_priority():
+    limiter = reversible.Limiter(concurrency=1, rollback_priority=False)
+    order = []
+    limiter.acquire()
+    limiter._enqueue(False, lambda: order.append('forwards'))
+    limiter._enqueue(True, lambda: order.append('backwards'))
+
+    limiter.release()
+    limiter.release()
+    assert ['forwards', 'backwards'] == order
+
+
+def test_limited_action_holds_limiter():
+    limiter = reversible.Limiter(concurrency=1)
+    rollback = []
+
+    class Action(object):
+
+        def forwards(self):
+            return 42
+
+        def backwards(self):
+            rollback.append(limiter._active)
+
+    action = _LimitedAction(Action(), limiter)
+    assert 42 == action.forwards()
+    action.backwards()
+    assert [1] == rollback
+    assert 0 == limiter._active
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'concurrency': 0},
+    {'rate': 0},
+    {'burst': 0},
+])
+def test_invalid_limiter(kwargs):
+    with pytest.raises(ValueError):
+        reversible.Limiter(**kwargs)
@@ -0,0 +1,170 @@
+from __future__ import absolute_import
+
+import pytest
+
+import reversible
+
+try:
+    from urllib.request import urlopen
+except ImportError:  # pragma: no cover
+    from urllib2 import urlopen
+
+
+class MyException(Exception):
+    pass
+
+
+@reversible.action
+def step(ctx, value, fail=False):
+    if fail:
+        raise MyException('great sadness')
+    return value
+
+
+@step.backwards
+def undo_step(ctx, value, fail=False):
+    pass
+
+
+def samples(metrics):
+    """Parses the Prometheus text format into a dictionary."""
+    result = {}
+    for line in metrics.prometheus().splitlines():
+        if line.startswith('#'):
+            continue
+        name, value = line.rsplit(' ', 1)
+        result[name] = float(value)
+    return result
+
+
+def test_counts_calls():
+    metrics = reversible.Metrics()
+    executor = reversible.Executor(metrics=metrics)
+
+    assert 42 == executor.execute(step(42))
+    with pytest.raises(MyException):
+        executor.execute(step(1, fail=True))
+
+    assert 1 == metrics.count('step')
+    assert 1 == metrics.count('step', outcome='error')
+    assert 1 == metrics.count('step', 'backwards')
+    assert 0 == metrics.in_flight
+
+    values = samples(metrics)
+    assert 1 == values[
+        'reversible_calls_total'
+        '{action="step",kind="forwards",outcome="error"}'
+    ]
+    assert 2 == values[
+        'reversible_call_duration_seconds_count'
+        '{action="step",kind="forwards"}'
+    ]
+    assert 2 == values[
+        'reversible_call_duration_seconds_bucket'
+        '{action="step",kind="forwards",le="+Inf"}'
+    ]
+    assert 1 == values[
+        'reversible_rollback_duration_seconds_count{action="step"}'
+    ]
+    assert 0 == values['reversible_sagas_in_flight']
+
+
+def test_saga_depth_and_rollback():
+    metrics = reversible.Metrics()
+    executor = reversible.Executor(metrics=metrics)
+
+    @reversible.gen
+    def inner():
+        yield step(2)
+        yield step(3)
+
+    @reversible.gen
+    def saga(fail):
+        yield step(1)
+        yield inner()
+        yield step(4, fail=fail)
+
+    executor.execute(saga(False))
+    with pytest.raises(MyException):
+        executor.execute(saga(True))
+
+    assert 7 == metrics.count('step')
+    assert 1 == metrics.count('step', outcome='error')
+    assert 4 == metrics.count('step', 'backwards')
+
+    values = samples(metrics)
+    # 4 steps and the nested generator, including the step that failed.
+    assert 2 == values['reversible_saga_depth_count']
+    assert 10 == values['reversible_saga_depth_sum']
+    assert 0 == values['reversible_saga_depth_bucket{le="2"}']
+    assert 2 == values['reversible_saga_depth_bucket{le="5"}']
+
+    [name] = [
+        key for key in values
+        if key.startswith('reversible_rollback_duration_seconds_count')
+    ]
+    assert name.endswith('saga"}')
+    assert 1 == values[name]
+
+
+def test_combined_with_tracer():
+    tracer = reversible.Tracer()
+    metrics = reversible.Metrics()
+    executor = reversible.Executor(tracer=tracer, metrics=metrics)
+
+    @reversible.gen
+    def saga():
+        yield step(1)
+        yield step(2, fail=True)
+
+    with pytest.raises(MyException):
+        executor.execute(saga())
+
+    assert 6 == len(tracer.spans)
+    assert 1 == len(set(span.trace_id for span in tracer.spans))
+    outer = set(
+        span.span_id for span in tracer.spans if span.name != 'step'
+    )
+    assert all(
+        span.parent_id in outer
+        for span in tracer.spans if span.name == 'step'
+    )
+
+    assert 1 == metrics.count('step')
+    assert 2 == metrics.count('step', 'backwards')
+
+
+def test_escapes_labels():
+    metrics = reversible.Metrics()
+    metrics.finish(metrics.start('a "b"\\\n', 'forwards'))
+
+    assert (
+        'reversible_calls_total'
+        '{action="a \\"b\\"\\\\\\n",kind="forwards",outcome="ok"} 1'
+    ) in metrics.prometheus().splitlines()
+
+
+def test_export_prometheus(tmpdir):
+    metrics = reversible.Metrics()
+    reversible.Executor(metrics=metrics).execute(step(1))
+
+    path = str(tmpdir.join('reversible.prom'))
+    metrics.export_prometheus(path)
+    with open(path) as f:
+        assert metrics.prometheus() == f.read()
+    assert ['reversible.prom'] == [p.basename for p in tmpdir.listdir()]
+
+
+def test_serve_prometheus():
+    metrics = reversible.Metrics()
+    reversible.Executor(metrics=metrics).execute(step(1))
+
+    server = metrics.serve_prometheus(0)
+    try:
+        host, port = server.server_address
+        response = urlopen('http://%s:%d/metrics' % (host, port))
+        assert response.headers['Content-Type'].startswith('text/plain')
+        assert metrics.prometheus() == response.read().decode('utf-8')
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,471 @@
+from __future__ import absolute_import
+
+import time
+import threading
+
+import mock
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+
+import reversible
+
+
+def successful_action(value):
+    action = mock.MagicMock()
+    action.forwards.return_value = value
+    return action
+
+
+def failing_action(message):
+    action = mock.MagicMock()
+    action.forwards.side_effect = Exception(message)
+    return action
+
+
+@pytest.mark.parametrize('container', [list, tuple])
+def test_results_in_order(container):
+    actions = [successful_action(i) for i in range(10)]
+
+    @reversible.gen
+    def action():
+        results = yield container(actions)
+        raise reversible.Return(results)
+
+    assert list(range(10)) == reversible.execute(action())
+    for a in actions:
+        a.forwards.assert_called_once_with()
+        assert a.backwards.call_count == 0
+
+
+def test_empty_list():
+
+    @reversible.gen
+    def action():
+        results = yield []
+        raise reversible.Return(results)
+
+    assert [] == reversible.execute(action())
+
+
+def test_runs_concurrently():
+    barrier = threading.Barrier(3) if hasattr(threading, 'Barrier') else None
+    if barrier is None:
+        pytest.skip('threading.Barrier is not available')
+
+    def wait(ctx):
+        # Deadlocks (and times out) unless all three run at the same time.
+        barrier.wait(timeout=5)
+
+    @reversible.action
+    def step(ctx):
+        return wait(ctx)
+
+    step.backwards(mock.Mock())
+
+    @reversible.gen(executor=ThreadPoolExecutor(3))
+    def action():
+        yield [step(), step(), step()]
+
+    reversible.execute(action())
+
+
+def test_custom_executor():
+    executor = mock.Mock()
+    executor.submit.side_effect = ThreadPoolExecutor(1).submit
+
+    @reversible.gen(executor=executor)
+    def action():
+        yield [successful_action(1), successful_action(2)]
+
+    reversible.execute(action())
+    assert executor.submit.call_count == 2
+
+
+def test_failure_rolls_back_succeeded_members():
+    before = successful_action('before')
+    succeeded = [successful_action(i) for i in range(3)]
+    failed = failing_action('great sadness')
+
+    @reversible.gen
+    def action():
+        yield before
+        yield [succeeded[0], failed, succeeded[1], succeeded[2]]
+        pytest.fail('Should not reach here')
+
+    with pytest.raises(Exception) as exc_info:
+        reversible.execute(action())
+
+    assert 'great sadness' in str(exc_info)
+    for a in succeeded:
+        a.backwards.assert_called_once_with()
+    failed.backwards.assert_called_once_with()
+    before.backwards.assert_called_once_with()
+
+
+def test_failure_raised_at_yield_point():
+    succeeded = successful_action(1)
+    failed = failing_action('great sadness')
+    after = successful_action('after')
+
+    @reversible.gen
+    def action():
+        try:
+            yield [succeeded, failed]
+        except Exception as e:
+            assert 'great sadness' in str(e)
+
+            # The member that succeeded was already rolled back.
+            succeeded.backwards.assert_called_once_with()
+            assert failed.backwards.call_count == 0
+
+        yield after
+
+    reversible.execute(action())
+
+    succeeded.backwards.assert_called_once_with()
+    assert failed.backwards.call_count == 0
+    assert after.backwards.call_count == 0
+
+
+def test_caught_failure_members_rolled_back_with_saga():
+    succeeded = successful_action(1)
+    failed = failing_action('great sadness')
+    after = failing_action('more sadness')
+
+    @reversible.gen
+    def action():
+        try:
+            yield [succeeded, failed]
+        except Exception:
+            pass
+        yield after
+
+    with pytest.raises(Exception) as exc_info:
+        reversible.execute(action())
+
+    assert 'more sadness' in str(exc_info)
+
+    # Rolled back only once, when the group failed.
+    succeeded.backwards.assert_called_once_with()
+    failed.backwards.assert_called_once_with()
+    after.backwards.assert_called_once_with()
+
+
+def test_members_rolled_back_with_saga():
+    calls = []
+
+    def tracked(name):
+        action = mock.MagicMock()
+        action.backwards.side_effect = lambda: calls.append(name)
+        return action
+
+    @reversible.gen
+    def action():
+        yield tracked('a')
+        yield [tracked('b'), tracked('c')]
+        yield failing_action('great sadness')
+
+    with pytest.raises(Exception):
+        reversible.execute(action())
+
+    assert set(calls[:2]) == set(['b', 'c'])
+    assert calls[2:] == ['a']
+
+
+def test_rollback_failure_of_member_is_raised():
+    succeeded = successful_action(1)
+    succeeded.backwards.side_effect = Exception('rollback failed')
+    failed = failing_action('great sadness')
+
+    @reversible.gen
+    def action():
+        yield [succeeded, failed]
+
+    with pytest.raises(Exception) as exc_info:
+        reversible.execute(action())
+
+    assert 'rollback failed' in str(exc_info)
+
+
+def test_nested_generators():
+    inner_actions = [successful_action(i) for i in range(3)]
+
+    @reversible.gen
+    def inner(i):
+        result = yield inner_actions[i]
+        raise reversible.Return(result * 10)
+
+    @reversible.gen
+    def outer():
+        results = yield [inner(i) for i in range(3)]
+        raise reversible.Return(results)
+
+    assert [0, 10, 20] == reversible.execute(outer())
+
+
+def test_nested_groups_fill_the_pool():
+    executor = ThreadPoolExecutor(2)
+
+    @reversible.action
+    def step(ctx, delay):
+        time.sleep(delay)
+
+    @step.backwards
+    def unstep(ctx, delay):
+        pass
+
+    @reversible.gen(executor=executor)
+    def inner():
+        yield step(0.05)
+        yield [step(0), step(0)]
+
+    @reversible.gen(executor=executor)
+    def outer():
+        yield [inner() for _ in range(4)]
+
+    # Every worker runs an inner generator that waits on a group of its own.
+    # Run in a thread so that a deadlock fails the test instead of hanging.
+    outcome = []
+    thread = threading.Thread(
+        target=lambda: outcome.append(reversible.execute(outer()))
+    )
+    thread.daemon = True
+    thread.start()
+    thread.join(10)
+    assert not thread.is_alive(), 'nested groups deadlocked'
+    assert [None] == outcome
+
+
+def recording_action(name, calls, rollback_delay=0):
+    action = mock.MagicMock()
+
+    def backwards():
+        time.sleep(rollback_delay)
+        calls.append(name)
+
+    action.backwards.side_effect = backwards
+    return action
+
+
+def test_group_rolled_back_concurrently():
+    calls = []
+
+    @reversible.gen(executor=ThreadPoolExecutor(5))
+    def action():
+        yield [recording_action(i, calls, 0.1) for i in range(5)]
+        yield failing_action('great sadness')
+
+    start = time.time()
+    with pytest.raises(Exception):
+        reversible.execute(action())
+    assert time.time() - start < 0.3
+    assert set(range(5)) == set(calls)
+
+
+def test_concurrent_rollback_with_barriers():
+    calls = []
+
+    @reversible.gen(executor=ThreadPoolExecutor(5), concurrent_rollback=True)
+    def action():
+        yield recording_action('a', calls, 0.05)
+        yield reversible.barrier()
+        for i in range(3):
+            yield recording_action(i, calls, 0.1)
+        yield reversible.barrier()
+        yield recording_action('b', calls)
+        yield recording_action('c', calls)
+        yield failing_action('great sadness')
+
+    start = time.time()
+    with pytest.raises(Exception) as exc_info:
+        reversible.execute(action())
+
+    assert 'great sadness' in str(exc_info)
+    assert time.time() - start < 0.3
+
+    assert set(['b', 'c']) == set(calls[:2])
+    assert set(range(3)) == set(calls[2:5])
+    assert ['a'] == calls[5:]
+
+
+def test_concurrent_rollback_failure_aborts():
+    calls = []
+    rollback_fails = recording_action('fails', calls)
+    rollback_fails.backwards.side_effect = Exception('rollback failed')
+
+    @reversible.gen(concurrent_rollback=True)
+    def action():
+        yield recording_action('a', calls)
+        yield reversible.barrier()
+        yield rollback_fails
+        yield recording_action('b', calls)
+        yield failing_action('great sadness')
+
+    with pytest.raises(Exception) as exc_info:
+        reversible.execute(action())
+
+    assert 'rollback failed' in str(exc_info)
+    assert ['b'] == calls
+
+
+def test_barrier_without_concurrent_rollback():
+    calls = []
+
+    @reversible.gen
+    def action():
+        yield recording_action('a', calls)
+        yield reversible.barrier()
+        yield recording_action('b', calls)
+        yield failing_action('great sadness')
+
+    with pytest.raises(Exception):
+        reversible.execute(action())
+
+    assert ['b', 'a'] == calls
+
+
+def batched_action(calls, batch_key=None, fail=None):
+    """Builds an action that records its bulk calls in ``calls``."""
+
+    @reversible.action(batch_key=batch_key)
+    def put(ctx, value, store=None):
+        calls.append(('put', value))
+        if value == fail:
+            raise Exception('great sadness')
+        ctx['id'] = value * 10
+        return ctx['id']
+
+    @put.backwards
+    def delete(ctx, value, store=None):
+        calls.append(('delete', value))
+
+    @put.forwards_many
+    def put_many(contexts, arguments):
+        values = [args[0] for args, kwargs in arguments]
+        calls.append(('put_many', values))
+        if fail in values:
+            raise Exception('great sadness')
+        for ctx, value in zip(contexts, values):
+            ctx['id'] = value * 10
+        return [value * 10 for value in values]
+
+    @put.backwards_many
+    def delete_many(contexts, arguments):
+        calls.append(('delete_many', [c.get('id') for c in contexts]))
+
+    return put
+
+
+def test_batched_members_share_one_call():
+    calls = []
+    put = batched_action(calls)
+    other = successful_action('other')
+
+    @reversible.gen
+    def action():
+        results = yield [put(1), other, put(2), put(3)]
+        raise reversible.Return(results)
+
+    assert [10, 'other', 20, 30] == reversible.execute(action())
+    assert [('put_many', [1, 2, 3])] == calls
+
+
+@pytest.mark.parametrize('executor', [
+    reversible.Executor(tracer=reversible.Tracer()),
+    reversible.Executor(metrics=reversible.Metrics()),
+], ids=['tracer', 'metrics'])
+def test_traced_members_are_batched(executor):
+    calls = []
+    put = batched_action(calls)
+
+    @reversible.gen
+    def action():
+        results = yield [put(1), put(2), put(3)]
+        raise reversible.Return(results)
+
+    assert [10, 20, 30] == executor.execute(action())
+    assert [('put_many', [1, 2, 3])] == calls
+
+
+def test_batch_key():
+    calls = []
+    put = batched_action(calls, batch_key=lambda value, store: store)
+
+    @reversible.gen
+    def action():
+        results = yield [
+            put(1, store='a'), put(2, store='b'), put(3, store='a'),
+            put(4, store='c'),
+        ]
+        raise reversible.Return(results)
+
+    assert [10, 20, 30, 40] == reversible.execute(action())
+    assert [('put', 2), ('put', 4), ('put_many', [1, 3])] == sorted(calls)
+
+
+def test_batch_requires_backwards_many():
+    calls = []
+
+    @reversible.action
+    def put(ctx, value):
+        calls.append(value)
+
+    put.backwards(mock.Mock())
+    put.forwards_many(mock.Mock())
+
+    @reversible.gen
+    def action():
+        yield [put(1), put(2)]
+
+    reversible.execute(action())
+    assert [1, 2] == sorted(calls)
+
+
+def test_batch_failure_rolls_back_group():
+    calls = []
+    put = batched_action(calls, fail=2)
+    succeeded = successful_action('other')
+
+    @reversible.gen
+    def action():
+        yield [put(1), succeeded, put(2)]
+
+    with pytest.raises(Exception) as exc_info:
+        reversible.execute(action())
+
+    assert 'great sadness' in str(exc_info)
+    succeeded.backwards.assert_called_once_with()
+    assert [('put_many', [1, 2]), ('delete_many', [None, None])] == calls
+
+
+def test_batch_rolled_back_with_saga():
+    calls = []
+    put = batched_action(calls)
+
+    @reversible.gen
+    def action():
+        yield [put(1), put(2)]
+        yield failing_action('great sadness')
+
+    with pytest.raises(Exception):
+        reversible.execute(action())
+
+    assert [('put_many', [1, 2]), ('delete_many', [10, 20])] == calls
+
+
+def test_batch_wrong_number_of_results():
+
+    @reversible.action
+    def put(ctx, value):
+        pass
+
+    put.backwards(mock.Mock())
+    put.forwards_many(lambda contexts, arguments: [1])
+    put.backwards_many(mock.Mock())
+
+    @reversible.gen
+    def action():
+        yield [put(1), put(2)]
+
+    with pytest.raises(ValueError):
+        reversible.execute(action())
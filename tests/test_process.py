@@ -0,0 +1,114 @@
+from __future__ import absolute_import
+
+import os
+
+import pytest
+from concurrent.futures import ProcessPoolExecutor
+
+import reversible
+
+
+calls = []
+
+
+@reversible.action
+def render(context, value):
+    context['pid'] = os.getpid()
+    if value is None:
+        raise ValueError('great sadness')
+    return value * 2
+
+
+@render.backwards
+def undo_render(context, value):
+    calls.append(('undo', value, context.get('pid')))
+
+
+@pytest.fixture(autouse=True)
+def reset_calls():
+    del calls[:]
+
+
+@pytest.fixture(scope='module')
+def pool():
+    pool = ProcessPoolExecutor(2)
+    yield pool
+    pool.shutdown()
+
+
+def test_forwards_runs_in_worker(pool):
+    action = reversible.in_process(render(21), pool)
+    assert 42 == reversible.execute(action)
+    assert os.getpid() != action.action.context['pid']
+
+
+def test_failure_is_rolled_back_with_worker_context(pool):
+    with pytest.raises(ValueError) as exc_info:
+        reversible.execute(reversible.in_process(render(None), pool))
+
+    assert 'great sadness' in str(exc_info.value)
+    [(_, value, pid)] = calls
+    assert value is None
+    assert pid not in (None, os.getpid())
+
+
+def test_generator(pool):
+
+    @reversible.gen
+    def action():
+        a = yield reversible.in_process(render(1), pool)
+        b = yield [
+            reversible.in_process(render(2), pool),
+            reversible.in_process(render(3), pool),
+        ]
+        yield render(4)
+        raise Exception('%s' % ([a] + b))
+
+    with pytest.raises(Exception) as exc_info:
+        reversible.execute(action())
+
+    assert '[2, 4, 6]' in str(exc_info.value)
+    assert [4, 3, 2, 1] == sorted([v for _, v, _ in calls], reverse=True)
+    pids = dict((value, pid) for _, value, pid in calls)
+    assert os.getpid() == pids[4]
+    assert os.getpid() not in (pids[1], pids[2], pids[3])
+
+
+def test_unpicklable_action(pool):
+    action = reversible.in_process(render(lambda: None), pool)
+    with pytest.raises(Exception):
+        action.forwards()
+
+
+@pytest.mark.parametrize('engine', ['tornado', 'tornado_native'])
+def test_tornado(pool, engine):
+    pytest.importorskip('tornado')
+    import importlib
+    from tornado.ioloop import IOLoop
+
+    module = importlib.import_module('reversible.' + engine)
+    ticks = []
+
+    @module.gen
+    def action():
+        a = yield module.in_process(render(1), pool)
+        b = yield module.in_process(render(None), pool)
+        raise module.Return(a + b)
+
+    def tick():
+        ticks.append(1)
+        io_loop.add_callback(tick)
+
+    io_loop = IOLoop()
+    io_loop.make_current()
+    try:
+        io_loop.add_callback(tick)
+        with pytest.raises(ValueError):
+            io_loop.run_sync(lambda: module.execute(action()))
+    finally:
+        io_loop.clear_current()
+        io_loop.close()
+
+    # The IOLoop kept running while the workers were busy.
+    assert ticks
+    assert [None, 1] == [value for _, value, _ in calls]
@@ -0,0 +1,217 @@
+from __future__ import absolute_import
+
+import time
+
+import pytest
+
+import reversible
+
+
+class Crash(BaseException):
+    """Simulates the process dying in the middle of a saga."""
+
+
+calls = []
+
+
+@reversible.action
+def create(context, name):
+    context['created'] = name
+    calls.append(('create', name))
+    return name.upper()
+
+
+@create.backwards
+def delete(context, name):
+    calls.append(('delete', context.get('created')))
+
+
+@reversible.action
+def crash(context):
+    raise Crash()
+
+
+@crash.backwards
+def undo_crash(context):
+    pass
+
+
+class Charge(object):
+
+    def __init__(self, idempotency_key):
+        self.idempotency_key = idempotency_key
+
+    def forwards(self):
+        calls.append(('charge', self.idempotency_key))
+
+    def backwards(self):
+        calls.append(('refund', self.idempotency_key))
+
+
+@pytest.fixture(autouse=True)
+def reset_calls():
+    del calls[:]
+
+
+@pytest.fixture
+def store(tmpdir):
+    store = reversible.SQLiteResultStore(str(tmpdir.join('results.db')))
+    yield store
+    store.close()
+
+
+@reversible.gen
+def saga(crash_after=None):
+    results = []
+    for name in ['a', 'b', 'c']:
+        if name == crash_after:
+            yield crash()
+        results.append((yield create(name)))
+    raise reversible.Return(results)
+
+
+def test_resumes_after_crash(store):
+    with pytest.raises(Crash):
+        reversible.execute(reversible.replay(saga('c'), store, 'saga'))
+    assert [('create', 'a'), ('create', 'b')] == calls
+    del calls[:]
+
+    result = reversible.execute(reversible.replay(saga(), store, 'saga'))
+    assert ['A', 'B', 'C'] == result
+    assert [('create', 'c')] == calls
+
+    # Finished sagas are forgotten.
+    assert {} == store.steps('saga')
+
+
+def test_replayed_steps_roll_back_with_recorded_context(store):
+
+    @reversible.gen
+    def action(crash_after=None):
+        yield saga(crash_after)
+        raise Exception('great sadness')
+
+    with pytest.raises(Crash):
+        reversible.execute(reversible.replay(action('c'), store, 'saga'))
+    del calls[:]
+
+    with pytest.raises(Exception) as exc_info:
+        reversible.execute(reversible.replay(action(), store, 'saga'))
+
+    assert 'great sadness' in str(exc_info.value)
+    assert [
+        ('create', 'c'),
+        ('delete', 'c'),
+        ('delete', 'b'),
+        ('delete', 'a'),
+    ] == calls
+    assert {} == store.steps('saga')
+
+
+def test_sagas_are_independent(store):
+    with pytest.raises(Crash):
+        reversible.execute(reversible.replay(saga('b'), store, 'first'))
+    del calls[:]
+
+    reversible.execute(reversible.replay(saga(), store, 'second'))
+    assert [('create', 'a'), ('create', 'b'), ('create', 'c')] == calls
+    assert 1 == len(store.steps('first'))
+
+
+def test_concurrent_nested_generators(store):
+
+    @reversible.gen
+    def branch(name, delay):
+        time.sleep(delay)
+        result = yield create(name)
+        raise reversible.Return(result)
+
+    @reversible.gen
+    def action(first, crashing):
+        # The branch that is delayed binds its step last.
+        results = yield [
+            branch('a', 0 if first == 'a' else 0.1),
+            branch('b', 0 if first == 'b' else 0.1),
+        ]
+        if crashing:
+            yield crash()
+        raise reversible.Return(results)
+
+    with pytest.raises(Crash):
+        reversible.execute(reversible.replay(action('a', True), store, 'saga'))
+    del calls[:]
+
+    assert ['A', 'B'] == reversible.execute(
+        reversible.replay(action('b', False), store, 'saga')
+    )
+    assert [] == calls
+
+
+def test_divergence(store):
+
+    @reversible.gen
+    def other():
+        yield create('a')
+        yield Charge('x')
+
+    with pytest.raises(Crash):
+        reversible.execute(reversible.replay(saga('c'), store, 'saga'))
+    del calls[:]
+
+    with pytest.raises(reversible.ReplayDivergence) as exc_info:
+        reversible.execute(reversible.replay(other(), store, 'saga'))
+
+    assert 'Step 1 of saga saga' in str(exc_info.value)
+    assert [('delete', 'a')] == calls
+
+
+def test_idempotency_key(store):
+
+    @reversible.gen
+    def charges(key):
+        yield Charge('a')
+        yield Charge(key)
+        yield crash()
+
+    with pytest.raises(Crash):
+        reversible.execute(reversible.replay(charges('b'), store, 'saga'))
+    del calls[:]
+
+    with pytest.raises(reversible.ReplayDivergence):
+        reversible.execute(reversible.replay(charges('c'), store, 'saga'))
+    assert [('refund', 'a')] == calls
+
+
+def test_unpicklable_results_are_executed_again(store):
+
+    @reversible.action
+    def local(context):
+        calls.append('local')
+        return lambda: None
+
+    local.backwards(lambda context: None)
+
+    @reversible.gen
+    def action(crashing):
+        yield create('a')
+        yield local()
+        if crashing:
+            yield crash()
+
+    with pytest.raises(Crash):
+        reversible.execute(reversible.replay(action(True), store, 'saga'))
+    del calls[:]
+
+    reversible.execute(reversible.replay(action(False), store, 'saga'))
+    assert ['local'] == calls
+
+
+def test_replay_requires_generator_action(store):
+
+    @reversible.gen
+    def empty():
+        pass
+
+    assert reversible.replay(empty(), store, 'saga') is not None
+    with pytest.raises(TypeError):
+        reversible.replay(create('a'), store, 'saga')
@@ -0,0 +1,217 @@
+from __future__ import absolute_import
+
+import mock
+import pytest
+
+import reversible
+
+
+class Transient(Exception):
+    pass
+
+
+def flaky(failures, value='ok', exc=Transient):
+    """Returns a function that fails ``failures`` times before succeeding."""
+    calls = []
+
+    def function(*args):
+        calls.append(args)
+        if len(calls) <= failures:
+            raise exc('attempt %d' % len(calls))
+        return value
+
+    function.calls = calls
+    return function
+
+
+def no_wait(attempts, **kwargs):
+    return reversible.Retry(attempts=attempts, backoff=0, **kwargs)
+
+
+class TestRetry(object):
+
+    def test_call_succeeds_after_retries(self):
+        sleep = mock.Mock()
+        function = flaky(2)
+        retry = reversible.Retry(attempts=3, backoff=1, jitter=False)
+
+        assert 'ok' == retry.call(function, sleep)
+        assert 3 == len(function.calls)
+        assert [mock.call(1), mock.call(2)] == sleep.call_args_list
+
+    def test_call_gives_up(self):
+        sleep = mock.Mock()
+        function = flaky(5)
+
+        with pytest.raises(Transient) as exc_info:
+            reversible.Retry(attempts=3).call(function, sleep)
+
+        assert 'attempt 3' in str(exc_info)
+        assert 3 == len(function.calls)
+        assert 2 == sleep.call_count
+
+    @pytest.mark.parametrize('retry_on', [
+        Transient,
+        (KeyError, Transient),
+        lambda e: isinstance(e, Transient),
+    ])
+    def test_retry_on(self, retry_on):
+        retry = reversible.Retry(attempts=3, retry_on=retry_on)
+        assert retry.should_retry(Transient(), 1)
+        assert not retry.should_retry(ValueError(), 1)
+        assert not retry.should_retry(Transient(), 3)
+
+    def test_unexpected_error_is_not_retried(self):
+        sleep = mock.Mock()
+        function = flaky(1, exc=ValueError)
+
+        with pytest.raises(ValueError):
+            reversible.Retry(retry_on=Transient).call(function, sleep)
+
+        assert 1 == len(function.calls)
+        assert 0 == sleep.call_count
+
+    def test_exponential_backoff(self):
+        retry = reversible.Retry(
+            attempts=10, backoff=0.5, multiplier=3, max_backoff=10,
+            jitter=False,
+        )
+        assert [0.5, 1.5, 4.5, 10, 10] == [retry.delay(i) for i in range(1, 6)]
+
+    def test_jitter(self):
+        retry = reversible.Retry(attempts=10, backoff=1, multiplier=2)
+        for attempt in range(1, 5):
+            for _ in range(20):
+                assert 0 <= retry.delay(attempt) <= 2 ** (attempt - 1)
+
+    def test_invalid_attempts(self):
+        with pytest.raises(ValueError):
+            reversible.Retry(attempts=0)
+
+
+def retried_action(forwards, backwards=None, **policies):
+
+    @reversible.action(**policies)
+    def some_action(ctx, value):
+        return forwards(value)
+
+    @some_action.backwards
+    def undo_some_action(ctx, value):
+        if backwards is not None:
+            backwards(value)
+
+    return some_action
+
+
+def test_action_retry():
+    forwards = flaky(2)
+    some_action = retried_action(forwards, retry=no_wait(3))
+
+    assert 'ok' == reversible.execute(some_action(1))
+    assert [(1,)] * 3 == forwards.calls
+
+
+def test_action_retry_inside_generator():
+    forwards = flaky(1)
+    backwards = mock.Mock()
+    some_action = retried_action(forwards, backwards, retry=no_wait(2))
+
+    @reversible.gen
+    def saga():
+        result = yield some_action(1)
+        raise reversible.Return(result)
+
+    assert 'ok' == reversible.execute(saga())
+    assert 2 == len(forwards.calls)
+    assert 0 == backwards.call_count
+
+
+def test_exhausted_retries_roll_back():
+    forwards = flaky(5)
+    backwards = mock.Mock()
+    some_action = retried_action(forwards, backwards, retry=no_wait(3))
+    before = mock.MagicMock()
+
+    @reversible.gen
+    def saga():
+        yield before
+        yield some_action(1)
+
+    with pytest.raises(Transient):
+        reversible.execute(saga())
+
+    assert 3 == len(forwards.calls)
+    backwards.assert_called_once_with(1)
+    before.backwards.assert_called_once_with()
+
+
+def test_rollback_retry():
+    backwards = flaky(2)
+    some_action = retried_action(
+        flaky(1, exc=ValueError), backwards, rollback_retry=no_wait(3)
+    )
+
+    with pytest.raises(ValueError):
+        reversible.execute(some_action(1))
+
+    assert 3 == len(backwards.calls)
+
+
+def test_execute_retry_applies_to_steps():
+    forwards = flaky(1)
+    inner_forwards = flaky(1, value='inner')
+    members = [flaky(1, value=i) for i in range(3)]
+
+    @reversible.gen
+    def inner():
+        result = yield retried_action(inner_forwards)(1)
+        raise reversible.Return(result)
+
+    @reversible.gen
+    def saga():
+        a = yield retried_action(forwards)(1)
+        b = yield inner()
+        c = yield [retried_action(m)(i) for i, m in enumerate(members)]
+        raise reversible.Return((a, b, c))
+
+    assert ('ok', 'inner', [0, 1, 2]) == reversible.execute(
+        saga(), retry=no_wait(2)
+    )
+    assert 2 == len(forwards.calls)
+    assert 2 == len(inner_forwards.calls)
+    for m in members:
+        assert 2 == len(m.calls)
+
+
+def test_execute_rollback_retry_applies_to_steps():
+    backwards = flaky(2)
+    some_action = retried_action(lambda value: value, backwards)
+
+    @reversible.gen
+    def saga():
+        yield some_action(1)
+        raise ValueError('great sadness')
+
+    with pytest.raises(ValueError):
+        reversible.execute(saga(), rollback_retry=no_wait(3))
+
+    assert 3 == len(backwards.calls)
+
+
+def test_action_policy_takes_precedence():
+    forwards = flaky(2)
+    some_action = retried_action(forwards, retry=no_wait(1))
+
+    with pytest.raises(Transient):
+        reversible.execute(some_action(1), retry=no_wait(5))
+
+    assert 1 == len(forwards.calls)
+
+
+def test_hooks_see_original_action():
+    executor = reversible.Executor()
+    before = executor.before(mock.Mock())
+    action = retried_action(flaky(1), retry=no_wait(2))(1)
+
+    executor.execute(action)
+    before.assert_called_once_with(action)
@@ -0,0 +1,184 @@
+from __future__ import absolute_import
+
+import time
+
+import pytest
+
+import reversible
+from reversible.spill import _SpillLog
+
+
+calls = []
+
+
+@reversible.action
+def record(context, value):
+    calls.append(('forwards', value))
+    return value
+
+
+@record.backwards
+def undo_record(context, value):
+    calls.append(('backwards', value))
+
+
+@reversible.action
+def slow_record(context, value):
+    calls.append(('forwards', value))
+
+
+@slow_record.backwards
+def undo_slow_record(context, value):
+    time.sleep(0.05)
+    calls.append(('backwards', value))
+
+
+@reversible.action
+def fail(context):
+    raise Exception('great sadness')
+
+
+@fail.backwards
+def undo_fail(context):
+    pass
+
+
+@pytest.fixture(autouse=True)
+def reset_calls():
+    del calls[:]
+
+
+def test_spill_log_is_a_stack():
+    log = _SpillLog(2)
+    for i in range(9):
+        log.append(i)
+
+    assert 9 == len(log)
+    # Only the most recent actions are kept in memory.
+    assert len(log.recent) < 4
+    assert log.file is not None
+
+    assert 8 == log[-1]
+    assert list(reversed(range(9))) == [log.pop() for _ in range(9)]
+    assert not log
+    assert log.file is None
+
+
+def test_spill_log_reuses_file_space():
+    log = _SpillLog(1)
+    for i in range(4):
+        log.append(i)
+    size = log.file.tell()
+
+    assert 3 == log.pop()
+    assert 2 == log.pop()
+    log.append(2)
+    log.append(3)
+
+    log.file.seek(0, 2)
+    assert size == log.file.tell()
+    assert [3, 2, 1, 0] == [log.pop() for _ in range(4)]
+
+
+def test_spill_log_keeps_unpicklable_actions_in_memory():
+    log = _SpillLog(1)
+    actions = [lambda: i for i in range(3)]
+    for action in actions:
+        log.append(action)
+
+    assert log.file is None
+    assert 3 == len(log)
+    assert list(reversed(actions)) == [log.pop() for _ in range(3)]
+
+
+def test_spill_log_clear():
+    log = _SpillLog(1)
+    for i in range(4):
+        log.append(i)
+    log.clear()
+
+    assert 0 == len(log)
+    assert log.file is None
+
+
+def test_spilled_actions_are_rolled_back():
+
+    @reversible.gen(spill_threshold=3)
+    def action():
+        for i in range(10):
+            yield record(i)
+        yield fail()
+
+    with pytest.raises(Exception) as exc_info:
+        reversible.execute(action())
+
+    assert 'great sadness' in str(exc_info)
+    assert [('forwards', i) for i in range(10)] + [
+        ('backwards', i) for i in reversed(range(10))
+    ] == calls
+
+
+def test_spilled_barrier():
+
+    @reversible.gen(spill_threshold=2, concurrent_rollback=True)
+    def action():
+        yield record(0)
+        yield reversible.barrier()
+        for i in range(1, 5):
+            yield slow_record(i)
+        yield fail()
+
+    with pytest.raises(Exception):
+        reversible.execute(action())
+
+    # The barrier was spilled with the step before it, and still holds it
+    # back until the steps after it are rolled back.
+    assert ('backwards', 0) == calls[-1]
+    assert set(('backwards', i) for i in range(1, 5)) == set(calls[5:9])
+
+
+def test_max_rollback_depth():
+
+    @reversible.gen(max_rollback_depth=2)
+    def action():
+        for i in range(5):
+            yield record(i)
+        yield fail()
+
+    with pytest.raises(Exception):
+        reversible.execute(action())
+
+    # fail() takes up one of the two slots.
+    assert ('backwards', 4) == calls[-1]
+    assert 6 == len(calls)
+
+
+def test_commit():
+
+    @reversible.gen
+    def action():
+        yield record(0)
+        yield record(1)
+        yield reversible.commit()
+        yield record(2)
+        yield fail()
+
+    with pytest.raises(Exception):
+        reversible.execute(action())
+
+    assert [
+        ('forwards', 0),
+        ('forwards', 1),
+        ('forwards', 2),
+        ('backwards', 2),
+    ] == calls
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'max_rollback_depth': 1, 'spill_threshold': 1},
+    {'max_rollback_depth': -1},
+    {'spill_threshold': 0},
+])
+def test_invalid_rollback_log(kwargs):
+    with pytest.raises(ValueError):
+        reversible.gen(**kwargs)
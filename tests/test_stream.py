@@ -0,0 +1,103 @@
+from __future__ import absolute_import
+
+import mock
+import pytest
+
+import reversible
+
+
+def recording_action(calls, fail_on=None):
+
+    @reversible.action
+    def process(ctx, item):
+        if item == fail_on:
+            raise Exception('great sadness')
+        calls.append(('forwards', item))
+        return item * 2
+
+    @process.backwards
+    def undo_process(ctx, item):
+        calls.append(('backwards', item))
+
+    return process
+
+
+def test_stream_yields_results():
+    calls = []
+    results = reversible.stream(
+        range(7), recording_action(calls), chunk_size=3
+    )
+    assert [0, 2, 4, 6, 8, 10, 12] == list(results)
+    assert [('forwards', i) for i in range(7)] == calls
+
+
+def test_stream_is_lazy():
+    calls = []
+    pulled = []
+
+    def items():
+        for i in range(100):
+            pulled.append(i)
+            yield i
+
+    results = reversible.stream(
+        items(), recording_action(calls), chunk_size=10
+    )
+    assert [] == pulled
+
+    assert 0 == next(results)
+    assert list(range(10)) == pulled
+
+
+def test_stream_rolls_back_current_chunk():
+    calls = []
+    checkpoint = mock.Mock()
+    results = reversible.stream(
+        range(10), recording_action(calls, fail_on=5), chunk_size=2,
+        checkpoint=checkpoint,
+    )
+
+    consumed = []
+    with pytest.raises(reversible.StreamInterrupted) as exc_info:
+        for result in results:
+            consumed.append(result)
+
+    assert 4 == exc_info.value.offset
+    assert 'great sadness' in str(exc_info.value.error)
+    assert [0, 2, 4, 6] == consumed
+    assert [mock.call(2), mock.call(4)] == checkpoint.call_args_list
+    assert [('forwards', i) for i in range(5)] + [
+        ('backwards', 5),
+        ('backwards', 4),
+    ] == calls
+
+
+def test_stream_resumes_from_offset():
+    calls = []
+    checkpoint = mock.Mock()
+    results = reversible.stream(
+        range(10), recording_action(calls), chunk_size=4, offset=4,
+        checkpoint=checkpoint,
+    )
+
+    assert [8, 10, 12, 14, 16, 18] == list(results)
+    assert [mock.call(8), mock.call(10)] == checkpoint.call_args_list
+
+
+def test_stream_uses_executor():
+    executor = reversible.Executor()
+    after = executor.after(mock.Mock())
+
+    assert [0, 2, 4] == list(reversible.stream(
+        range(3), recording_action([]), chunk_size=2, executor=executor
+    ))
+    assert 2 == after.call_count
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'chunk_size': 0},
+    {'offset': -1},
+])
+def test_stream_invalid_arguments(kwargs):
+    with pytest.raises(ValueError):
+        reversible.stream([], recording_action([]), **kwargs)
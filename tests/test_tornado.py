@@ -1,9 +1,11 @@
 from __future__ import absolute_import
 
+import mock
 import pytest
 tornado = pytest.importorskip('tornado')
 
 
+import reversible as base
 import reversible.tornado as reversible
 
 
@@ -209,6 +211,17 @@ def test_generator_execute_success(successful_action):
     assert 42 == value
 
 
+@pytest.mark.gen_test
+def test_generator_without_return(successful_action):
+
+    @reversible.gen
+    def action():
+        yield successful_action()
+
+    value = yield reversible.execute(action())
+    assert value is None
+
+
 @pytest.mark.gen_test
 def test_generator_execute_failure(failing_action):
 
@@ -299,3 +312,732 @@ def test_generator_lift_with_rollback(make_future, failing_action):
         yield reversible.execute(action())
 
     assert 'great sadness' in str(exc_info)
+
+
+@pytest.fixture(params=['list', 'tuple', 'multi'])
+def make_multi(request):
+    if request.param == 'list':
+        return list
+    elif request.param == 'tuple':
+        return tuple
+    else:
+        return reversible.multi
+
+
+def sleeping_action(value, calls, delay=0.05, exc=None):
+
+    @reversible.action
+    def go(ctx):
+        return sleep_then(value, delay, exc)
+
+    @go.backwards
+    def rollback(ctx):
+        calls.append(value)
+
+    return go()
+
+
+@tornado.gen.coroutine
+def sleep_then(value, delay, exc=None):
+    yield tornado.gen.sleep(delay)
+    if exc is not None:
+        raise exc
+    raise tornado.gen.Return(value)
+
+
+@pytest.mark.gen_test
+def test_generator_multi(make_multi, successful_action):
+
+    @reversible.gen
+    def action():
+        results = yield make_multi([successful_action() for i in range(5)])
+        raise reversible.Return(results)
+
+    results = yield reversible.execute(action())
+    assert [42] * 5 == results
+
+
+@pytest.mark.gen_test
+def test_generator_multi_empty(make_multi):
+
+    @reversible.gen
+    def action():
+        results = yield make_multi([])
+        raise reversible.Return(results)
+
+    results = yield reversible.execute(action())
+    assert [] == results
+
+
+@pytest.mark.gen_test
+def test_multi_runs_concurrently(make_multi, io_loop):
+    calls = []
+
+    @reversible.gen
+    def action():
+        results = yield make_multi(
+            [sleeping_action(i, calls, delay=0.1) for i in range(5)]
+        )
+        raise reversible.Return(results)
+
+    start = io_loop.time()
+    results = yield reversible.execute(action())
+    assert list(range(5)) == results
+    assert io_loop.time() - start < 0.3
+    assert [] == calls
+
+
+@pytest.mark.gen_test
+def test_execute_multi():
+    calls = []
+    results = yield reversible.execute(
+        reversible.multi([sleeping_action(i, calls) for i in range(3)])
+    )
+    assert [0, 1, 2] == results
+
+
+@pytest.mark.gen_test
+def test_adjacent_rollbacks_are_merged():
+    calls = []
+
+    @reversible.action
+    def put(ctx, value):
+        return sleep_then(value, 0.01)
+
+    put.backwards(mock.Mock())
+
+    @put.backwards_many
+    def delete_many(contexts, arguments):
+        calls.append([args[0] for args, _ in arguments])
+        return sleep_then(None, 0.01)
+
+    @reversible.gen
+    def action():
+        yield put(1)
+        yield put(2)
+        yield sleeping_action(3, calls)
+        yield put(4)
+        raise MyException('great sadness')
+
+    with pytest.raises(MyException):
+        yield reversible.execute(action())
+
+    assert [3, [2, 1]] == calls
+
+
+@pytest.mark.gen_test
+def test_multi_batches_compatible_actions(make_multi):
+    calls = []
+
+    @reversible.action
+    def put(ctx, value):
+        assert False
+
+    put.backwards(mock.Mock())
+
+    @put.forwards_many
+    def put_many(contexts, arguments):
+        values = [args[0] for args, kwargs in arguments]
+        calls.append(('put_many', values))
+        return sleep_then(values, 0.01)
+
+    @put.backwards_many
+    def delete_many(contexts, arguments):
+        calls.append(('delete_many', [args[0] for args, _ in arguments]))
+        return sleep_then(None, 0.01)
+
+    @reversible.gen
+    def action():
+        results = yield make_multi([put(1), put(2), put(3)])
+        assert [1, 2, 3] == results
+        yield sleeping_action(4, calls, exc=MyException('great sadness'))
+
+    with pytest.raises(MyException):
+        yield reversible.execute(action())
+
+    assert [
+        ('put_many', [1, 2, 3]), 4, ('delete_many', [1, 2, 3]),
+    ] == calls
+
+
+@pytest.mark.gen_test
+def test_multi_nested_generators(make_multi):
+    calls = []
+
+    @reversible.gen
+    def inner(i):
+        a = yield sleeping_action(i, calls)
+        b = yield sleeping_action(i * 10, calls)
+        raise reversible.Return(a + b)
+
+    @reversible.gen
+    def outer():
+        results = yield make_multi([inner(i) for i in range(3)])
+        raise reversible.Return(results)
+
+    results = yield reversible.execute(outer())
+    assert [0, 11, 22] == results
+
+
+@pytest.mark.gen_test
+def test_multi_failure_rolls_back_succeeded(make_multi):
+    calls = []
+
+    @reversible.gen
+    def action():
+        try:
+            yield make_multi([
+                sleeping_action(1, calls),
+                sleeping_action(2, calls, exc=MyException('great sadness')),
+                sleeping_action(3, calls, delay=0.1),
+            ])
+        except MyException:
+            assert [1, 3] == sorted(calls)
+            raise reversible.Return('caught')
+
+    result = yield reversible.execute(action())
+    assert 'caught' == result
+    assert [1, 3] == sorted(calls)
+
+
+@pytest.mark.gen_test
+def test_multi_failure_rolls_back_saga(make_multi):
+    calls = []
+
+    @reversible.gen
+    def action():
+        yield sleeping_action(0, calls)
+        yield make_multi([
+            sleeping_action(1, calls),
+            sleeping_action(2, calls, exc=MyException('great sadness')),
+        ])
+        pytest.fail('Should not reach here')
+
+    with pytest.raises(MyException) as exc_info:
+        yield reversible.execute(action())
+
+    assert 'great sadness' in str(exc_info)
+    assert [1, 2, 0] == calls
+
+
+@pytest.mark.gen_test
+def test_multi_rolled_back_with_saga(make_multi, failing_action):
+    calls = []
+
+    @reversible.gen
+    def action():
+        yield make_multi([sleeping_action(i, calls) for i in range(3)])
+        yield failing_action()
+
+    with pytest.raises(MyException):
+        yield reversible.execute(action())
+
+    assert [2, 1, 0] == calls
+
+
+@pytest.mark.gen_test
+def test_concurrent_rollback(io_loop):
+    calls = []
+
+    @tornado.gen.coroutine
+    def slow_rollback(value):
+        yield tornado.gen.sleep(0.1)
+        calls.append(value)
+
+    def action(value):
+
+        @reversible.action
+        def go(ctx):
+            return value
+
+        @go.backwards
+        def rollback(ctx):
+            return slow_rollback(value)
+
+        return go()
+
+    @reversible.gen(concurrent_rollback=True)
+    def saga():
+        yield action('a')
+        yield reversible.barrier()
+        for i in range(3):
+            yield action(i)
+        yield reversible.barrier()
+        yield action('b')
+        yield action('c')
+        raise MyException('great sadness')
+
+    start = io_loop.time()
+    with pytest.raises(MyException):
+        yield reversible.execute(saga())
+
+    assert io_loop.time() - start < 0.35
+    assert set(['b', 'c']) == set(calls[:2])
+    assert set(range(3)) == set(calls[2:5])
+    assert ['a'] == calls[5:]
+
+
+@pytest.mark.gen_test
+def test_execute_with_executor(successful_action, failing_action):
+    import reversible as base
+
+    executor = base.Executor()
+    after = executor.after(mock.Mock())
+    rollback = executor.on_rollback(mock.Mock())
+
+    result = yield reversible.execute(successful_action(), executor=executor)
+    assert 42 == result
+    after.assert_called_once_with(mock.ANY, 42)
+
+    with pytest.raises(MyException):
+        yield reversible.execute(failing_action(), executor=executor)
+    rollback.assert_called_once_with(mock.ANY, mock.ANY, None)
+
+
+@pytest.mark.gen_test
+@pytest.mark.parametrize('ordered', [True, False])
+def test_execute_many(ordered):
+    calls = []
+    delays = [0.05, 0.01, 0.03, 0.0, 0.02]
+    actions = [
+        sleeping_action(i, calls, delay=delay,
+                        exc=MyException('great sadness') if i == 2 else None)
+        for i, delay in enumerate(delays)
+    ]
+
+    outcomes = reversible.execute_many(
+        actions, max_pending=2, ordered=ordered
+    )
+    results = []
+    while not outcomes.done():
+        outcome = yield outcomes.next()
+        results.append(outcome)
+
+    assert 5 == len(results)
+    if ordered:
+        assert actions == [o.action for o in results]
+    for outcome in results:
+        i = actions.index(outcome.action)
+        if i == 2:
+            assert isinstance(outcome.error, MyException)
+        else:
+            assert i == outcome.value
+    assert [2] == calls
+
+
+@pytest.mark.gen_test
+def test_execute_many_empty():
+    outcomes = reversible.execute_many([])
+    assert outcomes.done()
+
+
+def flaky_async_action(failures, calls):
+
+    @reversible.action(
+        retry=base.Retry(attempts=3, backoff=0.05, jitter=False)
+    )
+    @tornado.gen.coroutine
+    def go(ctx):
+        calls.append('attempt')
+        yield tornado.gen.moment
+        if len(calls) <= failures:
+            raise MyException('attempt %d' % len(calls))
+        raise tornado.gen.Return(len(calls))
+
+    go.backwards(mock.Mock())
+    return go()
+
+
+@pytest.mark.gen_test
+def test_retry_does_not_block_io_loop(io_loop):
+    calls = []
+    ticks = []
+
+    @tornado.gen.coroutine
+    def ticker():
+        for _ in range(3):
+            ticks.append(len(calls))
+            yield tornado.gen.sleep(0.01)
+
+    @reversible.gen
+    def action():
+        result = yield flaky_async_action(2, calls)
+        raise reversible.Return(result)
+
+    result, _ = yield [reversible.execute(action()), ticker()]
+    assert 3 == result
+    # The ticker kept running while the action waited between attempts.
+    assert [0, 1, 1] == ticks
+
+
+@pytest.mark.gen_test
+def test_execute_retry_applies_to_steps():
+    calls = []
+    rollback_calls = []
+
+    @reversible.action
+    def go(ctx):
+        return sleep_then(None, 0.01, exc=MyException('great sadness'))
+
+    @go.backwards
+    def rollback(ctx):
+        rollback_calls.append('attempt')
+        if len(rollback_calls) < 2:
+            return sleep_then(None, 0.01, exc=MyException('rollback'))
+
+    @reversible.gen
+    def action():
+        yield flaky_async_action(1, calls)
+        yield [go()]
+
+    with pytest.raises(MyException):
+        yield reversible.execute(
+            action(),
+            retry=base.Retry(attempts=2, backoff=0),
+            rollback_retry=base.Retry(attempts=2, backoff=0),
+        )
+
+    assert 2 == len(calls)
+    assert 2 == len(rollback_calls)
+
+
+@pytest.mark.gen_test
+def test_saga_deadline(io_loop):
+    calls = []
+
+    @reversible.gen
+    def inner():
+        yield sleeping_action(1, calls, delay=0.01)
+        yield sleeping_action(2, calls, delay=5)
+
+    @reversible.gen
+    def action():
+        yield inner()
+        pytest.fail('Should not reach here')
+
+    start = io_loop.time()
+    with pytest.raises(base.Timeout):
+        yield reversible.execute(action(), timeout=0.1)
+    assert io_loop.time() - start < 0.5
+    assert [2, 1] == calls
+
+
+@pytest.mark.gen_test
+def test_action_timeout():
+    calls = []
+
+    @reversible.action(timeout=0.05)
+    def go(ctx):
+        return sleep_then(None, 5)
+
+    go.backwards(lambda ctx: calls.append('rolled back'))
+
+    @reversible.gen
+    def action():
+        try:
+            yield go()
+        except base.Timeout:
+            calls.append('caught')
+        raise reversible.Return('done')
+
+    assert 'done' == (yield reversible.execute(action()))
+    assert ['caught'] == calls
+
+
+@pytest.mark.gen_test
+def test_rollback_timeout(io_loop):
+    calls = []
+
+    @reversible.gen
+    def action():
+        yield sleeping_action(1, calls)
+        yield [sleeping_action(2, calls)]
+        raise MyException('great sadness')
+
+    @reversible.action
+    def slow_rollback(ctx):
+        pass
+
+    @slow_rollback.backwards
+    def undo_slow_rollback(ctx):
+        return sleep_then(None, 5)
+
+    @reversible.gen
+    def saga():
+        yield sleeping_action(0, calls)
+        yield slow_rollback()
+        yield action()
+
+    start = io_loop.time()
+    with pytest.raises(base.Timeout):
+        yield reversible.execute(saga(), rollback_timeout=0.2)
+    assert io_loop.time() - start < 1
+    assert [2, 1] == calls
+
+
+@pytest.mark.gen_test
+def test_tracing():
+    tracer = base.Tracer()
+    executor = base.Executor(tracer=tracer)
+    calls = []
+
+    @reversible.gen
+    def inner():
+        yield sleeping_action(1, calls)
+        yield [sleeping_action(2, calls), sleeping_action(3, calls)]
+
+    @reversible.gen
+    def action():
+        yield inner()
+        raise MyException('great sadness')
+
+    with pytest.raises(MyException):
+        yield reversible.execute(action(), executor=executor)
+
+    spans = dict(
+        ((s.kind, s.name.rsplit('.', 1)[-1]), s)
+        for s in tracer.spans if not s.name.endswith('go')
+    )
+    outer = spans['forwards', 'action']
+    assert not outer.ok
+    assert spans['forwards', 'inner'].parent_id == outer.span_id
+    assert spans['backwards', 'inner'].parent_id == \
+        spans['backwards', 'action'].span_id
+
+    steps = [s for s in tracer.spans if s.name.endswith('go')]
+    assert 6 == len(steps)
+    forwards = [s for s in steps if s.kind == 'forwards']
+    assert all(
+        s.parent_id == spans['forwards', 'inner'].span_id for s in forwards
+    )
+    # Spans cover the time spent waiting on the IOLoop.
+    assert all(s.end - s.start >= 0.04 for s in forwards)
+
+
+@pytest.mark.gen_test
+def test_savepoint():
+    calls = []
+
+    @reversible.gen(savepoint=True)
+    def inner():
+        yield sleeping_action(1, calls)
+        yield [sleeping_action(2, calls), sleeping_action(3, calls)]
+        raise MyException('great sadness')
+
+    @reversible.gen
+    def action():
+        try:
+            yield inner()
+        except MyException:
+            calls.append('caught')
+        yield reversible.savepoint(inner())
+
+    with pytest.raises(MyException):
+        yield reversible.execute(action())
+
+    assert 1 == calls[2]
+    assert set([2, 3]) == set(calls[:2])
+    assert 'caught' == calls[3]
+    assert 1 == calls[6]
+    assert 7 == len(calls)
+
+
+@pytest.mark.gen_test
+def test_graph():
+    calls = []
+    plan = reversible.graph()
+    plan.add('a', sleeping_action('a', calls))
+    plan.add('b', lambda a: sleeping_action(a + 'b', calls), ['a'])
+    plan.add('c', sleeping_action('c', calls, exc=MyException('sadness')),
+             ['b'])
+
+    @reversible.gen
+    def action():
+        try:
+            yield plan
+        except MyException:
+            results = yield sleeping_action('caught', calls)
+            raise reversible.Return(results)
+
+    assert 'caught' == (yield reversible.execute(action()))
+    assert ['c', 'ab', 'a'] == calls
+
+
+@pytest.mark.gen_test
+def test_traced_rollbacks_are_merged():
+    calls = []
+
+    @reversible.action
+    def put(ctx, value):
+        return sleep_then(value, 0.01)
+
+    put.backwards(mock.Mock())
+
+    @put.backwards_many
+    def delete_many(contexts, arguments):
+        calls.append([args[0] for args, _ in arguments])
+        return sleep_then(None, 0.01)
+
+    @reversible.gen
+    def action():
+        yield put(1)
+        yield put(2)
+        raise MyException('great sadness')
+
+    executor = base.Executor(metrics=base.Metrics())
+    with pytest.raises(MyException):
+        yield reversible.execute(action(), executor=executor)
+
+    assert [[2, 1]] == calls
+
+
+@pytest.mark.gen_test
+def test_limiter():
+    limiter = base.Limiter(concurrency=2)
+    base.limiters.set('downstream', limiter)
+    active = []
+    peak = []
+
+    @reversible.action(resource='downstream')
+    @tornado.gen.coroutine
+    def call(ctx):
+        active.append(1)
+        peak.append(len(active))
+        yield tornado.gen.sleep(0.02)
+        active.pop()
+
+    call.backwards(lambda ctx: None)
+
+    try:
+        yield reversible.execute(reversible.multi([call() for _ in range(6)]))
+    finally:
+        base.limiters.remove('downstream')
+    assert 2 == max(peak)
+    assert 0 == limiter._active
+
+
+@pytest.mark.gen_test
+def test_concurrency_and_rate_limiter():
+    limiter = base.Limiter(concurrency=1, rate=10)
+    base.limiters.set('downstream', limiter)
+    active = []
+    peak = []
+
+    @reversible.action(resource='downstream')
+    @tornado.gen.coroutine
+    def call(ctx):
+        active.append(1)
+        peak.append(len(active))
+        yield tornado.gen.sleep(0.02)
+        active.pop()
+
+    call.backwards(lambda ctx: None)
+
+    # Calls waiting for the first one to finish are then held back by the
+    # rate limit.
+    try:
+        yield reversible.execute(reversible.multi([call() for _ in range(3)]))
+    finally:
+        base.limiters.remove('downstream')
+    assert 1 == max(peak)
+    assert 0 == limiter._active
+
+
+@pytest.mark.gen_test
+def test_commit():
+    calls = []
+
+    @reversible.gen(spill_threshold=1)
+    def action():
+        yield sleeping_action(1, calls)
+        yield reversible.commit()
+        yield sleeping_action(2, calls)
+        yield [sleeping_action(3, calls), sleeping_action(4, calls)]
+        raise MyException('great sadness')
+
+    with pytest.raises(MyException):
+        yield reversible.execute(action())
+
+    assert set([3, 4]) == set(calls[:2])
+    assert [2] == calls[2:]
+
+
+@reversible.action
+def spillable(ctx, value):
+    ctx['value'] = value
+    return value
+
+
+@spillable.backwards
+def undo_spillable(ctx, value):
+    pass
+
+
+def test_steps_are_spilled():
+    from reversible.spill import _SpillLog
+    from reversible.tornado.core import _TornadoAction
+
+    log = _SpillLog(1)
+    for i in range(2):
+        step = spillable(i)
+        step.forwards()
+        log.append(_TornadoAction(step))
+
+    # The oldest step was pickled without its IOLoop.
+    assert log.file is not None
+    assert 1 == log.pop().action.context['value']
+    step = log.pop()
+    assert isinstance(step, _TornadoAction)
+    assert {'value': 0} == step.action.context
+    assert step.io_loop is not None
+
+
+def resolved(value=None, exc=None):
+    future = tornado.concurrent.Future()
+    if exc is not None:
+        future.set_exception(exc)
+    else:
+        future.set_result(value)
+    return future
+
+
+def test_resolved_futures_do_not_switch_greenlets():
+    from reversible.tornado.core import _TornadoAction
+
+    # Called from the main greenlet, which can't switch to a parent. Only
+    # futures that haven't resolved yet need to.
+    action = _TornadoAction(reversible.lift(resolved(42)))
+    assert 42 == action.forwards()
+
+    action = _TornadoAction(
+        reversible.lift(resolved(exc=MyException('great sadness')))
+    )
+    with pytest.raises(MyException):
+        action.forwards()
+
+
+@pytest.mark.gen_test
+def test_resolved_futures_complete_in_one_iteration(io_loop):
+    ticks = []
+
+    @reversible.action
+    def cached(ctx, i):
+        return resolved(i)
+
+    cached.backwards(mock.Mock())
+
+    @reversible.gen
+    def action():
+        total = 0
+        for i in range(100):
+            total += yield cached(i)
+        raise reversible.Return(total)
+
+    future = reversible.execute(action())
+    while not future.done():
+        ticks.append(None)
+        yield tornado.gen.moment
+
+    assert 4950 == future.result()
+    # One iteration to start the saga's greenlet.
+    assert len(ticks) <= 2
@@ -0,0 +1,544 @@
+from __future__ import absolute_import
+
+import sys
+import time
+import subprocess
+
+import mock
+import pytest
+tornado = pytest.importorskip('tornado')
+
+import reversible as base
+import reversible.tornado_native as reversible
+
+
+class MyException(Exception):
+    pass
+
+
+@tornado.gen.coroutine
+def sleep_then(value, delay, exc=None):
+    yield tornado.gen.sleep(delay)
+    if exc is not None:
+        raise exc
+    raise tornado.gen.Return(value)
+
+
+def sleeping_action(value, calls, delay=0.01, exc=None):
+
+    @reversible.action
+    def go(ctx):
+        return sleep_then(value, delay, exc)
+
+    @go.backwards
+    def rollback(ctx):
+        return sleep_then(calls.append(value), 0)
+
+    return go()
+
+
+def sync_action(value, calls):
+
+    @reversible.action
+    def go(ctx):
+        return value
+
+    @go.backwards
+    def rollback(ctx):
+        calls.append(value)
+
+    return go()
+
+
+def test_does_not_import_greenlet():
+    subprocess.check_call([sys.executable, '-c', (
+        'import sys, reversible.tornado_native; '
+        'assert "greenlet" not in sys.modules'
+    )])
+
+
+@pytest.mark.gen_test
+def test_execute_success():
+    assert 42 == (yield reversible.execute(sleeping_action(42, [])))
+
+
+@pytest.mark.gen_test
+def test_execute_failure_rolls_back():
+    calls = []
+    with pytest.raises(MyException):
+        yield reversible.execute(
+            sleeping_action(1, calls, exc=MyException('great sadness'))
+        )
+    assert [1] == calls
+
+
+@pytest.mark.gen_test
+def test_generator_rolls_back_in_reverse():
+    calls = []
+
+    @reversible.gen
+    def inner():
+        yield sleeping_action(2, calls)
+        yield sync_action(3, calls)
+
+    @reversible.gen
+    def action():
+        yield sleeping_action(1, calls)
+        yield inner()
+        yield sleeping_action(4, calls, exc=MyException('great sadness'))
+
+    with pytest.raises(MyException) as exc_info:
+        yield reversible.execute(action())
+
+    assert 'great sadness' in str(exc_info)
+    assert [4, 3, 2, 1] == calls
+
+
+@pytest.mark.gen_test
+def test_exception_thrown_into_generator():
+    calls = []
+
+    @reversible.gen
+    def action():
+        try:
+            yield sleeping_action(1, calls, exc=MyException('great sadness'))
+        except MyException:
+            result = yield sleeping_action(2, calls)
+        raise reversible.Return(result)
+
+    assert 2 == (yield reversible.execute(action()))
+    assert [] == calls
+
+
+@pytest.mark.gen_test
+def test_return_after_sync_step():
+
+    @reversible.gen
+    def action():
+        a = yield sleeping_action(1, [])
+        b = yield sync_action(2, [])
+        raise reversible.Return(a + b)
+
+    assert 3 == (yield reversible.execute(action()))
+
+
+@pytest.mark.gen_test
+def test_rollback_failure():
+    calls = []
+
+    @reversible.action
+    def fails_rollback(ctx):
+        pass
+
+    @fails_rollback.backwards
+    def undo_fails_rollback(ctx):
+        return sleep_then(None, 0, exc=MyException('rollback failed'))
+
+    @reversible.gen
+    def action():
+        yield sleeping_action(1, calls)
+        yield fails_rollback()
+        raise MyException('great sadness')
+
+    with pytest.raises(MyException) as exc_info:
+        yield reversible.execute(action())
+
+    assert 'rollback failed' in str(exc_info)
+    assert [] == calls
+
+
+def test_synchronous_steps_do_not_wait_on_io_loop():
+    calls = []
+
+    @reversible.gen
+    def action():
+        a = yield sync_action(1, calls)
+        b = yield [sync_action(2, calls), sync_action(3, calls)]
+        raise reversible.Return([a] + b)
+
+    # The IOLoop is never started.
+    future = reversible.execute(action())
+    assert future.done()
+    assert [1, 2, 3] == future.result()
+
+
+@pytest.mark.gen_test
+def test_multi():
+    calls = []
+
+    @reversible.gen
+    def action():
+        results = yield [
+            sleeping_action(i, calls, delay=0.05) for i in range(5)
+        ]
+        raise reversible.Return(results)
+
+    io_loop = tornado.ioloop.IOLoop.current()
+    start = io_loop.time()
+    assert list(range(5)) == (yield reversible.execute(action()))
+    # The members ran side by side.
+    assert io_loop.time() - start < 0.2
+
+
+@pytest.mark.gen_test
+def test_multi_failure():
+    calls = []
+
+    @reversible.gen
+    def action():
+        yield sleeping_action(0, calls)
+        yield reversible.multi([
+            sleeping_action(1, calls),
+            sleeping_action(2, calls, exc=MyException('great sadness')),
+            sleeping_action(3, calls),
+        ])
+
+    with pytest.raises(MyException):
+        yield reversible.execute(action())
+
+    assert set([1, 3]) == set(calls[:2])
+    assert [2, 0] == calls[2:]
+
+
+@pytest.mark.gen_test
+def test_concurrent_rollback():
+    calls = []
+
+    @reversible.gen(concurrent_rollback=True)
+    def action():
+        yield sleeping_action(0, calls)
+        yield reversible.barrier()
+        yield sleeping_action(1, calls)
+        yield sleeping_action(2, calls)
+        raise MyException('great sadness')
+
+    with pytest.raises(MyException):
+        yield reversible.execute(action())
+
+    assert set([1, 2]) == set(calls[:2])
+    assert [0] == calls[2:]
+
+
+@pytest.mark.gen_test
+def test_graph():
+    calls = []
+    plan = reversible.graph()
+    plan.add('a', sleeping_action('a', calls, delay=0.05))
+    plan.add('b', lambda a: sleeping_action(a + 'b', calls, delay=0.05),
+             ['a'])
+    plan.add('c', lambda a: sleeping_action(a + 'c', calls, delay=0.05),
+             ['a'])
+    plan.add('d', lambda b, c: sleeping_action(b + c, calls), ['b', 'c'])
+
+    io_loop = tornado.ioloop.IOLoop.current()
+    start = io_loop.time()
+    results = yield reversible.execute(plan)
+    assert 'abac' == results['d']
+    # b and c ran side by side.
+    assert io_loop.time() - start < 0.15
+
+
+@pytest.mark.gen_test
+def test_graph_failure():
+    calls = []
+    plan = reversible.graph()
+    plan.add('a', sleeping_action('a', calls))
+    plan.add('b', sync_action('b', calls), ['a'])
+    plan.add('c', sleeping_action('c', calls), ['a'])
+    plan.add('d', sleeping_action('d', calls, exc=MyException('sadness')),
+             ['b', 'c'])
+    plan.add('e', sleeping_action('e', calls), ['d'])
+
+    with pytest.raises(MyException):
+        yield reversible.execute(plan)
+
+    assert 'd' == calls[0]
+    assert set(['b', 'c']) == set(calls[1:3])
+    assert ['a'] == calls[3:]
+
+
+@pytest.mark.gen_test
+def test_graph_nodes_are_retried():
+    calls = []
+
+    @reversible.action
+    def flaky(ctx, a):
+        calls.append('attempt')
+        if len(calls) < 3:
+            return sleep_then(None, 0, exc=MyException('attempt'))
+        return sleep_then(a + 'b', 0)
+
+    flaky.backwards(mock.Mock())
+
+    rolled_back = []
+    plan = reversible.graph()
+    plan.add('a', sync_action('a', rolled_back))
+    plan.add('b', flaky, ['a'])
+
+    results = yield reversible.execute(
+        plan, retry=base.Retry(attempts=3, backoff=0)
+    )
+    assert {'a': 'a', 'b': 'ab'} == results
+    assert 3 == len(calls)
+
+    # Only the failed node was retried, not the whole graph.
+    assert [] == rolled_back
+
+
+@pytest.mark.gen_test
+def test_graph_node_timeout():
+    calls = []
+
+    @reversible.action(timeout=0.05)
+    def slow(ctx, a):
+        return sleep_then(None, 5)
+
+    slow.backwards(mock.Mock())
+
+    plan = reversible.graph()
+    plan.add('a', sleeping_action('a', calls))
+    plan.add('b', slow, ['a'])
+
+    with pytest.raises(base.Timeout):
+        yield reversible.execute(plan)
+    assert ['a'] == calls
+
+
+@pytest.mark.gen_test
+def test_traced_rollbacks_are_merged():
+    calls = []
+
+    @reversible.action
+    def put(ctx, value):
+        return sleep_then(value, 0.01)
+
+    put.backwards(mock.Mock())
+
+    @put.backwards_many
+    def delete_many(contexts, arguments):
+        calls.append([args[0] for args, _ in arguments])
+        return sleep_then(None, 0.01)
+
+    @reversible.gen
+    def action():
+        yield put(1)
+        yield put(2)
+        raise MyException('great sadness')
+
+    executor = base.Executor(metrics=base.Metrics())
+    with pytest.raises(MyException):
+        yield reversible.execute(action(), executor=executor)
+
+    assert [[2, 1]] == calls
+
+
+@pytest.mark.gen_test
+def test_limiter():
+    limiter = base.Limiter(concurrency=2)
+    base.limiters.set('downstream', limiter)
+    active = []
+    peak = []
+
+    @reversible.action(resource='downstream')
+    @tornado.gen.coroutine
+    def call(ctx):
+        active.append(1)
+        peak.append(len(active))
+        yield tornado.gen.sleep(0.02)
+        active.pop()
+
+    call.backwards(lambda ctx: None)
+
+    try:
+        yield reversible.execute(reversible.multi([call() for _ in range(6)]))
+    finally:
+        base.limiters.remove('downstream')
+    assert 2 == max(peak)
+    assert 0 == limiter._active
+
+
+@pytest.mark.gen_test
+def test_concurrency_and_rate_limiter():
+    limiter = base.Limiter(concurrency=1, rate=10)
+    base.limiters.set('downstream', limiter)
+    active = []
+    peak = []
+
+    @reversible.action(resource='downstream')
+    @tornado.gen.coroutine
+    def call(ctx):
+        active.append(1)
+        peak.append(len(active))
+        yield tornado.gen.sleep(0.02)
+        active.pop()
+
+    call.backwards(lambda ctx: None)
+
+    # Calls waiting for the first one to finish are then held back by the
+    # rate limit.
+    try:
+        yield reversible.execute(reversible.multi([call() for _ in range(3)]))
+    finally:
+        base.limiters.remove('downstream')
+    assert 1 == max(peak)
+    assert 0 == limiter._active
+
+
+@pytest.mark.gen_test
+def test_lift():
+
+    @reversible.gen
+    def action():
+        value = yield reversible.lift(sleep_then(42, 0))
+        raise reversible.Return(value)
+
+    assert 42 == (yield reversible.execute(action()))
+
+
+@pytest.mark.gen_test
+def test_savepoint():
+    calls = []
+
+    @reversible.gen(savepoint=True)
+    def inner():
+        yield sleeping_action(1, calls)
+        raise MyException('great sadness')
+
+    @reversible.gen
+    def action():
+        try:
+            yield inner()
+        except MyException:
+            calls.append('caught')
+
+    yield reversible.execute(action())
+    assert [1, 'caught'] == calls
+
+
+@pytest.mark.gen_test
+def test_commit():
+    calls = []
+
+    @reversible.gen(spill_threshold=1)
+    def action():
+        yield sleeping_action(1, calls)
+        yield reversible.commit()
+        yield sleeping_action(2, calls)
+        yield sync_action(3, calls)
+        yield sleeping_action(4, calls)
+        raise MyException('great sadness')
+
+    with pytest.raises(MyException):
+        yield reversible.execute(action())
+
+    assert [4, 3, 2] == calls
+
+
+@pytest.mark.gen_test
+def test_retry():
+    calls = []
+
+    @reversible.action(retry=base.Retry(attempts=3, backoff=0))
+    def flaky(ctx):
+        calls.append('attempt')
+        if len(calls) < 3:
+            return sleep_then(None, 0, exc=MyException('attempt'))
+        return sleep_then(len(calls), 0)
+
+    flaky.backwards(mock.Mock())
+
+    @reversible.gen
+    def action():
+        result = yield flaky()
+        raise reversible.Return(result)
+
+    assert 3 == (yield reversible.execute(action()))
+
+
+@pytest.mark.gen_test
+def test_saga_deadline():
+    calls = []
+
+    @reversible.gen
+    def action():
+        yield sleeping_action(1, calls)
+        yield sleeping_action(2, calls, delay=5)
+
+    with pytest.raises(base.Timeout):
+        yield reversible.execute(action(), timeout=0.1)
+    assert [2, 1] == calls
+
+
+@pytest.mark.gen_test
+def test_saga_deadline_is_not_retried():
+
+    @reversible.gen
+    def action():
+        yield sleeping_action(1, [], delay=0.3)
+
+    start = time.time()
+    with pytest.raises(base.Timeout):
+        yield reversible.execute(
+            action(), timeout=0.2,
+            retry=base.Retry(attempts=4, backoff=1, jitter=False),
+        )
+    assert time.time() - start < 0.6
+
+
+@pytest.mark.gen_test
+def test_executor_hooks_and_tracing():
+    tracer = base.Tracer()
+    executor = base.Executor(tracer=tracer)
+    after = executor.after(mock.Mock())
+
+    @reversible.gen
+    def action():
+        yield sleeping_action(1, [], delay=0.05)
+
+    saga = action()
+    yield reversible.execute(saga, executor=executor)
+    after.assert_called_once_with(saga, None)
+
+    step, outer = tracer.spans
+    assert step.parent_id == outer.span_id
+    assert step.end - step.start >= 0.04
+
+
+@pytest.mark.gen_test
+def test_metrics():
+    metrics = base.Metrics()
+    executor = base.Executor(metrics=metrics)
+
+    @reversible.gen
+    def action():
+        yield sleeping_action(1, [], delay=0.05)
+
+    yield reversible.execute(action(), executor=executor)
+
+    assert 0 == metrics.in_flight
+    [histogram] = [
+        histogram for (name, _), histogram in metrics._durations.items()
+        if name.endswith('go')
+    ]
+    assert 1 == sum(histogram.counts)
+    assert histogram.sum >= 0.04
+
+
+@pytest.mark.gen_test
+def test_execute_many():
+    calls = []
+    actions = [
+        sleeping_action(i, calls,
+                        exc=MyException('great sadness') if i == 2 else None)
+        for i in range(4)
+    ]
+
+    outcomes = reversible.execute_many(actions, max_pending=2)
+    results = []
+    while not outcomes.done():
+        results.append((yield outcomes.next()))
+
+    assert actions == [o.action for o in results]
+    assert isinstance(results[2].error, MyException)
+    assert [0, 1, None, 3] == [o.value for o in results]
+    assert [2] == calls
@@ -0,0 +1,204 @@
+from __future__ import absolute_import
+
+import json
+
+import mock
+import pytest
+
+import reversible
+from reversible.generator import _GeneratorAction
+
+
+class MyException(Exception):
+    pass
+
+
+@reversible.action
+def step(ctx, value, fail=False):
+    if fail:
+        raise MyException('great sadness')
+    return value
+
+
+@step.backwards
+def undo_step(ctx, value, fail=False):
+    pass
+
+
+def by_name(tracer):
+    # Generator functions defined inside tests are named after the test on
+    # Python 3.
+    spans = {}
+    for span in tracer.spans:
+        name = span.name.rsplit('.', 1)[-1]
+        spans.setdefault((span.kind, name), []).append(span)
+    return spans
+
+
+def test_execute_records_span():
+    tracer = reversible.Tracer()
+    executor = reversible.Executor(tracer=tracer)
+
+    assert 42 == executor.execute(step(42))
+
+    [span] = tracer.spans
+    assert 'step' == span.name
+    assert 'forwards' == span.kind
+    assert span.parent_id is None
+    assert span.ok
+    assert span.start <= span.end
+
+
+def test_failure_and_rollback_spans():
+    tracer = reversible.Tracer()
+    executor = reversible.Executor(tracer=tracer)
+
+    with pytest.raises(MyException):
+        executor.execute(step(1, fail=True))
+
+    forwards, backwards = tracer.spans
+    assert ('forwards', 'backwards') == (forwards.kind, backwards.kind)
+    assert not forwards.ok
+    assert 'great sadness' in forwards.error
+    assert backwards.ok
+    assert forwards.trace_id == backwards.trace_id
+
+
+def test_generator_steps_are_nested():
+    tracer = reversible.Tracer()
+    executor = reversible.Executor(tracer=tracer)
+
+    @reversible.gen
+    def inner():
+        yield step(1)
+        yield step(2, fail=True)
+
+    @reversible.gen
+    def outer():
+        yield step(0)
+        yield [step(3), step(4)]
+        yield inner()
+
+    with pytest.raises(MyException):
+        executor.execute(outer())
+
+    spans = by_name(tracer)
+    [outer_forwards] = spans['forwards', 'outer']
+    [outer_backwards] = spans['backwards', 'outer']
+    [inner_forwards] = spans['forwards', 'inner']
+    [inner_backwards] = spans['backwards', 'inner']
+
+    assert outer_forwards.parent_id is None
+    assert outer_backwards.parent_id is None
+    assert inner_forwards.parent_id == outer_forwards.span_id
+    assert inner_backwards.parent_id == outer_backwards.span_id
+    assert not outer_forwards.ok
+    assert outer_backwards.ok
+
+    step_forwards = spans['forwards', 'step']
+    assert 5 == len(step_forwards)
+    assert 3 == sum(
+        s.parent_id == outer_forwards.span_id for s in step_forwards
+    )
+    assert 2 == sum(
+        s.parent_id == inner_forwards.span_id for s in step_forwards
+    )
+
+    # The failed step is rolled back along with the others.
+    step_backwards = spans['backwards', 'step']
+    assert 5 == len(step_backwards)
+    assert 3 == sum(
+        s.parent_id == outer_backwards.span_id for s in step_backwards
+    )
+
+    assert 1 == len(set(s.trace_id for s in tracer.spans))
+
+
+def test_disabled_by_default():
+    action = step(1)
+    generator = _GeneratorAction(iter([]))
+    assert action is generator._bind(action)
+
+    executor = reversible.Executor()
+    assert executor.tracer is None
+    assert 1 == executor.execute(action)
+
+
+def test_chrome_trace(tmpdir):
+    tracer = reversible.Tracer()
+    executor = reversible.Executor(tracer=tracer)
+
+    @reversible.gen
+    def saga():
+        yield step(1)
+        yield step(2, fail=True)
+
+    with pytest.raises(MyException):
+        executor.execute(saga())
+
+    path = str(tmpdir.join('trace.json'))
+    tracer.export_chrome(path)
+    with open(path) as f:
+        document = json.load(f)
+
+    events = document['traceEvents']
+    assert len(tracer.spans) == len(events)
+    for event in events:
+        assert 'X' == event['ph']
+        assert event['cat'] in ('forwards', 'backwards')
+        assert event['dur'] >= 0
+        assert isinstance(event['ts'], float)
+
+    failed = [e for e in events if e['args']['outcome'] == 'error']
+    assert 2 == len(failed)
+    assert all('great sadness' in e['args']['error'] for e in failed)
+
+
+def test_otlp(tmpdir):
+    tracer = reversible.Tracer(service_name='orders')
+    executor = reversible.Executor(tracer=tracer)
+
+    @reversible.gen
+    def saga():
+        yield step(1)
+
+    executor.execute(saga())
+
+    path = str(tmpdir.join('trace.json'))
+    tracer.export_otlp(path)
+    with open(path) as f:
+        document = json.load(f)
+
+    [resource_spans] = document['resourceSpans']
+    assert {
+        'key': 'service.name', 'value': {'stringValue': 'orders'},
+    } in resource_spans['resource']['attributes']
+
+    [scope_spans] = resource_spans['scopeSpans']
+    step_span, saga_span = scope_spans['spans']
+
+    assert 32 == len(saga_span['traceId'])
+    assert 16 == len(saga_span['spanId'])
+    assert 'parentSpanId' not in saga_span
+    assert saga_span['spanId'] == step_span['parentSpanId']
+    assert saga_span['traceId'] == step_span['traceId']
+    assert {'code': 1} == step_span['status']
+    assert int(step_span['startTimeUnixNano']) <= int(
+        step_span['endTimeUnixNano']
+    )
+
+
+def test_clear():
+    tracer = reversible.Tracer()
+    reversible.Executor(tracer=tracer).execute(step(1))
+    tracer.clear()
+    assert [] == tracer.spans
+
+
+def test_hooks_see_original_action():
+    executor = reversible.Executor(tracer=reversible.Tracer())
+    before = executor.before(mock.Mock())
+    action = step(1)
+
+    executor.execute(action)
+    before.assert_called_once_with(action)